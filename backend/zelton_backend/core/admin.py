@@ -2,7 +2,9 @@ from django.contrib import admin
 from .models import (
     Owner, Property, Unit, Tenant, TenantKey, Payment, Invoice,
     PaymentProof, ManualPaymentProof, PricingPlan, PaymentTransaction, PropertyImage, UnitImage,
-    TenantDocument, OwnerPayment, OwnerPayout
+    TenantDocument, OwnerPayment, OwnerPayout, TenantLedger, LedgerEntry,
+    PaymentMonthlyRollup, ActivityEvent, PayoutJob, WebhookEvent,
+    GatewayOrder, CashfreeBeneficiary, OwnerPayoutItem
 )
 
 
@@ -351,6 +353,14 @@ class ManualPaymentProofAdmin(admin.ModelAdmin):
         return True
 
 
+class OwnerPayoutItemInline(admin.TabularInline):
+    model = OwnerPayoutItem
+    extra = 0
+    fields = ['payment', 'amount', 'created_at']
+    readonly_fields = ['payment', 'amount', 'created_at']
+    can_delete = False
+
+
 @admin.register(OwnerPayout)
 class OwnerPayoutAdmin(admin.ModelAdmin):
     list_display = [
@@ -358,15 +368,15 @@ class OwnerPayoutAdmin(admin.ModelAdmin):
         'beneficiary_type', 'retry_count', 'initiated_at', 'completed_at'
     ]
     list_filter = [
-        'status', 'beneficiary_type', 'initiated_at', 'completed_at'
+        'status', 'beneficiary_type', 'settlement_window', 'initiated_at', 'completed_at'
     ]
     search_fields = [
         'owner__user__first_name', 'owner__user__last_name', 'owner__user__email',
         'cashfree_transfer_id', 'cashfree_utr', 'payment__id'
     ]
     readonly_fields = [
-        'payment', 'owner', 'amount', 'cashfree_transfer_id', 'cashfree_reference_id',
-        'cashfree_utr', 'cashfree_response', 'initiated_at', 'completed_at',
+        'payment', 'owner', 'amount', 'settlement_window', 'cashfree_transfer_id', 'cashfree_batch_transfer_id',
+        'cashfree_reference_id', 'cashfree_utr', 'cashfree_response', 'initiated_at', 'completed_at',
         'last_retry_at', 'next_retry_at'
     ]
     date_hierarchy = 'initiated_at'
@@ -374,10 +384,10 @@ class OwnerPayoutAdmin(admin.ModelAdmin):
     
     fieldsets = (
         ('Payout Information', {
-            'fields': ('payment', 'owner', 'amount', 'status', 'beneficiary_type')
+            'fields': ('payment', 'owner', 'amount', 'status', 'beneficiary_type', 'settlement_window')
         }),
         ('Cashfree Details', {
-            'fields': ('cashfree_transfer_id', 'cashfree_reference_id', 'cashfree_utr', 'cashfree_response'),
+            'fields': ('cashfree_transfer_id', 'cashfree_batch_transfer_id', 'cashfree_reference_id', 'cashfree_utr', 'cashfree_response'),
             'classes': ('collapse',)
         }),
         ('Retry Information', {
@@ -389,6 +399,7 @@ class OwnerPayoutAdmin(admin.ModelAdmin):
         }),
     )
     
+    inlines = [OwnerPayoutItemInline]
     actions = ['retry_failed_payouts', 'check_payout_status']
     
     def get_owner_name(self, obj):
@@ -399,6 +410,8 @@ class OwnerPayoutAdmin(admin.ModelAdmin):
     
     def get_payment_info(self, obj):
         """Display payment and unit information"""
+        if obj.payment is None:
+            return f"Batch {obj.settlement_window} - {obj.items.count()} payments"
         return f"Payment #{obj.payment.id} - Unit {obj.payment.unit.unit_number}"
     get_payment_info.short_description = 'Payment Info'
     get_payment_info.admin_order_field = 'payment__id'
@@ -448,3 +461,83 @@ class OwnerPayoutAdmin(admin.ModelAdmin):
     def has_delete_permission(self, request, obj=None):
         """Allow deleting payouts (with caution)"""
         return True
+
+
+class LedgerEntryInline(admin.TabularInline):
+    model = LedgerEntry
+    extra = 0
+    fields = ['entry_type', 'amount', 'balance_after', 'period', 'payment', 'created_at']
+    readonly_fields = fields
+    can_delete = False
+
+
+@admin.register(TenantLedger)
+class TenantLedgerAdmin(admin.ModelAdmin):
+    list_display = ['id', 'tenant', 'unit', 'move_in_date', 'accrued_through', 'total_accrued', 'total_paid', 'balance', 'is_active']
+    list_filter = ['is_active', 'accrued_through']
+    search_fields = ['tenant__user__email', 'unit__unit_number', 'unit__property__name']
+    readonly_fields = ['accrued_through', 'total_accrued', 'total_paid', 'balance', 'closed_at', 'created_at', 'updated_at']
+    inlines = [LedgerEntryInline]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('tenant__user', 'unit')
+
+
+@admin.register(PaymentMonthlyRollup)
+class PaymentMonthlyRollupAdmin(admin.ModelAdmin):
+    list_display = [
+        'owner', 'property', 'month', 'completed_count', 'completed_amount',
+        'pending_count', 'pending_amount', 'failed_count', 'cancelled_count'
+    ]
+    list_filter = ['month']
+    search_fields = ['owner__user__email', 'property__name']
+    readonly_fields = [
+        'owner', 'property', 'month', 'completed_count', 'completed_amount', 'pending_count',
+        'pending_amount', 'failed_count', 'failed_amount', 'cancelled_count', 'cancelled_amount', 'updated_at'
+    ]
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('owner__user', 'property')
+
+
+@admin.register(ActivityEvent)
+class ActivityEventAdmin(admin.ModelAdmin):
+    list_display = ['owner', 'event_type', 'title', 'subtitle', 'created_at']
+    list_filter = ['event_type', 'created_at']
+    search_fields = ['owner__user__email', 'title', 'subtitle']
+    readonly_fields = ['owner', 'event_type', 'property', 'unit', 'tenant', 'payment', 'title', 'subtitle', 'created_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('owner__user')
+
+
+@admin.register(PayoutJob)
+class PayoutJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'payment', 'status', 'attempts', 'available_at', 'locked_until', 'payout', 'created_at']
+    list_filter = ['status', 'created_at']
+    search_fields = ['payment__merchant_order_id', 'payment__unit__property__owner__user__email']
+    readonly_fields = ['payment', 'payout', 'locked_until', 'last_error', 'created_at', 'updated_at', 'completed_at']
+
+
+@admin.register(WebhookEvent)
+class WebhookEventAdmin(admin.ModelAdmin):
+    list_display = ['id', 'merchant_order_id', 'callback_type', 'state', 'status', 'delivery_count', 'attempts', 'received_at', 'processed_at']
+    list_filter = ['status', 'callback_type', 'state', 'received_at']
+    search_fields = ['merchant_order_id']
+    readonly_fields = ['merchant_order_id', 'callback_type', 'state', 'payload', 'delivery_count', 'result', 'received_at', 'processed_at']
+
+
+@admin.register(GatewayOrder)
+class GatewayOrderAdmin(admin.ModelAdmin):
+    list_display = ['merchant_order_id', 'phonepe_order_id', 'order_type', 'payment', 'owner_payment', 'created_at']
+    list_filter = ['order_type', 'created_at']
+    search_fields = ['merchant_order_id', 'phonepe_order_id']
+    raw_id_fields = ['payment', 'owner_payment', 'transaction']
+
+
+@admin.register(CashfreeBeneficiary)
+class CashfreeBeneficiaryAdmin(admin.ModelAdmin):
+    list_display = ['beneficiary_id', 'owner', 'is_valid', 'created_at', 'updated_at']
+    list_filter = ['is_valid']
+    search_fields = ['beneficiary_id', 'owner__user__email']
+    readonly_fields = ['details_hash', 'created_at', 'updated_at']
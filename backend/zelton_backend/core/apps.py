@@ -6,4 +6,7 @@ class CoreConfig(AppConfig):
     name = "core"
 
     def ready(self):
-        import core.signals
\ No newline at end of file
+        import core.signals
+        from django.db.backends.signals import connection_created
+        from core.metrics import install_query_wrapper
+        connection_created.connect(install_query_wrapper, dispatch_uid='core.metrics.install_query_wrapper')
\ No newline at end of file
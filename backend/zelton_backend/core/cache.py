@@ -0,0 +1,102 @@
+"""
+Owner-scoped response cache.
+
+Cached entries are keyed by owner and a per-owner version counter. Model signals bump the
+counter whenever data an owner can see changes, so stale entries are never read again and
+simply expire. A global version component covers data shared by every owner (pricing plans).
+"""
+import functools
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_VERSION_KEY = 'owner-cache:global-version'
+
+
+def _owner_version_key(owner_id):
+    return f'owner-cache:{owner_id}:version'
+
+
+def _initial_version():
+    # Seed from the clock so a version key that was evicted never reuses an old number
+    return int(time.time() * 1000)
+
+
+def _get_versions(owner_id):
+    """Return (global_version, owner_version), initialising missing counters"""
+    owner_key = _owner_version_key(owner_id)
+    versions = cache.get_many([GLOBAL_VERSION_KEY, owner_key])
+
+    for key in (GLOBAL_VERSION_KEY, owner_key):
+        if key not in versions:
+            cache.add(key, _initial_version(), None)
+            versions[key] = cache.get(key, 0)
+
+    return versions[GLOBAL_VERSION_KEY], versions[owner_key]
+
+
+def _bump(key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # Counter missing (never read, evicted, or a backend such as DummyCache that stores nothing)
+        cache.set(key, _initial_version(), None)
+
+
+def invalidate_owner_cache(owner_id):
+    """Invalidate every cached response for an owner, now and again once the transaction commits"""
+    if not owner_id:
+        return
+    key = _owner_version_key(owner_id)
+    _bump(key)
+    # A read racing the open transaction may have cached pre-commit data under the new version
+    transaction.on_commit(lambda: _bump(key))
+
+
+def invalidate_all_owner_caches():
+    """Invalidate cached responses for every owner"""
+    _bump(GLOBAL_VERSION_KEY)
+    transaction.on_commit(lambda: _bump(GLOBAL_VERSION_KEY))
+
+
+def owner_cached_response(name, timeout=None):
+    """
+    Cache a successful GET response of an owner-scoped viewset action.
+    The key includes the owner, both version counters and the query string.
+    """
+    def decorator(view_method):
+        @functools.wraps(view_method)
+        def wrapper(self, request, *args, **kwargs):
+            from .models import Owner
+
+            owner_id = Owner.objects.filter(user_id=request.user.pk).values_list('id', flat=True).first()
+            if request.method != 'GET' or owner_id is None:
+                return view_method(self, request, *args, **kwargs)
+
+            global_version, owner_version = _get_versions(owner_id)
+            query = request.query_params.urlencode()
+            query_hash = hashlib.md5(query.encode()).hexdigest() if query else 'none'
+            cache_key = f'owner-cache:{owner_id}:{global_version}:{owner_version}:{name}:{query_hash}'
+
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return Response(cached)
+
+            response = view_method(self, request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                cache.set(
+                    cache_key,
+                    response.data,
+                    timeout if timeout is not None else getattr(settings, 'OWNER_CACHE_TIMEOUT', 300)
+                )
+            return response
+        return wrapper
+    return decorator
@@ -0,0 +1,254 @@
+"""
+Shared cache backend stored in a local SQLite database in WAL mode.
+
+Every gunicorn worker opens the same file, so entries written by one worker are hits for
+all of them without running Redis or Memcached. Entries carry an absolute expiry time and
+a last-access time; once MAX_ENTRIES is exceeded, expired rows and then the least recently
+used rows are culled.
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'core.cache_backends.SQLiteCache',
+            'LOCATION': '/path/to/cache.sqlite3',
+            'TIMEOUT': 300,
+            'OPTIONS': {'MAX_ENTRIES': 10000, 'CULL_FREQUENCY': 4},
+        }
+    }
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+# Refresh an entry's access time at most this often, so hot reads do not turn into writes
+ACCESS_TIME_RESOLUTION = 5
+
+# Check the entry count for culling once every this many writes
+CULL_CHECK_INTERVAL = 100
+
+
+class SQLiteCache(BaseCache):
+    """Cross-process cache backed by a SQLite file in WAL mode with TTL and LRU eviction"""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        self._path = location
+        self._local = threading.local()
+        self._writes_since_cull = 0
+        self._schema_ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connection(self):
+        """Return this thread's connection, reopening it after a fork"""
+        connection = getattr(self._local, 'connection', None)
+        if connection is not None and self._local.pid == os.getpid():
+            return connection
+
+        directory = os.path.dirname(self._path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        connection = sqlite3.connect(self._path, timeout=5, isolation_level=None, check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        connection.execute('PRAGMA busy_timeout=5000')
+        self._local.connection = connection
+        self._local.pid = os.getpid()
+
+        with self._schema_lock:
+            if not self._schema_ready:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS cache_entries ('
+                    'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL, accessed REAL NOT NULL)'
+                )
+                connection.execute('CREATE INDEX IF NOT EXISTS cache_entries_expires ON cache_entries (expires)')
+                connection.execute('CREATE INDEX IF NOT EXISTS cache_entries_accessed ON cache_entries (accessed)')
+                self._schema_ready = True
+
+        return connection
+
+    def _expires_at(self, timeout):
+        # get_backend_timeout returns an absolute timestamp, or None to never expire
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _is_live(expires, now):
+        return expires is None or expires > now
+
+    def get(self, key, default=None, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+
+        row = connection.execute(
+            'SELECT value, expires, accessed FROM cache_entries WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return default
+
+        value, expires, accessed = row
+        if not self._is_live(expires, now):
+            connection.execute('DELETE FROM cache_entries WHERE key = ? AND expires <= ?', (key, now))
+            return default
+
+        if now - accessed > ACCESS_TIME_RESOLUTION:
+            connection.execute('UPDATE cache_entries SET accessed = ? WHERE key = ?', (now, key))
+        return pickle.loads(value)
+
+    def get_many(self, keys, version=None):
+        key_map = {self.make_and_validate_key(key, version=version): key for key in keys}
+        if not key_map:
+            return {}
+
+        now = time.time()
+        placeholders = ','.join('?' * len(key_map))
+        rows = self._connection().execute(
+            f'SELECT key, value, expires FROM cache_entries WHERE key IN ({placeholders})',
+            list(key_map)
+        ).fetchall()
+
+        return {
+            key_map[key]: pickle.loads(value)
+            for key, value, expires in rows
+            if self._is_live(expires, now)
+        }
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        self._write(key, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        connection = self._connection()
+        expires = self._expires_at(timeout)
+        now = time.time()
+        rows = [
+            (self.make_and_validate_key(key, version=version), pickle.dumps(value, pickle.HIGHEST_PROTOCOL), expires, now)
+            for key, value in data.items()
+        ]
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            connection.executemany(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)', rows
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        self._maybe_cull(len(rows))
+        return []
+
+    def _write(self, key, value, timeout):
+        connection = self._connection()
+        connection.execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(timeout), time.time())
+        )
+        self._maybe_cull(1)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is not None and self._is_live(row[0], now):
+                connection.execute('COMMIT')
+                return False
+            connection.execute(
+                'INSERT OR REPLACE INTO cache_entries (key, value, expires, accessed) VALUES (?, ?, ?, ?)',
+                (key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL), self._expires_at(timeout), now)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+
+        self._maybe_cull(1)
+        return True
+
+    def incr(self, key, delta=1, version=None):
+        """Atomically increment a stored number across processes"""
+        key = self.make_and_validate_key(key, version=version)
+        connection = self._connection()
+        now = time.time()
+
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+            row = connection.execute('SELECT value, expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+            if row is None or not self._is_live(row[1], now):
+                raise ValueError(f"Key '{key}' not found")
+            new_value = pickle.loads(row[0]) + delta
+            connection.execute(
+                'UPDATE cache_entries SET value = ?, accessed = ? WHERE key = ?',
+                (pickle.dumps(new_value, pickle.HIGHEST_PROTOCOL), now, key)
+            )
+            connection.execute('COMMIT')
+        except BaseException:
+            connection.execute('ROLLBACK')
+            raise
+        return new_value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        now = time.time()
+        cursor = self._connection().execute(
+            'UPDATE cache_entries SET expires = ?, accessed = ? WHERE key = ? AND (expires IS NULL OR expires > ?)',
+            (self._expires_at(timeout), now, key, now)
+        )
+        return cursor.rowcount > 0
+
+    def has_key(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        row = self._connection().execute('SELECT expires FROM cache_entries WHERE key = ?', (key,)).fetchone()
+        return row is not None and self._is_live(row[0], time.time())
+
+    def delete(self, key, version=None):
+        key = self.make_and_validate_key(key, version=version)
+        cursor = self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+        return cursor.rowcount > 0
+
+    def delete_many(self, keys, version=None):
+        keys = [self.make_and_validate_key(key, version=version) for key in keys]
+        if keys:
+            placeholders = ','.join('?' * len(keys))
+            self._connection().execute(f'DELETE FROM cache_entries WHERE key IN ({placeholders})', keys)
+
+    def clear(self):
+        self._connection().execute('DELETE FROM cache_entries')
+
+    def close(self, **kwargs):
+        # Connections are reused across requests; they are dropped with the worker process
+        pass
+
+    def _maybe_cull(self, writes):
+        self._writes_since_cull += writes
+        if self._writes_since_cull < CULL_CHECK_INTERVAL:
+            return
+        self._writes_since_cull = 0
+        self.cull()
+
+    def cull(self):
+        """Drop expired entries, then the least recently used ones while over MAX_ENTRIES"""
+        connection = self._connection()
+        connection.execute('DELETE FROM cache_entries WHERE expires IS NOT NULL AND expires <= ?', (time.time(),))
+
+        count = connection.execute('SELECT COUNT(*) FROM cache_entries').fetchone()[0]
+        if count <= self._max_entries:
+            return
+
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache_entries')
+            return
+
+        # Cull down to MAX_ENTRIES, plus 1/CULL_FREQUENCY of the limit as headroom
+        remove = count - self._max_entries + self._max_entries // self._cull_frequency
+        connection.execute(
+            'DELETE FROM cache_entries WHERE key IN ('
+            'SELECT key FROM cache_entries ORDER BY accessed LIMIT ?)',
+            (remove,)
+        )
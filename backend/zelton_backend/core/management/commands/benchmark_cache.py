@@ -0,0 +1,183 @@
+import json
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.db import DatabaseCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand
+from django.core.management.commands.createcachetable import Command as CreateCacheTableCommand
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+
+from core.cache_backends import SQLiteCache
+
+BENCHMARK_TABLE = 'zelton_benchmark_cache'
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def _timed(operation, count):
+    """Run operation(i) count times and return per-call latencies in microseconds"""
+    samples = []
+    for i in range(count):
+        started = time.perf_counter()
+        operation(i)
+        samples.append((time.perf_counter() - started) * 1_000_000)
+    return samples
+
+
+def _shared_read_worker(backend, worker_index, workers, keys_per_worker, barrier, results):
+    """Write this worker's keys, then read every other worker's keys and report the hit count"""
+    for i in range(keys_per_worker):
+        backend.set(f'shared:{worker_index}:{i}', i, 300)
+    barrier.wait()
+
+    hits = 0
+    for other in range(workers):
+        if other == worker_index:
+            continue
+        for i in range(keys_per_worker):
+            if backend.get(f'shared:{other}:{i}') is not None:
+                hits += 1
+    results.put(hits)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark the SQLite shared cache backend against LocMemCache and DatabaseCache'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--operations',
+            type=int,
+            default=2000,
+            help='Operations per benchmark step (default: 2000)',
+        )
+        parser.add_argument(
+            '--value-size',
+            type=int,
+            default=2048,
+            help='Size in bytes of cached values (default: 2048, roughly a dashboard response)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Processes for the cross-process shared hit test (default: 4, 0 to skip)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write results to this file as JSON',
+        )
+
+    def handle(self, *args, **options):
+        operations = options['operations']
+        payload = {'data': 'x' * options['value_size']}
+        params = {'TIMEOUT': 300, 'OPTIONS': {'MAX_ENTRIES': operations * 10, 'CULL_FREQUENCY': 4}}
+
+        temp_dir = tempfile.mkdtemp(prefix='zelton-cache-bench-')
+        create_table_command = CreateCacheTableCommand()
+        create_table_command.verbosity = 0
+        create_table_command.create_table(DEFAULT_DB_ALIAS, BENCHMARK_TABLE, dry_run=False)
+
+        backends = {
+            'locmem': LocMemCache('zelton-benchmark', params),
+            'database': DatabaseCache(BENCHMARK_TABLE, params),
+            'sqlite': SQLiteCache(os.path.join(temp_dir, 'cache.sqlite3'), params),
+        }
+
+        results = {}
+        try:
+            for name, backend in backends.items():
+                self.stdout.write(f'Benchmarking {name}...')
+                backend.clear()
+                results[name] = self._benchmark_backend(backend, operations, payload)
+                if options['workers'] > 1:
+                    backend.clear()
+                    results[name]['shared_hit_rate'] = self._shared_hit_rate(
+                        backend, options['workers'], max(1, operations // options['workers'])
+                    )
+        finally:
+            with connection.cursor() as cursor:
+                cursor.execute(f'DROP TABLE IF EXISTS {connection.ops.quote_name(BENCHMARK_TABLE)}')
+            shutil.rmtree(temp_dir, ignore_errors=True)
+
+        self._print_results(results)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Benchmark results saved to {options['output']}")
+
+    def _benchmark_backend(self, backend, operations, payload):
+        backend.set('counter', 0)
+        steps = {
+            'set': _timed(lambda i: backend.set(f'key:{i}', payload), operations),
+            'get_hit': _timed(lambda i: backend.get(f'key:{i}'), operations),
+            'get_miss': _timed(lambda i: backend.get(f'missing:{i}'), operations),
+            'get_many_10': _timed(
+                lambda i: backend.get_many([f'key:{(i + j) % operations}' for j in range(10)]),
+                max(1, operations // 10)
+            ),
+            'incr': _timed(lambda i: backend.incr('counter'), operations),
+        }
+
+        return {
+            step: {
+                'ops_per_sec': round(len(samples) / (sum(samples) / 1_000_000), 1) if sum(samples) else 0,
+                'p50_us': round(_percentile(samples, 50), 1),
+                'p95_us': round(_percentile(samples, 95), 1),
+                'p99_us': round(_percentile(samples, 99), 1),
+            }
+            for step, samples in steps.items()
+        }
+
+    def _shared_hit_rate(self, backend, workers, keys_per_worker):
+        """Fraction of reads that hit keys written by a different process"""
+        # Forked children must open their own database connections
+        connections.close_all()
+
+        context = multiprocessing.get_context('fork')
+        barrier = context.Barrier(workers)
+        hits_queue = context.Queue()
+        processes = [
+            context.Process(
+                target=_shared_read_worker,
+                args=(backend, index, workers, keys_per_worker, barrier, hits_queue)
+            )
+            for index in range(workers)
+        ]
+        for process in processes:
+            process.start()
+        hits = sum(hits_queue.get() for _ in processes)
+        for process in processes:
+            process.join()
+
+        reads = workers * (workers - 1) * keys_per_worker
+        return round(hits / reads, 3) if reads else 0
+
+    def _print_results(self, results):
+        self.stdout.write('')
+        self.stdout.write(f"{'backend':<10} {'step':<12} {'ops/s':>12} {'p50 us':>10} {'p95 us':>10} {'p99 us':>10}")
+        for name, backend_results in results.items():
+            for step, stats in backend_results.items():
+                if step == 'shared_hit_rate':
+                    continue
+                self.stdout.write(
+                    f"{name:<10} {step:<12} {stats['ops_per_sec']:>12} "
+                    f"{stats['p50_us']:>10} {stats['p95_us']:>10} {stats['p99_us']:>10}"
+                )
+            if 'shared_hit_rate' in backend_results:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"{name:<10} cross-process hit rate: {backend_results['shared_hit_rate']:.1%}"
+                    )
+                )
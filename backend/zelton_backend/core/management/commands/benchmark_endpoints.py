@@ -0,0 +1,215 @@
+import json
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.cache import invalidate_owner_cache
+from core.management.commands.generate_dataset import USERNAME_PREFIX
+from core.models import Owner, Tenant, Unit, Payment
+from core.services.reconciliation_service import _percentile
+
+# (name, role, path) of the endpoints behind the owner and tenant home, list and history screens
+ENDPOINTS = [
+    ('owner_dashboard', 'owner', '/api/owners/dashboard/'),
+    ('owner_profile', 'owner', '/api/owners/profile/'),
+    ('property_list', 'owner', '/api/properties/'),
+    ('detailed_properties', 'owner', '/api/properties/detailed_properties/'),
+    ('unit_list', 'owner', '/api/units/'),
+    ('analytics', 'owner', '/api/analytics/'),
+    ('activity', 'owner', '/api/analytics/activity/'),
+    ('owner_payment_history', 'owner', '/api/payments/'),
+    ('owner_payouts', 'owner', '/api/owner-payouts/'),
+    ('tenant_dashboard', 'tenant', '/api/tenants/dashboard/'),
+    ('tenant_payment_history', 'tenant', '/api/payments/'),
+    ('tenant_payment_status', 'tenant', '/api/payments/check_payment_status/'),
+    ('tenant_invoices', 'tenant', '/api/invoices/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Time and count the queries of the hot owner and tenant endpoints, optionally at several dataset '
+        'scales (generated with generate_dataset), and compare the results with a previous run. '
+        'Do not run against production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=str,
+            help='Comma-separated generate_dataset scales to benchmark in turn, e.g. 10,100,1000 '
+                 '(default: benchmark the data already in the database)',
+        )
+        parser.add_argument(
+            '--repeat',
+            type=int,
+            default=10,
+            help='Requests per endpoint (default: 10)',
+        )
+        parser.add_argument(
+            '--owner-id',
+            type=int,
+            help='Owner to benchmark as (default: the synthetic owner with the most units)',
+        )
+        parser.add_argument(
+            '--endpoint',
+            action='append',
+            help='Only benchmark this endpoint; may be given more than once',
+        )
+        parser.add_argument(
+            '--label',
+            type=str,
+            default='',
+            help='Label stored with the results, e.g. the release being measured',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write results to this file as JSON',
+        )
+        parser.add_argument(
+            '--compare',
+            type=str,
+            help='Results file of a previous run to report regressions against',
+        )
+        parser.add_argument(
+            '--threshold',
+            type=float,
+            default=25.0,
+            help='Percent slowdown of p50 latency reported as a regression (default: 25)',
+        )
+        parser.add_argument(
+            '--fail-on-regression',
+            action='store_true',
+            help='Exit with an error when a regression is found',
+        )
+
+    def handle(self, *args, **options):
+        endpoints = [e for e in ENDPOINTS if not options['endpoint'] or e[0] in options['endpoint']]
+        if not endpoints:
+            raise CommandError(f"Unknown endpoint; choose from {', '.join(e[0] for e in ENDPOINTS)}")
+
+        results = {'label': options['label'], 'created_at': timezone.now().isoformat(), 'scales': {}}
+        if options['scales']:
+            for scale in sorted(int(value) for value in options['scales'].split(',')):
+                self.stdout.write(f"Preparing dataset at scale {scale}...")
+                call_command('generate_dataset', scale=scale, stdout=self.stdout)
+                results['scales'][str(scale)] = self.benchmark(endpoints, options)
+        else:
+            results['scales']['current'] = self.benchmark(endpoints, options)
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Benchmark results saved to {options['output']}")
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                baseline = json.load(f)
+            regressions = self.compare(baseline, results, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{len(regressions)} endpoint regressions against {options['compare']}")
+
+    def benchmark(self, endpoints, options):
+        owner = self.pick_owner(options['owner_id'])
+        tenant = (
+            Tenant.objects.filter(payments__unit__property__owner=owner)
+            .annotate(payment_count=Count('payments')).order_by('-payment_count').first()
+        )
+        clients = {'owner': APIClient(), 'tenant': APIClient()}
+        clients['owner'].force_authenticate(user=owner.user)
+        if tenant:
+            clients['tenant'].force_authenticate(user=tenant.user)
+
+        dataset = {
+            'owners': Owner.objects.count(),
+            'units': Unit.objects.count(),
+            'payments': Payment.objects.count(),
+            'benchmark_owner_units': Unit.objects.filter(property__owner=owner).count(),
+            'benchmark_owner_payments': Payment.objects.filter(unit__property__owner=owner).count(),
+        }
+        self.stdout.write(
+            f"Benchmarking as owner {owner.id} ({dataset['benchmark_owner_units']} units, "
+            f"{dataset['benchmark_owner_payments']} payments) over {dataset['payments']} payments in total"
+        )
+
+        results = {}
+        for name, role, path in endpoints:
+            if role == 'tenant' and tenant is None:
+                continue
+            results[name] = self.benchmark_endpoint(clients[role], path, owner.id, options['repeat'])
+            stats = results[name]
+            self.stdout.write(
+                f"{name:24} {stats['status']:>4} queries={stats['queries']:<4} "
+                f"p50/p95: {stats['p50_ms']}/{stats['p95_ms']} ms  warm p50: {stats['warm_p50_ms']} ms  "
+                f"{stats['response_bytes']} bytes"
+            )
+        return {'dataset': dataset, 'endpoints': results}
+
+    def pick_owner(self, owner_id):
+        if owner_id:
+            owner = Owner.objects.select_related('user').filter(id=owner_id).first()
+        else:
+            # The largest account is where per-row queries and unbounded lists show first
+            owner = (
+                Owner.objects.select_related('user').filter(user__username__startswith=USERNAME_PREFIX)
+                .annotate(unit_count=Count('properties__units')).order_by('-unit_count', 'id').first()
+            )
+        if owner is None:
+            raise CommandError('No owner to benchmark as; run generate_dataset or pass --owner-id')
+        return owner
+
+    def benchmark_endpoint(self, client, path, owner_id, repeat):
+        """Cold requests (owner response cache invalidated first) and warm repeats of one endpoint"""
+        cold = []
+        warm = []
+        queries = 0
+        for _ in range(max(1, repeat)):
+            invalidate_owner_cache(owner_id)
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(path)
+                cold.append(time.perf_counter() - started)
+            queries = max(queries, len(captured))
+
+            started = time.perf_counter()
+            client.get(path)
+            warm.append(time.perf_counter() - started)
+
+        return {
+            'status': response.status_code,
+            'queries': queries,
+            'p50_ms': round(_percentile(cold, 50) * 1000, 1),
+            'p95_ms': round(_percentile(cold, 95) * 1000, 1),
+            'warm_p50_ms': round(_percentile(warm, 50) * 1000, 1),
+            'response_bytes': len(response.content),
+        }
+
+    def compare(self, baseline, results, threshold):
+        """Print endpoints whose query count grew or whose p50 slowed by more than threshold percent"""
+        regressions = []
+        for scale, current in results['scales'].items():
+            previous = baseline.get('scales', {}).get(scale, {}).get('endpoints', {})
+            for name, stats in current['endpoints'].items():
+                before = previous.get(name)
+                if not before:
+                    continue
+                if stats['queries'] > before['queries']:
+                    regressions.append(f"[{scale}] {name}: queries {before['queries']} -> {stats['queries']}")
+                if before['p50_ms'] and (stats['p50_ms'] - before['p50_ms']) / before['p50_ms'] * 100 > threshold:
+                    regressions.append(f"[{scale}] {name}: p50 {before['p50_ms']} -> {stats['p50_ms']} ms")
+
+        label = baseline.get('label') or 'baseline'
+        if regressions:
+            self.stdout.write(self.style.ERROR(f"Regressions against {label}:"))
+            for regression in regressions:
+                self.stdout.write(self.style.ERROR(f"  {regression}"))
+        else:
+            self.stdout.write(self.style.SUCCESS(f"No regressions against {label}"))
+        return regressions
@@ -0,0 +1,378 @@
+import random
+import string
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from core.cache import invalidate_all_owner_caches
+from core.models import (
+    Owner, Property, Unit, Tenant, TenantKey, Payment, Invoice, OwnerPayout, TenantLedger,
+    PaymentMonthlyRollup, ActivityEvent, PricingPlan
+)
+
+# Every generated user has this username prefix; --clear removes them and everything they own
+USERNAME_PREFIX = 'dataset-'
+
+CITIES = [
+    ('Bengaluru', 'Karnataka', '560'), ('Hyderabad', 'Telangana', '500'), ('Pune', 'Maharashtra', '411'),
+    ('Mumbai', 'Maharashtra', '400'), ('Chennai', 'Tamil Nadu', '600'), ('Delhi', 'Delhi', '110'),
+    ('Kolkata', 'West Bengal', '700'), ('Jaipur', 'Rajasthan', '302'),
+]
+
+# Most owners rent out one or two properties; a long tail runs a portfolio
+PROPERTIES_PER_OWNER = [((1, 1), 45), ((2, 3), 35), ((4, 8), 15), ((9, 20), 5)]
+PROPERTY_TYPES = [('apartment', (4, 40), 55), ('house', (1, 3), 25), ('villa', (1, 2), 5), ('commercial', (2, 15), 15)]
+UNIT_TYPES = [('1RK', (5000, 9000), 15), ('1BHK', (8000, 16000), 35), ('2BHK', (14000, 28000), 35), ('3BHK', (24000, 50000), 15)]
+OCCUPANCY_RATE = 0.85
+
+# Outcome of a past month's rent: paid (sometimes after a failed attempt), cancelled or not paid at all
+PAST_MONTH_OUTCOMES = [('completed', 90), ('failed_then_completed', 5), ('cancelled', 1), ('unpaid', 4)]
+CURRENT_MONTH_OUTCOMES = [('completed', 60), ('pending', 15), ('unpaid', 25)]
+# Days between the due date and the payment
+PAYMENT_DELAY_DAYS = [((-5, -1), 30), ((0, 3), 50), ((4, 10), 15), ((11, 25), 5)]
+# Only final states: the retry and status workers would otherwise call Cashfree for synthetic payouts
+PAYOUT_OUTCOMES = [('completed', 97), ('failed', 3)]
+
+FIRST_NAMES = ['Aarav', 'Vivaan', 'Aditya', 'Ananya', 'Diya', 'Ishaan', 'Kavya', 'Meera', 'Rohan', 'Priya', 'Arjun', 'Sneha']
+LAST_NAMES = ['Sharma', 'Reddy', 'Iyer', 'Patel', 'Nair', 'Gupta', 'Rao', 'Singh', 'Das', 'Menon', 'Kulkarni', 'Joshi']
+STREETS = ['MG Road', 'Park Street', 'Brigade Road', 'Linking Road', 'Anna Salai', 'Banjara Hills Road', 'FC Road']
+
+
+def _weighted(rng, choices):
+    """Pick the value of a (value, ..., weight) tuple, weighted by its last element"""
+    return rng.choices(choices, weights=[choice[-1] for choice in choices])[0]
+
+
+def _month_start(day):
+    return day.replace(day=1)
+
+
+def _add_months(month, count):
+    month_index = month.month - 1 + count
+    return date(month.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def _aware(day, rng):
+    """A timezone-aware datetime at a random time of the given day"""
+    return timezone.make_aware(
+        timezone.datetime(day.year, day.month, day.day, rng.randint(7, 22), rng.randint(0, 59))
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic dataset of owners, properties, units, tenancies, payments, invoices and '
+        'payouts with production-like distributions. --scale is the number of owners; running again '
+        'with a larger scale adds owners, so one dataset can grow through several benchmark scales. '
+        'Do not run against production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            type=int,
+            default=10,
+            help='Number of synthetic owners the dataset should contain (default: 10)',
+        )
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=12,
+            help='Months of rent history to generate (default: 12)',
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=42,
+            help='Random seed; the same seed and scale produce the same dataset (default: 42)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Rows per bulk insert (default: 1000)',
+        )
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete the synthetic dataset instead of generating one',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            # Bulk-inserting synthetic owners and payouts must never reach a production database
+            raise CommandError('generate_dataset only runs with DEBUG=True (development settings)')
+
+        if options['clear']:
+            self.clear()
+            return
+
+        started = time.monotonic()
+        existing = Owner.objects.filter(user__username__startswith=f'{USERNAME_PREFIX}owner-').count()
+        if existing >= options['scale']:
+            self.stdout.write(f"Dataset already has {existing} owners; nothing to generate")
+            return
+
+        self.stdout.write(f"Generating owners {existing + 1}-{options['scale']}...")
+        self.password = make_password(None)
+        self.batch_size = options['batch_size']
+        self.today = timezone.localdate()
+        counts = {}
+        for first in range(existing, options['scale'], 50):
+            # Owners are generated 50 at a time, each from its own seeded generator
+            owner_indexes = range(first, min(first + 50, options['scale']))
+            with transaction.atomic():
+                chunk_counts = self.generate_owners(owner_indexes, options['seed'], options['months'])
+            for name, count in chunk_counts.items():
+                counts[name] = counts.get(name, 0) + count
+            self.stdout.write(f"  {owner_indexes.stop}/{options['scale']} owners")
+
+        invalidate_all_owner_caches()
+        self.stdout.write(self.style.SUCCESS(
+            'Generated ' + ', '.join(f'{count} {name}' for name, count in counts.items()) +
+            f' in {time.monotonic() - started:.1f}s'
+        ))
+
+    def clear(self):
+        owner_user_ids = list(
+            User.objects.filter(username__startswith=f'{USERNAME_PREFIX}owner-').values_list('id', flat=True)
+        )
+        # One owner at a time, so each cascading delete (and its payment signals) is a bounded transaction
+        for index, user_id in enumerate(owner_user_ids, 1):
+            with transaction.atomic():
+                # Payments go first: their delete signals update rollup rows the owner cascade removes
+                Payment.objects.filter(unit__property__owner__user_id=user_id).delete()
+                User.objects.filter(id=user_id).delete()
+            if index % 50 == 0:
+                self.stdout.write(f"  deleted {index}/{len(owner_user_ids)} owners")
+        User.objects.filter(username__startswith=USERNAME_PREFIX).delete()
+        invalidate_all_owner_caches()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {len(owner_user_ids)} synthetic owners and their data'))
+
+    def generate_owners(self, owner_indexes, seed, months):
+        """Plan the owners' rows in memory, bulk insert them, then open ledgers and rebuild rollups"""
+        plans = list(PricingPlan.objects.filter(is_active=True).order_by('min_units'))
+        rows = {name: [] for name in (
+            'owner_users', 'owners', 'properties', 'units', 'tenant_users', 'tenants', 'tenant_keys',
+            'payments', 'invoices', 'payouts', 'activity_events'
+        )}
+        # Timestamps that auto_now_add fields would overwrite on insert
+        created_at = {'payments': [], 'invoices': [], 'payouts': []}
+
+        for owner_index in owner_indexes:
+            rng = random.Random(f'{seed}-{owner_index}')
+            self.plan_owner(rng, owner_index, months, plans, rows, created_at)
+
+        self.assign_tenant_keys(rows['tenant_keys'])
+        for name in rows:
+            model = rows[name][0].__class__ if rows[name] else None
+            if model is not None:
+                model.objects.bulk_create(rows[name], batch_size=self.batch_size)
+
+        for name, model, field in (
+            ('payments', Payment, 'created_at'), ('invoices', Invoice, 'created_at'), ('payouts', OwnerPayout, 'initiated_at')
+        ):
+            for obj, value in zip(rows[name], created_at[name]):
+                setattr(obj, field, value)
+            model.objects.bulk_update(rows[name], [field], batch_size=self.batch_size)
+
+        for tenant_key in rows['tenant_keys']:
+            if tenant_key.is_used:
+                TenantLedger.open_for_tenant_key(tenant_key).accrue_rent().sync_unit_remaining_amount()
+        for owner in rows['owners']:
+            PaymentMonthlyRollup.rebuild(owner=owner)
+
+        return {
+            'owners': len(rows['owners']),
+            'properties': len(rows['properties']),
+            'units': len(rows['units']),
+            'tenants': len(rows['tenants']),
+            'payments': len(rows['payments']),
+            'invoices': len(rows['invoices']),
+            'payouts': len(rows['payouts']),
+        }
+
+    def make_user(self, rng, username):
+        return User(
+            username=username,
+            email=f'{username}@example.com',
+            first_name=rng.choice(FIRST_NAMES),
+            last_name=rng.choice(LAST_NAMES),
+            password=self.password,
+        )
+
+    def plan_owner(self, rng, owner_index, months, plans, rows, created_at):
+        city, state, pincode_prefix = rng.choice(CITIES)
+        owner_user = self.make_user(rng, f'{USERNAME_PREFIX}owner-{owner_index}')
+        payment_method = 'upi' if rng.random() < 0.7 else 'bank'
+        owner = Owner(
+            user=owner_user,
+            phone=f'9{rng.randint(100000000, 999999999)}',
+            address=f'{rng.randint(1, 500)}, {rng.choice(STREETS)}',
+            city=city,
+            state=state,
+            pincode=f'{pincode_prefix}{rng.randint(0, 999):03d}',
+            payment_method=payment_method,
+            upi_id=f'{owner_user.username}@upi' if payment_method == 'upi' else '',
+            bank_name='State Bank of India' if payment_method == 'bank' else '',
+            ifsc_code='SBIN0000001' if payment_method == 'bank' else '',
+            account_number=str(rng.randint(10 ** 10, 10 ** 11)) if payment_method == 'bank' else '',
+            subscription_status='active',
+            subscription_start_date=timezone.now() - timedelta(days=30 * months),
+            subscription_end_date=timezone.now() + timedelta(days=rng.randint(15, 365)),
+        )
+        rows['owner_users'].append(owner_user)
+        rows['owners'].append(owner)
+
+        current_month = _month_start(self.today)
+        total_units = 0
+        property_count = rng.randint(*_weighted(rng, PROPERTIES_PER_OWNER)[0])
+        for property_index in range(property_count):
+            property_type, unit_range, _ = _weighted(rng, PROPERTY_TYPES)
+            property_obj = Property(
+                owner=owner,
+                name=f'{rng.choice(STREETS).split()[0]} {property_type.title()} {property_index + 1}',
+                address=f'{rng.randint(1, 500)}, {rng.choice(STREETS)}',
+                city=city,
+                state=state,
+                pincode=owner.pincode,
+                property_type=property_type,
+            )
+            rows['properties'].append(property_obj)
+
+            for unit_index in range(rng.randint(*unit_range)):
+                unit_type, rent_range, _ = _weighted(rng, UNIT_TYPES)
+                unit = Unit(
+                    property=property_obj,
+                    unit_number=f'{unit_index // 10 + 1}{unit_index % 10 + 1:02d}',
+                    unit_type=unit_type,
+                    rent_amount=Decimal(round(rng.randint(*rent_range), -2)),
+                    rent_due_date=rng.choice([1, 1, 1, 5, 10]),
+                    status='occupied' if rng.random() < OCCUPANCY_RATE else 'available',
+                )
+                rows['units'].append(unit)
+                property_obj.total_units += 1
+                if unit.status != 'occupied':
+                    rows['tenant_keys'].append(TenantKey(property=property_obj, unit=unit))
+                    continue
+
+                property_obj.occupied_units += 1
+                self.plan_tenancy(rng, owner_index, owner, property_obj, unit, months, current_month, rows, created_at)
+            total_units += property_obj.total_units
+
+        owner.total_properties = property_count
+        owner.subscription_plan = next(
+            (plan for plan in plans if plan.min_units <= total_units <= plan.max_units),
+            plans[-1] if plans else None
+        )
+
+    def plan_tenancy(self, rng, owner_index, owner, property_obj, unit, months, current_month, rows, created_at):
+        tenant_user = self.make_user(rng, f'{USERNAME_PREFIX}tenant-{owner_index}-{len(rows["tenants"])}')
+        tenant = Tenant(user=tenant_user, phone=f'8{rng.randint(100000000, 999999999)}', city=property_obj.city)
+        tenant_name = f'{tenant_user.first_name} {tenant_user.last_name}'
+        move_in = min(
+            _add_months(current_month, -rng.randint(0, months)) + timedelta(days=rng.randint(0, 27)), self.today
+        )
+        rows['tenant_users'].append(tenant_user)
+        rows['tenants'].append(tenant)
+        rows['tenant_keys'].append(TenantKey(
+            property=property_obj, unit=unit, tenant=tenant, is_used=True, used_at=_aware(move_in, rng)
+        ))
+        rows['activity_events'].append(ActivityEvent(
+            owner=owner, event_type='tenant_joined', property=property_obj, unit=unit, tenant=tenant,
+            title=f'New tenant: {tenant_name}', subtitle=f'Joined {property_obj.name}', created_at=_aware(move_in, rng),
+        ))
+
+        month = _month_start(move_in)
+        while month <= current_month:
+            due_date = month.replace(day=unit.rent_due_date)
+            if month == current_month:
+                if self.today < due_date - timedelta(days=5):
+                    break
+                outcome = _weighted(rng, CURRENT_MONTH_OUTCOMES)[0]
+            else:
+                outcome = _weighted(rng, PAST_MONTH_OUTCOMES)[0]
+            month = _add_months(month, 1)
+            if outcome == 'unpaid':
+                continue
+
+            paid_on = min(due_date + timedelta(days=rng.randint(*_weighted(rng, PAYMENT_DELAY_DAYS)[0])), self.today)
+            paid_at = _aware(max(paid_on, move_in), rng)
+            if outcome == 'failed_then_completed':
+                self.add_payment(rows, created_at, owner_index, tenant, unit, due_date, 'failed', paid_at - timedelta(hours=2))
+                outcome = 'completed'
+            if outcome == 'pending':
+                paid_at = timezone.now() - timedelta(minutes=rng.randint(1, 600))
+            payment = self.add_payment(rows, created_at, owner_index, tenant, unit, due_date, outcome, paid_at)
+            if outcome != 'completed':
+                continue
+
+            sequence = len(rows['payments'])
+            rows['invoices'].append(Invoice(
+                tenant=tenant, unit=unit, invoice_number=f'INV-DS-{owner_index}-{sequence}', amount=payment.amount,
+                rent_amount=unit.rent_amount, due_date=due_date, status='paid', payment=payment,
+            ))
+            created_at['invoices'].append(paid_at)
+            rows['payouts'].append(self.plan_payout(rng, owner_index, owner, payment, paid_at, sequence))
+            created_at['payouts'].append(paid_at + timedelta(minutes=1))
+            rows['activity_events'].append(ActivityEvent(
+                owner=owner, event_type='payment_completed', property=property_obj, unit=unit, tenant=tenant,
+                payment=payment, title=f'Payment from {tenant_name}',
+                subtitle=f'Unit {unit.unit_number} - ₹{payment.amount}', created_at=paid_at,
+            ))
+
+    def add_payment(self, rows, created_at, owner_index, tenant, unit, due_date, status, paid_at):
+        payment = Payment(
+            tenant=tenant,
+            unit=unit,
+            amount=unit.rent_amount,
+            payment_type='rent',
+            status=status,
+            payment_date=paid_at if status == 'completed' else None,
+            due_date=due_date,
+            merchant_order_id=f'DATASET_{owner_index}_{len(rows["payments"])}',
+        )
+        rows['payments'].append(payment)
+        created_at['payments'].append(paid_at)
+        return payment
+
+    def plan_payout(self, rng, owner_index, owner, payment, paid_at, sequence):
+        status = _weighted(rng, PAYOUT_OUTCOMES)[0]
+        payout = OwnerPayout(
+            payment=payment,
+            owner=owner,
+            amount=payment.amount,
+            status=status,
+            beneficiary_type=owner.payment_method,
+            cashfree_transfer_id=f'PAYOUT_DS_{owner_index}_{sequence}',
+        )
+        if status == 'completed':
+            payout.cashfree_utr = f'DSUTR{owner_index}{sequence:08d}'
+            payout.completed_at = paid_at + timedelta(hours=rng.randint(1, 30))
+        else:
+            # Retries used up, so nothing claims it again
+            payout.retry_count = payout.max_retries
+            payout.error_message = 'Beneficiary bank offline'
+        return payout
+
+    def assign_tenant_keys(self, tenant_keys):
+        """Give the keys unique codes without a query per key, as bulk_create skips TenantKey.save"""
+        alphabet = string.ascii_uppercase + string.digits
+        pending = tenant_keys
+        while pending:
+            for tenant_key in pending:
+                tenant_key.key = ''.join(random.choices(alphabet, k=8))
+            taken = set(TenantKey.objects.filter(key__in=[k.key for k in pending]).values_list('key', flat=True))
+            seen = set()
+            retry = []
+            for tenant_key in pending:
+                if tenant_key.key in taken or tenant_key.key in seen:
+                    retry.append(tenant_key)
+                seen.add(tenant_key.key)
+            pending = retry
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import time
+import uuid
+from decimal import Decimal
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from core.models import Owner, Property, Unit, Tenant, Payment
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the payment status stream: hold many concurrent long-poll waiters in one process, '
+        'complete their payments and measure how quickly each waiter is answered. '
+        'Creates temporary rows and deletes them afterwards; do not run against production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--waiters',
+            type=int,
+            default=300,
+            help='Concurrent waiting clients, one pending payment each (default: 300)',
+        )
+        parser.add_argument(
+            '--settle-seconds',
+            type=float,
+            default=2.0,
+            help='Seconds to let every waiter connect before payments complete (default: 2)',
+        )
+        parser.add_argument(
+            '--complete-rate',
+            type=float,
+            default=200,
+            help='Payments completed per second (default: 200)',
+        )
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write results to this file as JSON',
+        )
+
+    def handle(self, *args, **options):
+        run_id = uuid.uuid4().hex[:8]
+        self.stdout.write(f"Creating {options['waiters']} pending payments (run {run_id})...")
+        owner_user, tenant_user, token, payments = self._create_fixtures(run_id, options['waiters'])
+
+        try:
+            results = asyncio.run(self._run(token.key, payments, options))
+        finally:
+            Payment.objects.filter(merchant_order_id__startswith=f'LOADTEST_{run_id}_').delete()
+            owner_user.delete()
+            tenant_user.delete()
+
+        self.stdout.write(
+            f"Waiters: {results['waiters']}, answered with final state: {results['final']}, "
+            f"timed out/errors: {results['not_final']}"
+        )
+        self.stdout.write(
+            f"Completion-to-response latency p50/p95/p99/max: "
+            f"{results['latency_p50_ms']}/{results['latency_p95_ms']}/{results['latency_p99_ms']}/{results['latency_max_ms']} ms"
+        )
+        self.stdout.write(self.style.SUCCESS(f"Total duration: {results['duration_seconds']}s"))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Load test results saved to {options['output']}")
+
+    def _create_fixtures(self, run_id, count):
+        owner_user = User.objects.create_user(username=f'loadtest-owner-{run_id}', email=f'loadtest-owner-{run_id}@example.com')
+        owner = Owner.objects.create(
+            user=owner_user, phone='0000000000', address='Load test', city='City', state='State', pincode='000000'
+        )
+        property_obj = Property.objects.create(
+            owner=owner, name=f'Load test {run_id}', address='Load test', city='City', state='State',
+            pincode='000000', property_type='apartment'
+        )
+        unit = Unit.objects.create(
+            property=property_obj, unit_number='LT-1', unit_type='1BHK', rent_amount=Decimal('10000.00')
+        )
+        tenant_user = User.objects.create_user(username=f'loadtest-tenant-{run_id}', email=f'loadtest-tenant-{run_id}@example.com')
+        tenant = Tenant.objects.create(user=tenant_user)
+        token = Token.objects.create(user=tenant_user)
+
+        Payment.objects.bulk_create([
+            Payment(
+                tenant=tenant,
+                unit=unit,
+                amount=Decimal('100.00'),
+                payment_type='rent',
+                status='pending',
+                due_date=timezone.now().date(),
+                merchant_order_id=f'LOADTEST_{run_id}_{index}',
+            )
+            for index in range(count)
+        ])
+        payments = list(Payment.objects.filter(merchant_order_id__startswith=f'LOADTEST_{run_id}_'))
+        return owner_user, tenant_user, token, payments
+
+    async def _run(self, token, payments, options):
+        client = AsyncClient()
+        completed_at = {}
+        answered_at = {}
+        responses = {}
+
+        async def waiter(payment):
+            response = await client.get(
+                f'/api/payments/status-stream/{payment.merchant_order_id}/',
+                {'timeout': options['settle_seconds'] + len(payments) / options['complete_rate'] + 10},
+                AUTHORIZATION=f'Token {token}',
+            )
+            answered_at[payment.id] = time.monotonic()
+            responses[payment.id] = response.json() if response.status_code == 200 else {}
+
+        def complete(payment):
+            payment.status = 'completed'
+            payment.payment_date = timezone.now()
+            payment.save()
+
+        started = time.monotonic()
+        tasks = [asyncio.ensure_future(waiter(payment)) for payment in payments]
+        await asyncio.sleep(options['settle_seconds'])
+
+        interval = 1 / options['complete_rate']
+        for payment in payments:
+            completed_at[payment.id] = time.monotonic()
+            await sync_to_async(complete)(payment)
+            await asyncio.sleep(interval)
+
+        await asyncio.gather(*tasks)
+        duration = time.monotonic() - started
+
+        latencies = [
+            (answered_at[payment.id] - completed_at[payment.id]) * 1000
+            for payment in payments
+            if responses.get(payment.id, {}).get('is_final')
+        ]
+        return {
+            'waiters': len(payments),
+            'final': len(latencies),
+            'not_final': len(payments) - len(latencies),
+            'latency_p50_ms': round(_percentile(latencies, 50), 1),
+            'latency_p95_ms': round(_percentile(latencies, 95), 1),
+            'latency_p99_ms': round(_percentile(latencies, 99), 1),
+            'latency_max_ms': round(max(latencies), 1) if latencies else 0,
+            'duration_seconds': round(duration, 2),
+        }
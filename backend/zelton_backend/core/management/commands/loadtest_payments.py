@@ -0,0 +1,312 @@
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from rest_framework.authtoken.models import Token
+from core.models import Owner, Property, Unit, Tenant, TenantKey, OwnerPayout, PayoutJob, WebhookEvent
+from core.services.cashfree_payout_service import CashfreePayoutService
+from core.services.fake_gateways import FakePhonePeClient, webhook_authorization
+from core.services.phonepe_service import PhonePeService
+from core.services.reconciliation_service import TokenBucket, _percentile
+
+FINAL_STATES = {'COMPLETED', 'FAILED'}
+FAKE_GATEWAY_OPTIONS = {
+    'latency_ms': 'FAKE_GATEWAY_LATENCY_MS',
+    'rate_limit_rate': 'FAKE_GATEWAY_RATE_LIMIT_RATE',
+    'error_rate': 'FAKE_GATEWAY_ERROR_RATE',
+    'decline_rate': 'FAKE_GATEWAY_DECLINE_RATE',
+    'settle_seconds': 'FAKE_GATEWAY_SETTLE_SECONDS',
+}
+
+
+class LatencyRecorder:
+    """Latency samples and error counts per step, shared by the load threads"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples = {}
+        self.errors = {}
+
+    def record(self, step, seconds, ok=True):
+        with self._lock:
+            self.samples.setdefault(step, []).append(seconds)
+            if not ok:
+                self.errors[step] = self.errors.get(step, 0) + 1
+
+    def summary(self, duration):
+        return {
+            step: {
+                'requests': len(samples),
+                'errors': self.errors.get(step, 0),
+                'throughput_per_second': round(len(samples) / duration, 2) if duration else 0,
+                'p50_ms': round(_percentile(samples, 50) * 1000, 1),
+                'p95_ms': round(_percentile(samples, 95) * 1000, 1),
+                'p99_ms': round(_percentile(samples, 99) * 1000, 1),
+                'max_ms': round(max(samples) * 1000, 1),
+            }
+            for step, samples in sorted(self.samples.items())
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Run full rent-payment lifecycles (initiate, verify polling, webhook, webhook worker, payout job, '
+        'payout status polling) against the offline fake PhonePe and Cashfree clients and report '
+        'p50/p95/p99 latency and throughput per step. '
+        'Creates temporary rows and deletes them afterwards; do not run against production.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--payments',
+            type=int,
+            default=200,
+            help='Rent payment lifecycles, one tenant each (default: 200)',
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=20,
+            help='Tenants paying at the same time (default: 20)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Webhook, payout job and payout status worker threads (default: 4)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=1.0,
+            help='Seconds between a tenant\'s verify-payment polls (default: 1)',
+        )
+        parser.add_argument(
+            '--max-polls',
+            type=int,
+            default=30,
+            help='Verify-payment polls before a tenant gives up (default: 30)',
+        )
+        parser.add_argument(
+            '--payout-timeout',
+            type=float,
+            default=120.0,
+            help='Seconds to wait for payouts to reach a final status (default: 120)',
+        )
+        parser.add_argument('--latency-ms', type=int, help='Fake gateway latency (default: FAKE_GATEWAY_LATENCY_MS)')
+        parser.add_argument('--rate-limit-rate', type=float, help='Share of gateway calls answered with 429')
+        parser.add_argument('--error-rate', type=float, help='Share of gateway calls that fail')
+        parser.add_argument('--decline-rate', type=float, help='Share of orders and transfers that end FAILED')
+        parser.add_argument('--settle-seconds', type=float, help='Seconds until a fake order or transfer settles')
+        parser.add_argument(
+            '--output',
+            type=str,
+            help='Write results to this file as JSON',
+        )
+
+    def handle(self, *args, **options):
+        if not settings.DEBUG:
+            # Forcing the fakes on with DEBUG off could mean a production process accepting fake payments
+            raise CommandError('loadtest_payments only runs with DEBUG=True (development settings)')
+
+        overrides = {'FAKE_GATEWAYS': True}
+        for option, setting_name in FAKE_GATEWAY_OPTIONS.items():
+            if options[option] is not None:
+                overrides[setting_name] = options[option]
+
+        run_id = uuid.uuid4().hex[:8]
+        self.stdout.write(f"Creating {options['payments']} tenants (run {run_id})...")
+
+        with override_settings(**overrides):
+            self._reset_clients()
+            owner_user, tokens = self._create_fixtures(run_id, options['payments'])
+            merchant_order_ids = []
+            try:
+                results = self._run(tokens, merchant_order_ids, options)
+            finally:
+                WebhookEvent.objects.filter(merchant_order_id__in=merchant_order_ids).delete()
+                User.objects.filter(username__startswith=f'loadtest-{run_id}-').delete()
+                owner_user.delete()
+                self._reset_clients()
+
+        self.stdout.write(f"Lifecycles: {results['lifecycles']}, outcomes: {results['outcomes']}")
+        self.stdout.write(f"Payouts: {results['payouts']}")
+        for step, stats in results['steps'].items():
+            self.stdout.write(
+                f"{step:22} n={stats['requests']:<6} errors={stats['errors']:<5} {stats['throughput_per_second']:>8}/s  "
+                f"p50/p95/p99: {stats['p50_ms']}/{stats['p95_ms']}/{stats['p99_ms']} ms"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Total duration: {results['duration_seconds']}s ({results['lifecycles_per_second']} lifecycles/s)"
+        ))
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2)
+            self.stdout.write(f"Load test results saved to {options['output']}")
+
+    def _reset_clients(self):
+        """Drop cached gateway clients so the next call picks the fakes (or the real clients) per FAKE_GATEWAYS"""
+        PhonePeService.reset_client()
+        CashfreePayoutService._client_initialized = False
+        CashfreePayoutService._cashfree_client = None
+
+    def _create_fixtures(self, run_id, count):
+        owner_user = User.objects.create_user(username=f'loadtest-owner-{run_id}', email=f'loadtest-owner-{run_id}@example.com')
+        owner = Owner.objects.create(
+            user=owner_user, phone='0000000000', address='Load test', city='City', state='State', pincode='000000',
+            payment_method='upi', upi_id=f'loadtest-{run_id}@upi'
+        )
+        property_obj = Property.objects.create(
+            owner=owner, name=f'Load test {run_id}', address='Load test', city='City', state='State',
+            pincode='000000', property_type='apartment'
+        )
+
+        tokens = []
+        for index in range(count):
+            unit = Unit.objects.create(
+                property=property_obj, unit_number=f'LT-{index}', unit_type='1BHK', rent_amount=Decimal('10000.00')
+            )
+            tenant_user = User.objects.create_user(
+                username=f'loadtest-{run_id}-{index}', email=f'loadtest-{run_id}-{index}@example.com'
+            )
+            tenant = Tenant.objects.create(user=tenant_user)
+            # Joining through the unit's key gives the tenant a rent ledger to pay against
+            tenant_key = TenantKey.objects.get(unit=unit)
+            tenant_key.tenant = tenant
+            tenant_key.is_used = True
+            tenant_key.save()
+            tokens.append(Token.objects.create(user=tenant_user).key)
+        return owner_user, tokens
+
+    def _run(self, tokens, merchant_order_ids, options):
+        recorder = LatencyRecorder()
+        webhook_header = webhook_authorization(settings.PHONEPE_WEBHOOK_USERNAME, settings.PHONEPE_WEBHOOK_PASSWORD)
+        gateway = FakePhonePeClient()
+
+        def request(step, ok_statuses, method, *args, **kwargs):
+            started = time.monotonic()
+            response = method(*args, **kwargs)
+            recorder.record(step, time.monotonic() - started, ok=response.status_code in ok_statuses)
+            return response
+
+        def lifecycle(token):
+            client = Client(HTTP_AUTHORIZATION=f'Token {token}')
+            started = time.monotonic()
+            try:
+                response = request(
+                    'initiate_payment', (200,), client.post,
+                    '/api/payments/initiate_rent_payment/', {'amount': '1000.00'}, content_type='application/json'
+                )
+                if response.status_code != 200:
+                    return 'initiate_failed'
+                merchant_order_id = response.json()['merchant_order_id']
+                merchant_order_ids.append(merchant_order_id)
+
+                state = 'PENDING'
+                for _ in range(options['max_polls']):
+                    time.sleep(options['poll_interval'])
+                    response = request(
+                        'verify_payment', (200,), client.get, f'/api/payments/verify-payment/{merchant_order_id}/'
+                    )
+                    if response.status_code == 200 and response.json().get('state') in FINAL_STATES:
+                        state = response.json()['state']
+                        break
+                if state not in FINAL_STATES:
+                    return 'timed_out'
+
+                # PhonePe also posts the final state; the inbox must absorb it after verify settled the payment
+                request(
+                    'webhook', (200,), client.post, '/api/webhooks/phonepe-webhook/',
+                    gateway.webhook_body(merchant_order_id), content_type='application/json',
+                    HTTP_AUTHORIZATION=webhook_header
+                )
+                recorder.record('payment_lifecycle', time.monotonic() - started)
+                return state.lower()
+            except Exception:
+                return 'error'
+            finally:
+                connection.close()
+
+        started = time.monotonic()
+        outcomes = {}
+        with ThreadPoolExecutor(max_workers=max(1, options['concurrency'])) as executor:
+            for outcome in executor.map(lifecycle, tokens):
+                outcomes[outcome] = outcomes.get(outcome, 0) + 1
+        self.stdout.write(f"Payments done in {time.monotonic() - started:.1f}s, draining workers...")
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            self._drain_webhooks(recorder, executor)
+            self._drain_payout_jobs(recorder, executor)
+            payouts = self._poll_payouts(recorder, executor, merchant_order_ids, options)
+        duration = time.monotonic() - started
+
+        return {
+            'lifecycles': len(tokens),
+            'outcomes': outcomes,
+            'payouts': payouts,
+            'duration_seconds': round(duration, 2),
+            'lifecycles_per_second': round(len(tokens) / duration, 2) if duration else 0,
+            'fake_gateway': {setting_name: getattr(settings, setting_name) for setting_name in FAKE_GATEWAY_OPTIONS.values()},
+            'steps': recorder.summary(duration),
+        }
+
+    def _timed(self, recorder, step, func):
+        """Wrap a worker call so it records its latency and releases the thread's DB connection"""
+        def run(item):
+            started = time.monotonic()
+            try:
+                result = func(item)
+                ok = result.get('success', False)
+            except Exception:
+                ok = False
+            finally:
+                connection.close()
+            recorder.record(step, time.monotonic() - started, ok=ok)
+        return run
+
+    def _drain_webhooks(self, recorder, executor):
+        process = self._timed(recorder, 'webhook_worker', PhonePeService.process_webhook_event)
+        while True:
+            events = WebhookEvent.claim_due(limit=50)
+            if not events:
+                break
+            list(executor.map(process, events))
+
+    def _drain_payout_jobs(self, recorder, executor):
+        process = self._timed(recorder, 'payout_job', CashfreePayoutService.process_payout_job)
+        while True:
+            jobs = PayoutJob.claim_due(limit=20)
+            if not jobs:
+                break
+            list(executor.map(process, jobs))
+
+    def _poll_payouts(self, recorder, executor, merchant_order_ids, options):
+        """Poll Cashfree until every payout of this run is final or the timeout passes"""
+        payouts = OwnerPayout.objects.filter(payment__merchant_order_id__in=merchant_order_ids)
+        rate = getattr(settings, 'CASHFREE_STATUS_RATE_LIMIT', 10)
+        rate_limiter = TokenBucket(rate=rate, capacity=max(1, rate))
+        deadline = time.monotonic() + options['payout_timeout']
+
+        while time.monotonic() < deadline:
+            processing = list(payouts.filter(status='processing').exclude(cashfree_transfer_id=''))
+            if not processing:
+                break
+            time.sleep(1)
+            started = time.monotonic()
+            result = CashfreePayoutService.refresh_payout_statuses(processing, executor, rate_limiter)
+            recorder.record('payout_status_pass', time.monotonic() - started, ok=not result['outcomes'].get('error'))
+
+        counts = {}
+        for payout_status in payouts.values_list('status', flat=True):
+            counts[payout_status] = counts.get(payout_status, 0) + 1
+        return counts
@@ -0,0 +1,93 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from core.models import OwnerPayout
+from core.services.cashfree_payout_service import CashfreePayoutService
+from core.services.reconciliation_service import TokenBucket
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Refresh the Cashfree status of every payout still in processing'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Payouts checked and written back per batch (default: 200)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Concurrent Cashfree status calls (default: 8)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Status calls per second (default: CASHFREE_STATUS_RATE_LIMIT)',
+        )
+        parser.add_argument(
+            '--min-age-seconds',
+            type=int,
+            default=60,
+            help='Skip payouts initiated less than this many seconds ago (default: 60)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep polling instead of exiting after one pass',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=300.0,
+            help='Seconds between passes in --loop mode (default: 300)',
+        )
+
+    def handle(self, *args, **options):
+        rate = options['rate'] or getattr(settings, 'CASHFREE_STATUS_RATE_LIMIT', 10)
+        rate_limiter = TokenBucket(rate=rate, capacity=max(1, rate))
+
+        with ThreadPoolExecutor(max_workers=max(1, options['workers'])) as executor:
+            while True:
+                self.poll(executor, rate_limiter, options)
+                if not options['loop']:
+                    break
+                time.sleep(options['interval'])
+
+    def poll(self, executor, rate_limiter, options):
+        started = time.monotonic()
+        cutoff = timezone.now() - timezone.timedelta(seconds=options['min_age_seconds'])
+        checked = updated = 0
+        outcomes = {}
+        last_id = 0
+
+        while True:
+            # Keyset pagination on id, so payouts leaving processing do not shift the pages
+            batch = list(
+                OwnerPayout.objects.filter(
+                    status='processing', initiated_at__lt=cutoff, id__gt=last_id
+                ).exclude(cashfree_transfer_id='').order_by('id')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            result = CashfreePayoutService.refresh_payout_statuses(batch, executor, rate_limiter)
+            checked += result['checked']
+            updated += result['updated']
+            for outcome, count in result['outcomes'].items():
+                outcomes[outcome] = outcomes.get(outcome, 0) + count
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Checked {checked} processing payouts in {elapsed:.1f}s, updated {updated}: {outcomes}"
+        ))
+        logger.info(f"Payout status poll: checked={checked} updated={updated} outcomes={outcomes}")
@@ -0,0 +1,81 @@
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+from core.models import PayoutJob
+from core.services.cashfree_payout_service import CashfreePayoutService
+
+logger = logging.getLogger(__name__)
+
+
+def _run_job(job):
+    """Process one job on a pool thread, releasing the thread's DB connection afterwards"""
+    try:
+        return CashfreePayoutService.process_payout_job(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Drain queued owner payout jobs with bounded concurrency'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Maximum concurrent Cashfree payouts (default: 4)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=20,
+            help='Jobs claimed per batch (default: 20)',
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=300,
+            help='Seconds before a claimed job is considered abandoned and claimed again (default: 300)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new jobs instead of exiting when the queue is empty',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=2.0,
+            help='Seconds to wait between polls in --loop mode (default: 2)',
+        )
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        self.stdout.write(f"Processing payout jobs (workers={workers}, loop={options['loop']})")
+
+        processed = succeeded = 0
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                jobs = PayoutJob.claim_due(limit=options['batch_size'], lease_seconds=options['lease_seconds'])
+
+                if not jobs:
+                    if not options['loop']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                for result in executor.map(_run_job, jobs):
+                    processed += 1
+                    job = result['job']
+                    if result['success']:
+                        succeeded += 1
+                        self.stdout.write(self.style.SUCCESS(f"Payout job {job.id}: payout {job.payout_id} created"))
+                    else:
+                        self.stdout.write(self.style.ERROR(f"Payout job {job.id} ({job.status}): {result['error']}"))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Processed {processed} payout jobs ({succeeded} payouts created)')
+        )
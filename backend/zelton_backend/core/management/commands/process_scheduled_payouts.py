@@ -1,5 +1,9 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
 from django.core.management.base import BaseCommand
-from django.utils import timezone
+from django.db import connection
 from core.models import OwnerPayout
 from core.services.cashfree_payout_service import CashfreePayoutService
 import logging
@@ -7,26 +11,101 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _retry_payout(payout):
+    """Retry one claimed payout on a pool thread, releasing the thread's DB connection afterwards"""
+    try:
+        return payout, CashfreePayoutService.execute_payout(payout)
+    except Exception as e:
+        logger.error(f"Error retrying payout {payout.id}: {str(e)}")
+        return payout, {'success': False, 'error': str(e)}
+    finally:
+        connection.close()
+
+
 class Command(BaseCommand):
-    help = 'Process scheduled payout retries'
-    
-    def handle(self, *args, **options):
-        now = timezone.now()
-        
-        # Get payouts scheduled for retry
-        scheduled_payouts = OwnerPayout.objects.filter(
-            status='retry_scheduled',
-            next_retry_at__lte=now
+    help = (
+        'Process scheduled payout retries and settle batched payouts whose day has ended. '
+        'Several copies can run at once: each claims its own due payouts.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-limit',
+            type=int,
+            default=500,
+            help='Maximum batched payouts settled in one Cashfree batch transfer (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='Concurrent payout retries in this process (default: 4)',
+        )
+        parser.add_argument(
+            '--claim-size',
+            type=int,
+            default=20,
+            help='Due payouts claimed at a time (default: 20)',
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=300,
+            help='Seconds before a claimed retry is considered abandoned and claimed again (default: 300)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for due payouts instead of exiting when none are left',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=30.0,
+            help='Seconds to wait between polls in --loop mode (default: 30)',
         )
-        
-        self.stdout.write(f"Found {scheduled_payouts.count()} payouts to retry")
-        
-        for payout in scheduled_payouts:
-            self.stdout.write(f"Retrying payout {payout.id}...")
-            result = CashfreePayoutService.retry_failed_payout(payout.id)
-            
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while True:
+                retried = self.retry_due_payouts(executor, options)
+                self.settle_batches(options['batch_limit'])
+
+                if not options['loop']:
+                    break
+                if not retried:
+                    time.sleep(options['poll_interval'])
+
+    def retry_due_payouts(self, executor, options):
+        """Claim and retry due payouts until none are left; returns how many were retried"""
+        retried = 0
+        while True:
+            payouts = OwnerPayout.claim_due_retries(
+                limit=options['claim_size'], lease_seconds=options['lease_seconds']
+            )
+            if not payouts:
+                break
+
+            self.stdout.write(f"Claimed {len(payouts)} payouts to retry")
+            for payout, result in executor.map(_retry_payout, payouts):
+                retried += 1
+                if result['success']:
+                    self.stdout.write(self.style.SUCCESS(f"Payout {payout.id} retry successful"))
+                else:
+                    self.stdout.write(self.style.ERROR(f"Payout {payout.id} retry failed: {result['error']}"))
+
+        self.stdout.write(f"Retried {retried} payouts")
+        return retried
+
+    def settle_batches(self, batch_limit):
+        # Batches are also settled after switching back to instant mode, so none are left behind
+        if getattr(settings, 'CASHFREE_PAYOUT_MODE', 'instant') == 'batched' or OwnerPayout.objects.filter(status='accumulating').exists():
+            result = CashfreePayoutService.settle_payout_batches(limit=batch_limit)
             if result['success']:
-                self.stdout.write(self.style.SUCCESS(f"Payout {payout.id} retry successful"))
+                self.stdout.write(self.style.SUCCESS(
+                    f"Settled {result['settled']} batched payouts ({result['failed']} failed)"
+                ))
             else:
-                self.stdout.write(self.style.ERROR(f"Payout {payout.id} retry failed: {result['error']}"))
-
+                self.stdout.write(self.style.ERROR(f"Batch settlement failed: {result['error']}"))
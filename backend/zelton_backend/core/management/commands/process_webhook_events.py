@@ -0,0 +1,63 @@
+import time
+import logging
+
+from django.core.management.base import BaseCommand
+from core.models import WebhookEvent
+from core.services.phonepe_service import PhonePeService
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Apply stored PhonePe webhook events; several workers may run at once'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=50,
+            help='Events claimed per batch (default: 50)',
+        )
+        parser.add_argument(
+            '--lease-seconds',
+            type=int,
+            default=120,
+            help='Seconds before a claimed event is considered abandoned and claimed again (default: 120)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep running and poll for new events instead of exiting when the inbox is empty',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=0.5,
+            help='Seconds to wait between polls in --loop mode (default: 0.5)',
+        )
+
+    def handle(self, *args, **options):
+        processed = failed = 0
+
+        while True:
+            events = WebhookEvent.claim_due(limit=options['batch_size'], lease_seconds=options['lease_seconds'])
+
+            if not events:
+                if not options['loop']:
+                    break
+                time.sleep(options['poll_interval'])
+                continue
+
+            for event in events:
+                result = PhonePeService.process_webhook_event(event)
+                if result.get('success'):
+                    processed += 1
+                else:
+                    failed += 1
+                    self.stdout.write(self.style.ERROR(
+                        f"Webhook event {event.id} ({event.callback_type} {event.state} for {event.merchant_order_id}): {result.get('error')}"
+                    ))
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Applied {processed} webhook events ({failed} failed attempts)')
+        )
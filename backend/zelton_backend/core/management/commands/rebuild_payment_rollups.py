@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+from core.models import Owner, PaymentMonthlyRollup
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the monthly payment rollup table from the Payment table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--owner-id',
+            type=int,
+            help='Only rebuild rollups for the given owner',
+        )
+
+    def handle(self, *args, **options):
+        owner = None
+        if options['owner_id']:
+            owner = Owner.objects.filter(id=options['owner_id']).first()
+            if not owner:
+                raise CommandError(f"Owner {options['owner_id']} not found")
+
+        self.stdout.write('Rebuilding monthly payment rollups...')
+        bucket_count = PaymentMonthlyRollup.rebuild(owner=owner)
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Rebuilt {bucket_count} monthly rollup rows')
+        )
@@ -0,0 +1,60 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from core.models import TenantKey, TenantLedger
+
+
+class Command(BaseCommand):
+    help = 'Open rent ledgers for active tenancies, optionally rebuilding existing ledgers from payment history'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rebuild',
+            action='store_true',
+            help='Delete existing ledgers and rebuild them from tenant keys and completed payments',
+        )
+        parser.add_argument(
+            '--tenant-id',
+            type=int,
+            help='Only process the given tenant',
+        )
+
+    def handle(self, *args, **options):
+        tenant_keys = TenantKey.objects.filter(
+            is_used=True,
+            tenant__isnull=False,
+            unit__isnull=False
+        ).select_related('tenant__user', 'unit').order_by('tenant_id', 'id')
+        ledgers = TenantLedger.objects.all()
+
+        if options['tenant_id']:
+            tenant_keys = tenant_keys.filter(tenant_id=options['tenant_id'])
+            ledgers = ledgers.filter(tenant_id=options['tenant_id'])
+
+        if options['rebuild']:
+            deleted, _ = ledgers.delete()
+            self.stdout.write(f'Deleted {deleted} ledger rows')
+
+        opened_count = 0
+        seen_tenants = set()
+        for tenant_key in tenant_keys:
+            # A tenant is billed once, against their earliest active key
+            if tenant_key.tenant_id in seen_tenants:
+                continue
+            seen_tenants.add(tenant_key.tenant_id)
+
+            if TenantLedger.objects.filter(tenant_id=tenant_key.tenant_id, is_active=True).exists():
+                continue
+
+            with transaction.atomic():
+                ledger = TenantLedger.open_for_tenant_key(tenant_key).accrue_rent()
+                ledger.sync_unit_remaining_amount()
+            opened_count += 1
+
+            self.stdout.write(
+                f'Opened ledger for {tenant_key.tenant.user.email} '
+                f'(unit {tenant_key.unit.unit_number}): balance ₹{ledger.balance}'
+            )
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Opened {opened_count} rent ledgers')
+        )
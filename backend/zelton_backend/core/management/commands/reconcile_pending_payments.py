@@ -1,9 +1,9 @@
+import json
 import time
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from django.db.models import Q
-from core.models import PaymentTransaction, Payment, OwnerSubscriptionPayment
-from core.services.phonepe_service import PhonePeService
+from core.models import PaymentTransaction
+from core.services.reconciliation_service import ReconciliationEngine, TokenBucket, get_status_rate_limiter
 import logging
 
 logger = logging.getLogger(__name__)
@@ -24,115 +24,105 @@ class Command(BaseCommand):
             default=20,
             help='Minimum age in seconds before reconciliation starts (default: 20)',
         )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Maximum due transactions checked per sweep, oldest due first (default: 500)',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=8,
+            help='Orders checked concurrently (default: 8)',
+        )
+        parser.add_argument(
+            '--rate',
+            type=float,
+            help='Status checks per second across all workers (default: PHONEPE_STATUS_RATE_LIMIT)',
+        )
+        parser.add_argument(
+            '--max-attempts',
+            type=int,
+            default=3,
+            help='Checks per order in one sweep when rate limited or timing out (default: 3)',
+        )
+        parser.add_argument(
+            '--loop',
+            action='store_true',
+            help='Keep sweeping instead of exiting after one pass',
+        )
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=3.0,
+            help='Seconds between sweeps in --loop mode (default: 3)',
+        )
+        parser.add_argument(
+            '--metrics-file',
+            type=str,
+            help='Append the metrics of every sweep to this file as JSON lines',
+        )
 
     def handle(self, *args, **options):
         dry_run = options['dry_run']
-        max_age_seconds = options['max_age_seconds']
-        
+
         self.stdout.write(f"Starting payment reconciliation (dry_run={dry_run})")
-        
-        # Find all pending transactions older than max_age_seconds
-        cutoff_time = timezone.now() - timezone.timedelta(seconds=max_age_seconds)
-        
-        pending_transactions = PaymentTransaction.objects.filter(
-            status='initiated',
-            reconciliation_status__in=['not_started', 'in_progress'],
-            created_at__lt=cutoff_time
-        ).exclude(merchant_order_id__isnull=True)
-        
-        self.stdout.write(f"Found {pending_transactions.count()} pending transactions to reconcile")
-        
-        for transaction in pending_transactions:
-            self.reconcile_transaction(transaction, dry_run)
-        
+
+        rate_limiter = get_status_rate_limiter()
+        if options['rate']:
+            rate_limiter = TokenBucket(rate=options['rate'], capacity=max(1, options['rate'] * 2))
+
+        engine = ReconciliationEngine(
+            max_workers=options['workers'],
+            rate_limiter=rate_limiter,
+            max_attempts=options['max_attempts'],
+            dry_run=dry_run,
+        )
+
+        while True:
+            metrics = self.sweep(engine, options['max_age_seconds'], options['batch_size'])
+            self.report(metrics, options['metrics_file'])
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+
         self.stdout.write(self.style.SUCCESS('Payment reconciliation completed'))
 
-    def reconcile_transaction(self, transaction, dry_run):
-        """Reconcile a single transaction according to PhonePe schedule"""
-        merchant_order_id = transaction.merchant_order_id
-        
-        if not merchant_order_id:
-            self.stdout.write(f"Skipping transaction {transaction.id} - no merchant_order_id")
-            return
-        
-        # Calculate reconciliation interval based on PhonePe schedule
-        age_seconds = (timezone.now() - transaction.created_at).total_seconds()
-        
-        if age_seconds < 20:
-            # Too early to start reconciliation
-            return
-        
-        # Determine reconciliation interval based on age
-        if age_seconds <= 50:  # First 30 seconds after 20 seconds
-            interval_seconds = 3
-        elif age_seconds <= 110:  # Next 60 seconds
-            interval_seconds = 6
-        elif age_seconds <= 170:  # Next 60 seconds
-            interval_seconds = 10
-        elif age_seconds <= 230:  # Next 60 seconds
-            interval_seconds = 30
-        else:
-            interval_seconds = 60  # Every minute thereafter
-        
-        # Check if enough time has passed since last attempt
-        last_attempt_time = transaction.updated_at
-        time_since_last_attempt = (timezone.now() - last_attempt_time).total_seconds()
-        
-        if time_since_last_attempt < interval_seconds:
-            return  # Not time for next attempt yet
-        
-        self.stdout.write(f"Reconciling transaction {transaction.id} (attempt {transaction.payment_attempt_count + 1})")
-        
-        if dry_run:
-            self.stdout.write(f"DRY RUN: Would reconcile transaction {transaction.id}")
-            return
-        
-        try:
-            # Update attempt count
-            transaction.payment_attempt_count += 1
-            transaction.reconciliation_status = 'in_progress'
-            transaction.save()
-            
-            # Check payment status with PhonePe
-            phonepe_response = PhonePeService.verify_payment_status(merchant_order_id)
-            
-            if not phonepe_response['success']:
-                self.stdout.write(f"Error checking status for {merchant_order_id}: {phonepe_response['error']}")
-                return
-            
-            state = phonepe_response['state']
-            
-            if state == 'COMPLETED':
-                # Payment completed
-                result = PhonePeService.handle_payment_completed(merchant_order_id)
-                if result['success']:
-                    transaction.status = 'success'
-                    transaction.reconciliation_status = 'completed'
-                    transaction.save()
-                    self.stdout.write(f"Payment {merchant_order_id} completed successfully")
-                else:
-                    self.stdout.write(f"Error handling completed payment: {result['error']}")
-            
-            elif state == 'FAILED':
-                # Payment failed
-                result = PhonePeService.handle_payment_failed(merchant_order_id)
-                if result['success']:
-                    transaction.status = 'failed'
-                    transaction.reconciliation_status = 'completed'
-                    transaction.save()
-                    self.stdout.write(f"Payment {merchant_order_id} failed")
-                else:
-                    self.stdout.write(f"Error handling failed payment: {result['error']}")
-            
-            elif state == 'PENDING':
-                # Still pending, continue reconciliation
-                self.stdout.write(f"Payment {merchant_order_id} still pending")
-            
-            else:
-                self.stdout.write(f"Unknown payment state for {merchant_order_id}: {state}")
-                
-        except Exception as e:
-            self.stdout.write(f"Error reconciling transaction {transaction.id}: {str(e)}")
-            logger.error(f"Error reconciling transaction {transaction.id}: {str(e)}")
+    def sweep(self, engine, max_age_seconds, batch_size):
+        now = timezone.now()
+        cutoff_time = now - timezone.timedelta(seconds=max_age_seconds)
+
+        # Served by the (status, next_check_at) index: only rows that are due are read
+        due = list(
+            PaymentTransaction.objects.filter(
+                status='initiated',
+                next_check_at__lte=now,
+                reconciliation_status__in=['not_started', 'in_progress'],
+                created_at__lt=cutoff_time
+            ).exclude(merchant_order_id__isnull=True).exclude(merchant_order_id='')
+            .order_by('next_check_at')[:batch_size]
+        )
+        self.stdout.write(f"Found {len(due)} pending transactions due for reconciliation")
 
+        metrics = engine.run(due)
+        metrics['due'] = len(due)
+        if due:
+            metrics['oldest_due_lag_seconds'] = round((now - due[0].next_check_at).total_seconds(), 1)
+        return metrics
+
+    def report(self, metrics, metrics_file):
+        self.stdout.write(
+            f"Checked {metrics['orders']} orders in {metrics['elapsed_seconds']}s "
+            f"({metrics['orders_per_second']} orders/s, {metrics['gateway_calls']} gateway calls): {metrics['outcomes']}"
+        )
+        self.stdout.write(
+            f"Check latency p50/p95: {metrics['check_latency_p50_ms']}/{metrics['check_latency_p95_ms']} ms, "
+            f"queue wait p95: {metrics['queue_wait_p95_ms']} ms, "
+            f"resolution lag p50/max: {metrics['resolution_lag_p50_seconds']}/{metrics['resolution_lag_max_seconds']} s"
+        )
+        logger.info(f"Reconciliation sweep metrics: {json.dumps(metrics)}")
 
+        if metrics_file:
+            with open(metrics_file, 'a') as f:
+                f.write(json.dumps(metrics) + '\n')
@@ -0,0 +1,330 @@
+"""
+Per-request performance metrics.
+
+RequestMetricsMiddleware records, for every request and labelled by its resolved route, the wall
+time, number and total time of SQL queries, time spent in PhonePe and Cashfree calls (timed with
+gateway_timer) and the response size, into in-process histograms. Requests slower than
+SLOW_REQUEST_THRESHOLD_MS are logged together with their slowest SQL statements.
+
+Each worker process writes its histograms to METRICS_DIR/metrics-<pid>.json at most every
+METRICS_FLUSH_INTERVAL seconds. The /metrics view adds up the files of all workers (including the
+merged totals of exited workers, see merge_exited_worker) and renders them in the Prometheus text format.
+"""
+import contextvars
+import fcntl
+import heapq
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotFound
+
+logger = logging.getLogger(__name__)
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRICS = {
+    'zelton_http_request_duration_seconds': ('Wall time of HTTP requests', DURATION_BUCKETS),
+    'zelton_http_request_db_queries': ('SQL queries per HTTP request', QUERY_COUNT_BUCKETS),
+    'zelton_http_request_db_duration_seconds': ('SQL time per HTTP request', DURATION_BUCKETS),
+    'zelton_http_request_gateway_duration_seconds': ('Payment gateway time per HTTP request', DURATION_BUCKETS),
+    'zelton_http_response_size_bytes': ('HTTP response body size', SIZE_BUCKETS),
+    'zelton_gateway_call_duration_seconds': ('Duration of PhonePe and Cashfree API calls', DURATION_BUCKETS),
+}
+REQUESTS_TOTAL = 'zelton_http_requests_total'
+
+ARCHIVE_FILE = 'metrics-exited.json'
+
+
+class MetricsRegistry:
+    """Thread-safe histograms and counters of this process, keyed by metric name and label values"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.histograms = {}
+        self.counters = {}
+
+    def observe(self, name, labels, value):
+        buckets = METRICS[name][1]
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for index, bound in enumerate(buckets):
+                if value <= bound:
+                    histogram['buckets'][index] += 1
+            histogram['sum'] += value
+            histogram['count'] += 1
+
+    def increment(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """JSON-serialisable copy of the registry"""
+        with self._lock:
+            return {
+                'histograms': [
+                    [name, list(labels), dict(histogram, buckets=list(histogram['buckets']))]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+            }
+
+
+registry = MetricsRegistry()
+_last_flush = 0.0
+_flush_lock = threading.Lock()
+
+
+class RequestCollector:
+    """Measurements of the request being served, shared by its DB wrapper and gateway timers"""
+
+    def __init__(self, slow_sql_count):
+        self.query_count = 0
+        self.query_seconds = 0.0
+        self.gateway_seconds = 0.0
+        self.slow_sql_count = slow_sql_count
+        self.slowest_sql = []
+
+    def record_query(self, sql, seconds):
+        self.query_count += 1
+        self.query_seconds += seconds
+        if self.slow_sql_count:
+            entry = (seconds, self.query_count, sql)
+            if len(self.slowest_sql) < self.slow_sql_count:
+                heapq.heappush(self.slowest_sql, entry)
+            elif seconds > self.slowest_sql[0][0]:
+                heapq.heapreplace(self.slowest_sql, entry)
+
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    """Database execute wrapper timing every query run for the current request"""
+    collector = _current.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.record_query(sql, time.perf_counter() - started)
+
+
+def install_query_wrapper(sender, connection, **kwargs):
+    """connection_created receiver: time the queries of every new database connection"""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def gateway_timer(gateway, operation):
+    """Time an outbound PhonePe or Cashfree call, for the current request and per gateway operation"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        collector = _current.get()
+        if collector is not None:
+            collector.gateway_seconds += elapsed
+        if getattr(settings, 'METRICS_ENABLED', True):
+            registry.observe('zelton_gateway_call_duration_seconds', {'gateway': gateway, 'operation': operation}, elapsed)
+
+
+def start_request():
+    """Start collecting for a request; returns the token for finish_request"""
+    return _current.set(RequestCollector(getattr(settings, 'SLOW_REQUEST_SQL_COUNT', 3)))
+
+
+def finish_request(token, request, response, elapsed):
+    """Record a finished request's measurements and log it when slow"""
+    collector = _current.get()
+    _current.reset(token)
+
+    match = getattr(request, 'resolver_match', None)
+    route = (match.view_name or match.route) if match else 'unmatched'
+    if route == 'metrics':
+        return
+    if response.streaming:
+        size = int(response.get('Content-Length') or 0)
+    else:
+        size = len(response.content)
+
+    labels = {'route': route}
+    registry.increment(REQUESTS_TOTAL, {'route': route, 'method': request.method, 'status': str(response.status_code)})
+    registry.observe('zelton_http_request_duration_seconds', {'route': route, 'method': request.method}, elapsed)
+    registry.observe('zelton_http_request_db_queries', labels, collector.query_count)
+    registry.observe('zelton_http_request_db_duration_seconds', labels, collector.query_seconds)
+    registry.observe('zelton_http_request_gateway_duration_seconds', labels, collector.gateway_seconds)
+    registry.observe('zelton_http_response_size_bytes', labels, size)
+
+    if elapsed * 1000 >= getattr(settings, 'SLOW_REQUEST_THRESHOLD_MS', 1000):
+        slowest = sorted(collector.slowest_sql, reverse=True)
+        logger.warning(
+            f"Slow request {request.method} {request.path} ({route}) -> {response.status_code}: "
+            f"{elapsed * 1000:.0f} ms, {collector.query_count} queries in {collector.query_seconds * 1000:.0f} ms, "
+            f"gateway {collector.gateway_seconds * 1000:.0f} ms, {size} bytes" +
+            ''.join(f"\n  {seconds * 1000:.1f} ms: {sql[:500]}" for seconds, _, sql in slowest)
+        )
+
+    flush(force=False)
+
+
+def _metrics_dir():
+    return getattr(settings, 'METRICS_DIR', '')
+
+
+def _write_json(path, data):
+    """Write atomically, so readers never see a partial file"""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _directory_lock(directory, exclusive):
+    """Keep /metrics from reading a worker's totals twice while they are moved into the archive"""
+    with open(os.path.join(directory, '.lock'), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def flush(force=True):
+    """Write this process's registry to its file in METRICS_DIR, at most every METRICS_FLUSH_INTERVAL seconds"""
+    global _last_flush
+    directory = _metrics_dir()
+    if not directory:
+        return
+    now = time.monotonic()
+    if not force and now - _last_flush < getattr(settings, 'METRICS_FLUSH_INTERVAL', 5):
+        return
+    if not _flush_lock.acquire(blocking=False):
+        return
+    try:
+        _last_flush = now
+        os.makedirs(directory, exist_ok=True)
+        _write_json(os.path.join(directory, f'metrics-{os.getpid()}.json'), registry.snapshot())
+    except OSError as e:
+        logger.error(f"Could not write metrics to {directory}: {str(e)}")
+    finally:
+        _flush_lock.release()
+
+
+def _merge(total, snapshot):
+    for name, labels, histogram in snapshot.get('histograms', []):
+        key = (name, tuple(tuple(label) for label in labels))
+        merged = total['histograms'].setdefault(key, {'buckets': [0] * len(histogram['buckets']), 'sum': 0.0, 'count': 0})
+        merged['buckets'] = [a + b for a, b in zip(merged['buckets'], histogram['buckets'])]
+        merged['sum'] += histogram['sum']
+        merged['count'] += histogram['count']
+    for name, labels, value in snapshot.get('counters', []):
+        key = (name, tuple(tuple(label) for label in labels))
+        total['counters'][key] = total['counters'].get(key, 0) + value
+
+
+def _as_snapshot(total):
+    return {
+        'histograms': [[name, [list(label) for label in labels], h] for (name, labels), h in total['histograms'].items()],
+        'counters': [[name, [list(label) for label in labels], v] for (name, labels), v in total['counters'].items()],
+    }
+
+
+def merge_exited_worker(directory, pid):
+    """
+    Fold an exited worker's file into the archive of exited workers, so counters keep growing
+    across worker restarts without one file per worker ever started. Called by the gunicorn master.
+    """
+    path = os.path.join(directory, f'metrics-{pid}.json')
+    if not os.path.exists(path):
+        return
+    with _directory_lock(directory, exclusive=True):
+        total = {'histograms': {}, 'counters': {}}
+        for snapshot in (_read_json(os.path.join(directory, ARCHIVE_FILE)), _read_json(path)):
+            if snapshot:
+                _merge(total, snapshot)
+        _write_json(os.path.join(directory, ARCHIVE_FILE), _as_snapshot(total))
+        os.remove(path)
+
+
+def collect():
+    """Totals of every worker: the live registry of this process plus the files of the others"""
+    total = {'histograms': {}, 'counters': {}}
+    directory = _metrics_dir()
+    if directory and os.path.isdir(directory):
+        own_file = f'metrics-{os.getpid()}.json'
+        with _directory_lock(directory, exclusive=False):
+            for file_name in os.listdir(directory):
+                if file_name.startswith('metrics-') and file_name.endswith('.json') and file_name != own_file:
+                    snapshot = _read_json(os.path.join(directory, file_name))
+                    if snapshot:
+                        _merge(total, snapshot)
+    _merge(total, registry.snapshot())
+    return total
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def render(total):
+    """Prometheus text exposition format"""
+    lines = [
+        f'# HELP {REQUESTS_TOTAL} HTTP requests by route, method and status',
+        f'# TYPE {REQUESTS_TOTAL} counter',
+    ]
+    for (name, labels), value in sorted(total['counters'].items()):
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+
+    for name, (help_text, buckets) in METRICS.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for (metric_name, labels), histogram in sorted(total['histograms'].items()):
+            if metric_name != name:
+                continue
+            for bound, count in zip(buckets, histogram['buckets']):
+                lines.append(f'{name}_bucket{_format_labels(labels, [("le", bound)])} {count}')
+            lines.append(f'{name}_bucket{_format_labels(labels, [("le", "+Inf")])} {histogram["count"]}')
+            lines.append(f'{name}_sum{_format_labels(labels)} {histogram["sum"]}')
+            lines.append(f'{name}_count{_format_labels(labels)} {histogram["count"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint; requires METRICS_AUTH_TOKEN as a bearer token when one is configured"""
+    token = getattr(settings, 'METRICS_AUTH_TOKEN', '')
+    if token:
+        if request.headers.get('Authorization', '') != f'Bearer {token}':
+            return HttpResponseNotFound()
+    elif not settings.DEBUG:
+        return HttpResponseNotFound()
+    return HttpResponse(render(collect()), content_type='text/plain; version=0.0.4; charset=utf-8')
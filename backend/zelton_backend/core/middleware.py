@@ -1,6 +1,11 @@
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
 from django.utils.deprecation import MiddlewareMixin
 from django.conf import settings
 
+from . import metrics
+
 
 class DisableCSRFMiddleware(MiddlewareMixin):
     def process_request(self, request):
@@ -8,3 +13,36 @@ class DisableCSRFMiddleware(MiddlewareMixin):
         if request.path.startswith('/api/'):
             setattr(request, '_dont_enforce_csrf_checks', True)
         return None
+
+
+class RequestMetricsMiddleware:
+    """Record wall time, SQL, gateway time and response size of every request (see core.metrics)"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+        # Stay async for async views, so payment status waiters do not each hold a thread
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.enabled:
+            return self.get_response(request)
+        token = metrics.start_request()
+        started = time.perf_counter()
+        response = self.get_response(request)
+        metrics.finish_request(token, request, response, time.perf_counter() - started)
+        return response
+
+    async def __acall__(self, request):
+        if not self.enabled:
+            return await self.get_response(request)
+        token = metrics.start_request()
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        metrics.finish_request(token, request, response, time.perf_counter() - started)
+        return response
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.10 on 2026-10-17 03:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0023_merge_20251112_1433'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantLedger',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('move_in_date', models.DateField()),
+                ('accrued_through', models.DateField(blank=True, null=True)),
+                ('total_accrued', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_paid', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('balance', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('is_active', models.BooleanField(default=True)),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledgers', to='core.tenant')),
+                ('unit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ledgers', to='core.unit')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entry_type', models.CharField(choices=[('rent_accrual', 'Rent Accrual'), ('payment', 'Payment'), ('payment_reversal', 'Payment Reversal')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('balance_after', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('period', models.DateField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('ledger', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='core.tenantledger')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ledger_entries', to='core.payment')),
+            ],
+            options={
+                'ordering': ['created_at', 'id'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='tenantledger',
+            index=models.Index(fields=['tenant', 'is_active'], name='core_tenant_tenant__52abfa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenantledger',
+            index=models.Index(fields=['unit', 'is_active'], name='core_tenant_unit_id_f32e06_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tenantledger',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('tenant',), name='unique_active_ledger_per_tenant'),
+        ),
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['ledger', 'created_at'], name='core_ledger_ledger__f7ddcc_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ledgerentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('entry_type', 'rent_accrual')), fields=('ledger', 'period'), name='unique_rent_accrual_per_period'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:03
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_payment_rollups(apps, schema_editor):
+    """Populate monthly rollups from existing payments"""
+    from django.db.models import Count, Sum
+    from django.db.models.functions import Coalesce, TruncMonth
+    from django.utils import timezone
+    
+    Payment = apps.get_model('core', 'Payment')
+    PaymentMonthlyRollup = apps.get_model('core', 'PaymentMonthlyRollup')
+    
+    grouped = Payment.objects.filter(
+        status__in=['completed', 'pending', 'failed', 'cancelled']
+    ).annotate(
+        month=TruncMonth(Coalesce('payment_date', 'created_at'))
+    ).values('unit__property__owner_id', 'unit__property_id', 'month', 'status').annotate(
+        count=Count('id'), amount=Sum('amount')
+    ).order_by()
+    
+    buckets = {}
+    for row in grouped:
+        month = row['month']
+        month = (timezone.localtime(month) if timezone.is_aware(month) else month).date()
+        key = (row['unit__property__owner_id'], row['unit__property_id'], month)
+        rollup = buckets.setdefault(key, PaymentMonthlyRollup(owner_id=key[0], property_id=key[1], month=key[2]))
+        setattr(rollup, f"{row['status']}_count", row['count'])
+        setattr(rollup, f"{row['status']}_amount", row['amount'] or 0)
+    
+    PaymentMonthlyRollup.objects.bulk_create(buckets.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0024_tenantledger_ledgerentry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PaymentMonthlyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('completed_count', models.IntegerField(default=0)),
+                ('completed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('pending_count', models.IntegerField(default=0)),
+                ('pending_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('failed_count', models.IntegerField(default=0)),
+                ('failed_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('cancelled_count', models.IntegerField(default=0)),
+                ('cancelled_amount', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_rollups', to='core.owner')),
+                ('property', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payment_rollups', to='core.property')),
+            ],
+            options={
+                'ordering': ['owner', 'month'],
+                'indexes': [models.Index(fields=['owner', 'month'], name='core_paymen_owner_i_8571bc_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='paymentmonthlyrollup',
+            constraint=models.UniqueConstraint(fields=('owner', 'property', 'month'), name='unique_payment_rollup_bucket'),
+        ),
+        migrations.RunPython(backfill_payment_rollups, migrations.RunPython.noop),
+    ]
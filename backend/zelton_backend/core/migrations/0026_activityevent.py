@@ -0,0 +1,77 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def backfill_activity_events(apps, schema_editor):
+    """Seed the feed with existing tenant joins and completed payments"""
+    ActivityEvent = apps.get_model('core', 'ActivityEvent')
+    Payment = apps.get_model('core', 'Payment')
+    TenantKey = apps.get_model('core', 'TenantKey')
+    
+    def tenant_name(tenant):
+        return f"{tenant.user.first_name} {tenant.user.last_name}".strip() or tenant.user.email
+    
+    events = []
+    tenant_keys = TenantKey.objects.filter(
+        is_used=True, tenant__isnull=False
+    ).select_related('tenant__user', 'unit__property')
+    for tenant_key in tenant_keys.iterator():
+        events.append(ActivityEvent(
+            owner_id=tenant_key.unit.property.owner_id,
+            event_type='tenant_joined',
+            property_id=tenant_key.unit.property_id,
+            unit_id=tenant_key.unit_id,
+            tenant_id=tenant_key.tenant_id,
+            title=f'New tenant: {tenant_name(tenant_key.tenant)}',
+            subtitle=f'Joined {tenant_key.unit.property.name}',
+            created_at=tenant_key.used_at or tenant_key.created_at,
+        ))
+    
+    payments = Payment.objects.filter(status='completed').select_related('tenant__user', 'unit__property')
+    for payment in payments.iterator():
+        events.append(ActivityEvent(
+            owner_id=payment.unit.property.owner_id,
+            event_type='payment_completed',
+            property_id=payment.unit.property_id,
+            unit_id=payment.unit_id,
+            tenant_id=payment.tenant_id,
+            payment_id=payment.id,
+            title=f'Payment from {tenant_name(payment.tenant)}',
+            subtitle=f'Unit {payment.unit.unit_number} - ₹{payment.amount}',
+            created_at=payment.payment_date or payment.created_at,
+        ))
+    
+    ActivityEvent.objects.bulk_create(events, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0025_paymentmonthlyrollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ActivityEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_type', models.CharField(choices=[('payment_completed', 'Payment Completed'), ('tenant_joined', 'Tenant Joined'), ('tenant_left', 'Tenant Left'), ('proof_verified', 'Payment Proof Verified')], max_length=30)),
+                ('title', models.CharField(max_length=255)),
+                ('subtitle', models.CharField(blank=True, max_length=255)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='activity_events', to='core.owner')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='core.payment')),
+                ('property', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='core.property')),
+                ('tenant', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='core.tenant')),
+                ('unit', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='activity_events', to='core.unit')),
+            ],
+            options={
+                'ordering': ['-created_at', '-id'],
+                'indexes': [models.Index(fields=['owner', '-created_at', '-id'], name='core_activi_owner_i_fc08b7_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_activity_events, migrations.RunPython.noop),
+    ]
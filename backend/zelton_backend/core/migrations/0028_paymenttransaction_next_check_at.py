@@ -0,0 +1,34 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:16
+
+from datetime import timedelta
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def schedule_pending_transactions(apps, schema_editor):
+    """Schedule the first status check of every open transaction, 20s after it was created"""
+    PaymentTransaction = apps.get_model('core', 'PaymentTransaction')
+    PaymentTransaction.objects.filter(status='initiated').update(
+        next_check_at=F('created_at') + timedelta(seconds=20)
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0027_payoutjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='paymenttransaction',
+            name='next_check_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='paymenttransaction',
+            index=models.Index(fields=['status', 'next_check_at'], name='core_paymen_status_339d3a_idx'),
+        ),
+        migrations.RunPython(schedule_pending_transactions, migrations.RunPython.noop),
+    ]
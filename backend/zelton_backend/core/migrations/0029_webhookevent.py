@@ -0,0 +1,42 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:24
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0028_paymenttransaction_next_check_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebhookEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merchant_order_id', models.CharField(max_length=100)),
+                ('callback_type', models.CharField(max_length=50)),
+                ('state', models.CharField(blank=True, max_length=30)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('processing', 'Processing'), ('processed', 'Processed'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('delivery_count', models.IntegerField(default=1)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=5)),
+                ('available_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_until', models.DateTimeField(blank=True, null=True)),
+                ('last_error', models.TextField(blank=True)),
+                ('result', models.JSONField(blank=True, default=dict)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('processed_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'ordering': ['received_at', 'id'],
+                'indexes': [models.Index(fields=['status', 'available_at'], name='core_webhoo_status_47f620_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='webhookevent',
+            constraint=models.UniqueConstraint(fields=('merchant_order_id', 'callback_type', 'state'), name='unique_webhook_event'),
+        ),
+    ]
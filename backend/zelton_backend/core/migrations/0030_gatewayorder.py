@@ -0,0 +1,64 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def register_existing_orders(apps, schema_editor):
+    """Register every payment that already has a merchant order ID"""
+    GatewayOrder = apps.get_model('core', 'GatewayOrder')
+    Payment = apps.get_model('core', 'Payment')
+    OwnerPayment = apps.get_model('core', 'OwnerPayment')
+    PaymentTransaction = apps.get_model('core', 'PaymentTransaction')
+    
+    transactions = dict(
+        PaymentTransaction.objects.exclude(merchant_order_id__isnull=True).exclude(merchant_order_id='')
+        .values_list('merchant_order_id', 'id')
+    )
+    orders = []
+    for payment_id, merchant_order_id, phonepe_order_id in (
+        Payment.objects.exclude(merchant_order_id__isnull=True).exclude(merchant_order_id='')
+        .values_list('id', 'merchant_order_id', 'phonepe_order_id').iterator()
+    ):
+        orders.append(GatewayOrder(
+            merchant_order_id=merchant_order_id,
+            phonepe_order_id=phonepe_order_id or '',
+            order_type='tenant_payment',
+            payment_id=payment_id,
+            transaction_id=transactions.get(merchant_order_id),
+        ))
+    for owner_payment_id, merchant_order_id, phonepe_order_id in (
+        OwnerPayment.objects.exclude(merchant_order_id__isnull=True).exclude(merchant_order_id='')
+        .values_list('id', 'merchant_order_id', 'phonepe_order_id').iterator()
+    ):
+        orders.append(GatewayOrder(
+            merchant_order_id=merchant_order_id,
+            phonepe_order_id=phonepe_order_id or '',
+            order_type='owner_payment',
+            owner_payment_id=owner_payment_id,
+        ))
+    GatewayOrder.objects.bulk_create(orders, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0029_webhookevent'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GatewayOrder',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('merchant_order_id', models.CharField(max_length=100, unique=True)),
+                ('phonepe_order_id', models.CharField(blank=True, db_index=True, max_length=100)),
+                ('order_type', models.CharField(choices=[('tenant_payment', 'Tenant Payment'), ('owner_payment', 'Owner Payment')], max_length=20)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner_payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gateway_orders', to='core.ownerpayment')),
+                ('payment', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='gateway_orders', to='core.payment')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='gateway_orders', to='core.paymenttransaction')),
+            ],
+        ),
+        migrations.RunPython(register_existing_orders, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0030_gatewayorder'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CashfreeBeneficiary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('beneficiary_id', models.CharField(max_length=50, unique=True)),
+                ('details_hash', models.CharField(max_length=64)),
+                ('is_valid', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('owner', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='cashfree_beneficiary', to='core.owner')),
+            ],
+        ),
+    ]
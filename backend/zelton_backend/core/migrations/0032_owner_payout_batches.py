@@ -0,0 +1,60 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:34
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0031_cashfreebeneficiary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OwnerPayoutItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ownerpayout',
+            name='cashfree_batch_transfer_id',
+            field=models.CharField(blank=True, max_length=100),
+        ),
+        migrations.AddField(
+            model_name='ownerpayout',
+            name='settlement_window',
+            field=models.DateField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='ownerpayout',
+            name='payment',
+            field=models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='owner_payout', to='core.payment'),
+        ),
+        migrations.AlterField(
+            model_name='ownerpayout',
+            name='status',
+            field=models.CharField(choices=[('accumulating', 'Accumulating'), ('pending', 'Pending'), ('processing', 'Processing'), ('completed', 'Completed'), ('failed', 'Failed'), ('retry_scheduled', 'Retry Scheduled')], default='pending', max_length=20),
+        ),
+        migrations.AddIndex(
+            model_name='ownerpayout',
+            index=models.Index(fields=['status', 'settlement_window'], name='core_ownerp_status_c869e5_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='ownerpayout',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'accumulating')), fields=('owner', 'settlement_window'), name='unique_accumulating_owner_payout'),
+        ),
+        migrations.AddField(
+            model_name='ownerpayoutitem',
+            name='payment',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='payout_item', to='core.payment'),
+        ),
+        migrations.AddField(
+            model_name='ownerpayoutitem',
+            name='payout',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='core.ownerpayout'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 4.2.10 on 2026-10-17 04:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0032_owner_payout_batches'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ownerpayout',
+            name='locked_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='ownerpayout',
+            index=models.Index(fields=['status', 'locked_until'], name='core_ownerp_status_bdb737_idx'),
+        ),
+    ]
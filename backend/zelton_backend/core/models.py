@@ -4,9 +4,13 @@ from django.utils import timezone
 from django.db.models.signals import post_save, post_delete
 from django.db.models import Sum
 from django.dispatch import receiver
+import logging
 import uuid
 import random
 import string
+from datetime import timedelta
+
+logger = logging.getLogger(__name__)
 
 
 class Owner(models.Model):
@@ -245,7 +249,7 @@ class Unit(models.Model):
         return f"{self.property.name} - Unit {self.unit_number}"
     
     def update_remaining_amount(self, tenant=None):
-        """Update the remaining amount accumulating across months"""
+        """Update the remaining amount accumulating across months, read from the tenant's rent ledger"""
         if not tenant:
             # If no tenant specified, find the current tenant for this unit
             tenant_key = self.tenant_keys.filter(is_used=True).first()
@@ -255,39 +259,14 @@ class Unit(models.Model):
                 return
             tenant = tenant_key.tenant
         
-        # Calculate total rent owed from tenant's move-in date to current month
-        from django.utils import timezone
-        today = timezone.now().date()
-        
-        # Get tenant's move-in date
-        tenant_key = self.tenant_keys.filter(tenant=tenant, is_used=True).first()
-        if not tenant_key or not tenant_key.used_at:
+        ledger = TenantLedger.for_tenant(tenant)
+        if ledger is None or ledger.unit_id != self.id:
             self.remaining_amount = self.rent_amount
             self.save()
             return
         
-        move_in_date = tenant_key.used_at.date()
-        
-        # Calculate months from move-in to current month
-        months_owed = (today.year - move_in_date.year) * 12 + (today.month - move_in_date.month) + 1
-        
-        # Total rent owed = months_owed * monthly_rent
-        total_rent_owed = months_owed * self.rent_amount
-        
-        # Calculate total payments made by tenant
-        from django.db.models import Sum
-        total_payments_made = Payment.objects.filter(
-            tenant=tenant,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Remaining amount = Total rent owed - Total payments made
-        remaining = max(0, total_rent_owed - total_payments_made)
-        
-        self.remaining_amount = remaining
-        self.save()
-        
-        return remaining
+        self.remaining_amount = ledger.sync_unit_remaining_amount()
+        return self.remaining_amount
 
 
 class Tenant(models.Model):
@@ -343,7 +322,38 @@ class TenantKey(models.Model):
         return f"Key: {self.key} - {self.property.name}"
 
 
-class Payment(models.Model):
+class PaymentStatusMachine:
+    """Compare-and-set status transitions shared by Payment and OwnerPayment"""
+    STATUS_TRANSITIONS = {
+        'pending': {'completed', 'failed', 'cancelled'},
+    }
+    
+    @classmethod
+    def transition(cls, pk, to_status, **changes):
+        """
+        Move the payment to `to_status` if that is allowed from its current status.
+        Returns the saved instance when this call made the transition, or None when another
+        caller already did (or the transition is not allowed), so side effects run exactly once.
+        Call inside transaction.atomic() to commit the side effects together with the status.
+        """
+        from django.db import transaction
+        
+        with transaction.atomic():
+            # Row lock where the database supports it; the conditional update below decides the winner everywhere
+            instance = cls.objects.select_for_update().filter(pk=pk).first()
+            if instance is None or to_status not in cls.STATUS_TRANSITIONS.get(instance.status, ()):
+                return None
+            if not cls.objects.filter(pk=pk, status=instance.status).update(status=to_status):
+                return None
+            
+            instance.status = to_status
+            for field, value in changes.items():
+                setattr(instance, field, value)
+            instance.save()
+            return instance
+
+
+class Payment(PaymentStatusMachine, models.Model):
     PAYMENT_STATUS = [
         ('pending', 'Pending'),
         ('completed', 'Completed'),
@@ -375,6 +385,16 @@ class Payment(models.Model):
     def __str__(self):
         return f"Payment {self.id} - {self.tenant.user.email} - ₹{self.amount}"
     
+    ROLLUP_FIELDS = {'unit_id', 'status', 'amount', 'payment_date', 'created_at'}
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the loaded state so the monthly rollup can apply the exact delta on save
+        if cls.ROLLUP_FIELDS.issubset(field_names):
+            instance._rollup_state = PaymentMonthlyRollup.payment_state(instance)
+        return instance
+    
     @property
     def total_amount(self):
         """Total amount charged to tenant including gateway fees"""
@@ -384,32 +404,39 @@ class Payment(models.Model):
     @classmethod
     def calculate_monthly_due(cls, tenant, unit):
         """Calculate monthly due amount for a tenant based on rent owed vs payments made"""
-        today = timezone.now().date()
-        
-        # Calculate total rent owed (from tenant's move-in date to current month)
-        tenant_key = TenantKey.objects.filter(tenant=tenant, is_used=True).first()
-        if not tenant_key:
+        ledger = TenantLedger.for_tenant(tenant)
+        if ledger is None:
             return 0
         
-        # Get tenant's move-in date (when they joined the property)
-        move_in_date = tenant_key.used_at.date() if tenant_key.used_at else today
-        
-        # Calculate months from move-in to current month
-        months_owed = (today.year - move_in_date.year) * 12 + (today.month - move_in_date.month) + 1
+        return ledger.amount_due
+    
+    @classmethod
+    def calculate_total_due_for_properties(cls, properties):
+        """
+        Calculate the combined due amount of every active tenant in the given properties
+        from their rent ledgers. Tenancies that predate the ledger are opened on first use.
+        """
+        today = timezone.now().date()
         
-        # Total rent owed = months_owed * monthly_rent
-        total_rent_owed = months_owed * unit.rent_amount
+        # A tenant is billed once, against their earliest active key
+        unledgered_keys = TenantKey.objects.filter(
+            property__in=properties,
+            is_used=True,
+            tenant__isnull=False,
+            unit__isnull=False
+        ).exclude(tenant__ledgers__is_active=True).select_related('tenant', 'unit').order_by('tenant_id', 'id')
+        opened_tenants = set()
+        for tenant_key in unledgered_keys:
+            if tenant_key.tenant_id not in opened_tenants:
+                opened_tenants.add(tenant_key.tenant_id)
+                TenantLedger.open_for_tenant_key(tenant_key)
         
-        # Calculate total payments made by tenant
-        total_payments_made = cls.objects.filter(
-            tenant=tenant,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        total_due = 0
+        for ledger in TenantLedger.objects.filter(unit__property__in=properties, is_active=True):
+            ledger.accrue_rent(today)
+            total_due += ledger.amount_due
         
-        # Due amount = Total rent owed - Total payments made
-        due_amount = max(0, total_rent_owed - total_payments_made)
-        
-        return due_amount
+        return total_due
 
 
 class Invoice(models.Model):
@@ -454,6 +481,22 @@ class Invoice(models.Model):
     
     def __str__(self):
         return f"Invoice {self.invoice_number} - {self.tenant.user.email}"
+    
+    @classmethod
+    def issue_for_payment(cls, payment):
+        """Return the paid invoice of a completed payment, creating it if needed"""
+        invoice, _ = cls.objects.get_or_create(
+            payment=payment,
+            defaults={
+                'tenant': payment.tenant,
+                'unit': payment.unit,
+                'amount': payment.amount,
+                'rent_amount': payment.unit.rent_amount,
+                'due_date': payment.due_date,
+                'status': 'paid'
+            }
+        )
+        return invoice
 
 
 class PaymentProof(models.Model):
@@ -525,7 +568,7 @@ class ManualPaymentProof(models.Model):
         self.save()
         
         # Create a completed payment record
-        Payment.objects.create(
+        payment = Payment(
             tenant=self.tenant,
             unit=self.unit,
             amount=self.amount,
@@ -534,6 +577,11 @@ class ManualPaymentProof(models.Model):
             payment_date=self.verified_at,
             due_date=self.verified_at.date()
         )
+        # The owner's feed shows this approval as proof_verified only, not also as payment_completed
+        payment._completed_by_proof = True
+        payment.save(force_insert=True)
+        
+        ActivityEvent.record_proof_verified(self)
     
     def reject_payment(self, rejected_by, notes=""):
         """Mark payment as rejected"""
@@ -582,6 +630,12 @@ class PaymentTransaction(models.Model):
         ('failed', 'Failed'),
     ]
     
+    # PhonePe reconciliation schedule: first check 20s after creation, then every 3s until
+    # the order is 50s old, 6s until 110s, 10s until 170s, 30s until 230s, then every minute
+    FIRST_CHECK_DELAY = 20
+    CHECK_SCHEDULE = [(50, 3), (110, 6), (170, 10), (230, 30)]
+    FINAL_CHECK_INTERVAL = 60
+    
     merchant_order_id = models.CharField(max_length=100, unique=True, blank=True, null=True)
     phonepe_transaction_id = models.CharField(max_length=100, unique=True)
     phonepe_payment_id = models.CharField(max_length=100, blank=True)
@@ -598,8 +652,42 @@ class PaymentTransaction(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # When the reconciler should next ask PhonePe for this order's status; cleared once it leaves 'initiated'
+    next_check_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_check_at']),
+        ]
+    
     def __str__(self):
         return f"Transaction {self.phonepe_transaction_id} - {self.status}"
+    
+    def save(self, *args, **kwargs):
+        if self.status != 'initiated':
+            self.next_check_at = None
+        elif self.pk is None and self.next_check_at is None:
+            self.next_check_at = timezone.now() + timedelta(seconds=self.FIRST_CHECK_DELAY)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'status' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'next_check_at'}
+        super().save(*args, **kwargs)
+    
+    @classmethod
+    def check_interval(cls, age_seconds):
+        """Seconds to wait before the next status check of an order this old"""
+        for max_age, interval in cls.CHECK_SCHEDULE:
+            if age_seconds <= max_age:
+                return interval
+        return cls.FINAL_CHECK_INTERVAL
+    
+    def next_check_after(self, now=None):
+        """Next scheduled status check for an order checked at `now`"""
+        now = now or timezone.now()
+        first_check = self.created_at + timedelta(seconds=self.FIRST_CHECK_DELAY)
+        age_seconds = (now - self.created_at).total_seconds()
+        return max(first_check, now + timedelta(seconds=self.check_interval(age_seconds)))
 
 
 class PropertyImage(models.Model):
@@ -622,7 +710,7 @@ class UnitImage(models.Model):
         return f"Image for {self.unit.property.name} - Unit {self.unit.unit_number}"
 
 
-class OwnerPayment(models.Model):
+class OwnerPayment(PaymentStatusMachine, models.Model):
     """
     Comprehensive payment tracking model for all owner payments.
     This model handles both new and legacy payments gracefully.
@@ -767,8 +855,12 @@ class OwnerPayment(models.Model):
             return None
     
 class OwnerPayout(models.Model):
-    """Track automatic payouts to property owners from tenant rent payments"""
+    """
+    Track automatic payouts to property owners from tenant rent payments.
+    In batched mode one payout settles all of an owner's payments of a day, listed in its items.
+    """
     PAYOUT_STATUS = [
+        ('accumulating', 'Accumulating'),
         ('pending', 'Pending'),
         ('processing', 'Processing'),
         ('completed', 'Completed'),
@@ -776,14 +868,17 @@ class OwnerPayout(models.Model):
         ('retry_scheduled', 'Retry Scheduled'),
     ]
     
-    payment = models.OneToOneField('Payment', on_delete=models.CASCADE, related_name='owner_payout')
+    # Set for instant payouts; batched payouts list their payments as items
+    payment = models.OneToOneField('Payment', on_delete=models.CASCADE, related_name='owner_payout', null=True, blank=True)
     owner = models.ForeignKey(Owner, on_delete=models.CASCADE, related_name='received_payouts')
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=20, choices=PAYOUT_STATUS, default='pending')
     beneficiary_type = models.CharField(max_length=10)  # 'bank' or 'upi'
+    settlement_window = models.DateField(null=True, blank=True)
     
     # Cashfree specific fields
     cashfree_transfer_id = models.CharField(max_length=100, blank=True)
+    cashfree_batch_transfer_id = models.CharField(max_length=100, blank=True)
     cashfree_reference_id = models.CharField(max_length=100, blank=True)
     cashfree_utr = models.CharField(max_length=100, blank=True)
     cashfree_response = models.JSONField(default=dict, blank=True)
@@ -793,6 +888,8 @@ class OwnerPayout(models.Model):
     max_retries = models.IntegerField(default=3)
     last_retry_at = models.DateTimeField(null=True, blank=True)
     next_retry_at = models.DateTimeField(null=True, blank=True)
+    # Set while a retry worker holds the payout; an expired lease is claimed again
+    locked_until = models.DateTimeField(null=True, blank=True)
     
     # Timestamps
     initiated_at = models.DateTimeField(auto_now_add=True)
@@ -805,10 +902,994 @@ class OwnerPayout(models.Model):
             models.Index(fields=['owner', 'status']),
             models.Index(fields=['cashfree_transfer_id']),
             models.Index(fields=['status', 'next_retry_at']),
+            models.Index(fields=['status', 'settlement_window']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'settlement_window'],
+                condition=models.Q(status='accumulating'),
+                name='unique_accumulating_owner_payout'
+            ),
         ]
     
     def __str__(self):
         return f"Payout {self.id} - {self.owner.user.email} - ₹{self.amount} ({self.status})"
+    
+    @property
+    def is_batched(self):
+        return self.payment_id is None
+    
+    @property
+    def remarks(self):
+        """Transfer remarks shown to the owner by their bank"""
+        if self.payment_id:
+            return f"Rent payment for unit {self.payment.unit.unit_number}"
+        return f"Rent settlement for {self.settlement_window} ({self.items.count()} payments)"
+    
+    @classmethod
+    def for_payment(cls, payment):
+        """The payout settling a payment, instant or batched"""
+        payout = cls.objects.filter(payment=payment).first()
+        if payout is None:
+            item = OwnerPayoutItem.objects.filter(payment=payment).select_related('payout').first()
+            payout = item.payout if item else None
+        return payout
+    
+    @classmethod
+    def add_to_batch(cls, payment, owner):
+        """Add a completed payment to the owner's payout for today, creating it if needed"""
+        from django.db import IntegrityError, transaction
+        
+        while True:
+            window = timezone.localdate()
+            with transaction.atomic():
+                existing = OwnerPayoutItem.objects.filter(payment=payment).select_related('payout').first()
+                if existing:
+                    return existing.payout
+                
+                try:
+                    with transaction.atomic():
+                        batch, _ = cls.objects.get_or_create(
+                            owner=owner,
+                            settlement_window=window,
+                            status='accumulating',
+                            defaults={'amount': 0, 'beneficiary_type': owner.payment_method or ''}
+                        )
+                except IntegrityError:
+                    batch = cls.objects.filter(owner=owner, settlement_window=window, status='accumulating').first()
+                
+                # The settlement claim moves the batch out of accumulating under the same row lock
+                batch = batch and cls.objects.select_for_update().filter(pk=batch.pk, status='accumulating').first()
+                if batch is None:
+                    continue
+                
+                OwnerPayoutItem.objects.create(payout=batch, payment=payment, amount=payment.amount)
+                cls.objects.filter(pk=batch.pk).update(amount=models.F('amount') + payment.amount)
+                batch.refresh_from_db()
+                return batch
+    
+    @classmethod
+    def claim_due_retries(cls, limit=20, lease_seconds=300):
+        """
+        Claim up to `limit` payouts due for a retry, plus retries whose worker's lease expired.
+        Rows locked by another worker are skipped (SELECT ... FOR UPDATE SKIP LOCKED), and each claim
+        is a conditional update, so concurrent workers never take the same payout.
+        """
+        from django.db import transaction
+        
+        now = timezone.now()
+        with transaction.atomic():
+            due = list(
+                cls.objects.select_for_update(skip_locked=True).filter(
+                    models.Q(status='retry_scheduled', next_retry_at__lte=now) |
+                    models.Q(status='pending', locked_until__lt=now)
+                ).order_by('next_retry_at', 'id').values_list('id', 'status', 'locked_until')[:limit]
+            )
+            
+            claimed_ids = [
+                payout_id for payout_id, current_status, locked_until in due
+                if cls.objects.filter(id=payout_id, status=current_status, locked_until=locked_until).update(
+                    status='pending',
+                    locked_until=now + timedelta(seconds=lease_seconds),
+                    last_retry_at=now,
+                )
+            ]
+        return list(
+            cls.objects.filter(id__in=claimed_ids).select_related('owner__user', 'payment__unit').order_by('next_retry_at', 'id')
+        )
+    
+    @classmethod
+    def claim_for_retry(cls, payout_id, lease_seconds=300):
+        """Claim one failed or scheduled payout for an immediate retry; None if it is not retryable or already claimed"""
+        now = timezone.now()
+        if not cls.objects.filter(id=payout_id, status__in=['failed', 'retry_scheduled']).update(
+            status='pending',
+            locked_until=now + timedelta(seconds=lease_seconds),
+            last_retry_at=now,
+        ):
+            return None
+        return cls.objects.get(id=payout_id)
+    
+    @classmethod
+    def claim_closed_batches(cls, limit=500, lease_seconds=600):
+        """
+        Claim batched payouts whose window has ended, moving each from accumulating to pending once.
+        The lease hands them to the retry workers if settlement dies before sending them.
+        """
+        closed = cls.objects.filter(
+            status='accumulating', settlement_window__lt=timezone.localdate()
+        ).order_by('settlement_window', 'id').values_list('id', flat=True)[:limit]
+        
+        locked_until = timezone.now() + timedelta(seconds=lease_seconds)
+        claimed_ids = [
+            payout_id for payout_id in closed
+            if cls.objects.filter(id=payout_id, status='accumulating').update(status='pending', locked_until=locked_until)
+        ]
+        return list(cls.objects.filter(id__in=claimed_ids).select_related('owner__user'))
+
+
+class OwnerPayoutItem(models.Model):
+    """A tenant payment settled by a batched owner payout"""
+    payout = models.ForeignKey(OwnerPayout, on_delete=models.CASCADE, related_name='items')
+    payment = models.OneToOneField('Payment', on_delete=models.CASCADE, related_name='payout_item')
+    amount = models.DecimalField(max_digits=10, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"Payment {self.payment_id} in payout {self.payout_id} - ₹{self.amount}"
+
+
+class CashfreeBeneficiary(models.Model):
+    """Cashfree beneficiary registered for an owner, with a hash of the payout details it was registered with"""
+    PAYOUT_DETAIL_FIELDS = ('payment_method', 'account_number', 'ifsc_code', 'upi_id')
+    
+    owner = models.OneToOneField(Owner, on_delete=models.CASCADE, related_name='cashfree_beneficiary')
+    beneficiary_id = models.CharField(max_length=50, unique=True)
+    details_hash = models.CharField(max_length=64)
+    is_valid = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.beneficiary_id} ({'valid' if self.is_valid else 'stale'})"
+    
+    @classmethod
+    def details_hash_for(cls, owner):
+        """SHA-256 of the owner's bank/UPI details"""
+        import hashlib
+        
+        details = '|'.join(str(getattr(owner, field) or '').strip() for field in cls.PAYOUT_DETAIL_FIELDS)
+        return hashlib.sha256(details.encode()).hexdigest()
+    
+    @classmethod
+    def lookup(cls, owner):
+        """The registered beneficiary ID if it still matches the owner's details, else None"""
+        entry = cls.objects.filter(owner=owner, is_valid=True).only('beneficiary_id', 'details_hash').first()
+        if entry and entry.details_hash == cls.details_hash_for(owner):
+            return entry.beneficiary_id
+        return None
+    
+    @classmethod
+    def beneficiary_id_for(cls, owner):
+        """
+        Cashfree beneficiary ID to register for the owner's current details.
+        The first registration keeps the original OWNER_<id>; after a change the ID carries the
+        details hash, because Cashfree beneficiaries cannot be repointed to a new account.
+        """
+        details_hash = cls.details_hash_for(owner)
+        entry = cls.objects.filter(owner=owner).first()
+        if entry is None or entry.details_hash == details_hash:
+            return entry.beneficiary_id if entry else f"OWNER_{owner.id}"
+        return f"OWNER_{owner.id}_{details_hash[:12]}"
+    
+    @classmethod
+    def record(cls, owner, beneficiary_id):
+        cls.objects.update_or_create(
+            owner=owner,
+            defaults={
+                'beneficiary_id': beneficiary_id,
+                'details_hash': cls.details_hash_for(owner),
+                'is_valid': True,
+            }
+        )
+    
+    @classmethod
+    def invalidate_if_changed(cls, owner):
+        """Mark the owner's beneficiary stale when their payout details no longer match it"""
+        return cls.objects.filter(owner=owner, is_valid=True).exclude(
+            details_hash=cls.details_hash_for(owner)
+        ).update(is_valid=False)
+
+
+class TenantLedger(models.Model):
+    """Running rent balance for a single tenancy, updated incrementally as rent accrues and payments complete"""
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='ledgers')
+    unit = models.ForeignKey(Unit, on_delete=models.CASCADE, related_name='ledgers')
+    move_in_date = models.DateField()
+    
+    # First day of the latest month rent has been accrued for
+    accrued_through = models.DateField(null=True, blank=True)
+    
+    total_accrued = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    total_paid = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    balance = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    
+    is_active = models.BooleanField(default=True)
+    closed_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'is_active']),
+            models.Index(fields=['unit', 'is_active']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant'],
+                condition=models.Q(is_active=True),
+                name='unique_active_ledger_per_tenant'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"Ledger {self.id} - {self.tenant.user.email} - Unit {self.unit.unit_number} (₹{self.balance})"
+    
+    @property
+    def amount_due(self):
+        """Outstanding rent, never negative (advance payments are carried as credit)"""
+        return max(0, self.balance)
+    
+    @staticmethod
+    def _month_start(value):
+        return value.replace(day=1)
+    
+    @staticmethod
+    def _next_month(value):
+        if value.month == 12:
+            return value.replace(year=value.year + 1, month=1)
+        return value.replace(month=value.month + 1)
+    
+    @classmethod
+    def for_tenant(cls, tenant, accrue=True):
+        """Return the tenant's active ledger with rent accrued to date, opening one from history if needed"""
+        ledger = cls.objects.select_related('unit').filter(tenant=tenant, is_active=True).first()
+        if ledger is None:
+            tenant_key = TenantKey.objects.select_related('unit').filter(
+                tenant=tenant, is_used=True
+            ).order_by('id').first()
+            if not tenant_key or not tenant_key.unit:
+                return None
+            ledger = cls.open_for_tenant_key(tenant_key)
+        if accrue:
+            ledger.accrue_rent()
+        return ledger
+    
+    @classmethod
+    def for_tenants(cls, tenants):
+        """Return {tenant_id: active ledger} for many tenants, accruing rent and opening missing ledgers"""
+        tenants = list(tenants)
+        ledgers = {
+            ledger.tenant_id: ledger
+            for ledger in cls.objects.select_related('unit').filter(
+                tenant__in=tenants, is_active=True
+            )
+        }
+        for tenant in tenants:
+            tenant_id = tenant.pk if isinstance(tenant, models.Model) else tenant
+            if tenant_id in ledgers:
+                ledgers[tenant_id].accrue_rent()
+                continue
+            tenant_key = TenantKey.objects.select_related('tenant', 'unit').filter(
+                tenant_id=tenant_id, is_used=True
+            ).order_by('id').first()
+            if tenant_key and tenant_key.unit:
+                ledgers[tenant_id] = cls.open_for_tenant_key(tenant_key).accrue_rent()
+        return ledgers
+    
+    @classmethod
+    def open_for_tenant_key(cls, tenant_key):
+        """
+        Open the ledger for a newly used tenant key. Completed payments of the tenant that are not
+        yet recorded in any ledger are carried in, so existing tenancies keep their current balance.
+        """
+        from django.db import IntegrityError, transaction
+        
+        today = timezone.now().date()
+        move_in_date = timezone.localdate(tenant_key.used_at) if tenant_key.used_at else today
+        
+        try:
+            with transaction.atomic():
+                ledger = cls.objects.create(
+                    tenant=tenant_key.tenant,
+                    unit=tenant_key.unit,
+                    move_in_date=move_in_date,
+                )
+                
+                unrecorded_payments = Payment.objects.filter(
+                    tenant=tenant_key.tenant,
+                    status='completed',
+                    ledger_entries__isnull=True
+                ).order_by('created_at', 'id')
+                
+                entries = []
+                for payment in unrecorded_payments:
+                    ledger.total_paid += payment.amount
+                    ledger.balance -= payment.amount
+                    entries.append(LedgerEntry(
+                        ledger=ledger,
+                        entry_type='payment',
+                        amount=-payment.amount,
+                        payment=payment,
+                        balance_after=ledger.balance,
+                    ))
+                if entries:
+                    LedgerEntry.objects.bulk_create(entries)
+                    ledger.save(update_fields=['total_paid', 'balance', 'updated_at'])
+        except IntegrityError:
+            # Another request opened the tenant's ledger concurrently
+            ledger = cls.objects.select_related('unit').get(tenant=tenant_key.tenant, is_active=True)
+        
+        return ledger
+    
+    @classmethod
+    def close_for_tenant(cls, tenant_id, unit_id=None):
+        """Close the tenant's active ledger when they leave a unit"""
+        ledgers = cls.objects.filter(tenant_id=tenant_id, is_active=True)
+        if unit_id:
+            ledgers = ledgers.filter(unit_id=unit_id)
+        return ledgers.update(is_active=False, closed_at=timezone.now(), updated_at=timezone.now())
+    
+    def accrue_rent(self, today=None):
+        """Post one rent accrual entry for every month that has started since the last accrual"""
+        from django.db import transaction
+        
+        current_month = self._month_start(today or timezone.now().date())
+        if self.accrued_through and self.accrued_through >= current_month:
+            return self
+        
+        with transaction.atomic():
+            ledger = TenantLedger.objects.select_for_update().select_related('unit').get(pk=self.pk)
+            
+            month = (
+                self._next_month(ledger.accrued_through) if ledger.accrued_through
+                else self._month_start(ledger.move_in_date)
+            )
+            rent_amount = ledger.unit.rent_amount
+            entries = []
+            while month <= current_month:
+                ledger.total_accrued += rent_amount
+                ledger.balance += rent_amount
+                entries.append(LedgerEntry(
+                    ledger=ledger,
+                    entry_type='rent_accrual',
+                    amount=rent_amount,
+                    period=month,
+                    balance_after=ledger.balance,
+                ))
+                ledger.accrued_through = month
+                month = self._next_month(month)
+            
+            if entries:
+                LedgerEntry.objects.bulk_create(entries)
+                ledger.save(update_fields=['accrued_through', 'total_accrued', 'balance', 'updated_at'])
+        
+        self.accrued_through = ledger.accrued_through
+        self.total_accrued = ledger.total_accrued
+        self.balance = ledger.balance
+        self.updated_at = ledger.updated_at
+        return self
+    
+    @classmethod
+    def record_payment(cls, payment):
+        """
+        Apply a payment's status to the ledger exactly once: a completed payment is posted as a
+        credit, and a previously posted payment that is no longer completed is reversed.
+        """
+        from django.db import transaction
+        
+        should_record = payment.status == 'completed'
+        
+        with transaction.atomic():
+            if should_record:
+                ledger = cls.for_tenant(payment.tenant, accrue=False)
+            else:
+                # Reverse on the ledger that recorded the payment, even if that tenancy has ended
+                last_entry = LedgerEntry.objects.filter(payment=payment).order_by('-id').first()
+                ledger = last_entry.ledger if last_entry and last_entry.entry_type == 'payment' else None
+            if ledger is None:
+                return None
+            
+            # Re-check under the ledger lock so concurrent saves of the same payment post once
+            ledger = cls.objects.select_for_update().select_related('unit').get(pk=ledger.pk)
+            last_entry = LedgerEntry.objects.filter(payment=payment).order_by('-id').first()
+            is_recorded = last_entry is not None and last_entry.entry_type == 'payment'
+            if is_recorded == should_record:
+                return ledger
+            
+            if should_record:
+                entry_type, amount = 'payment', -payment.amount
+            else:
+                entry_type, amount = 'payment_reversal', payment.amount
+            
+            ledger.total_paid -= amount
+            ledger.balance += amount
+            LedgerEntry.objects.create(
+                ledger=ledger,
+                entry_type=entry_type,
+                amount=amount,
+                payment=payment,
+                balance_after=ledger.balance,
+            )
+            ledger.save(update_fields=['total_paid', 'balance', 'updated_at'])
+        
+        return ledger
+    
+    def sync_unit_remaining_amount(self):
+        """Copy the ledger's outstanding amount onto the unit's denormalised remaining_amount"""
+        remaining = self.amount_due
+        Unit.objects.filter(pk=self.unit_id).exclude(remaining_amount=remaining).update(
+            remaining_amount=remaining
+        )
+        return remaining
+
+
+class LedgerEntry(models.Model):
+    """Single movement on a tenant ledger; positive amounts increase the balance owed"""
+    ENTRY_TYPES = [
+        ('rent_accrual', 'Rent Accrual'),
+        ('payment', 'Payment'),
+        ('payment_reversal', 'Payment Reversal'),
+    ]
+    
+    ledger = models.ForeignKey(TenantLedger, on_delete=models.CASCADE, related_name='entries')
+    entry_type = models.CharField(max_length=20, choices=ENTRY_TYPES)
+    amount = models.DecimalField(max_digits=12, decimal_places=2)
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2)
+    
+    # Month the rent accrual covers (first day of the month)
+    period = models.DateField(null=True, blank=True)
+    payment = models.ForeignKey(
+        'Payment', on_delete=models.SET_NULL, null=True, blank=True, related_name='ledger_entries'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['created_at', 'id']
+        indexes = [
+            models.Index(fields=['ledger', 'created_at']),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['ledger', 'period'],
+                condition=models.Q(entry_type='rent_accrual'),
+                name='unique_rent_accrual_per_period'
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_entry_type_display()} ₹{self.amount} on ledger {self.ledger_id}"
+
+
+class PaymentMonthlyRollup(models.Model):
+    """Per-owner, per-property monthly payment counts and sums by status, maintained as payments change"""
+    TRACKED_STATUSES = ['completed', 'pending', 'failed', 'cancelled']
+    
+    owner = models.ForeignKey(Owner, on_delete=models.CASCADE, related_name='payment_rollups')
+    property = models.ForeignKey(Property, on_delete=models.CASCADE, related_name='payment_rollups')
+    # First day of the month; payment_date when set, otherwise created_at
+    month = models.DateField()
+    
+    completed_count = models.IntegerField(default=0)
+    completed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    pending_count = models.IntegerField(default=0)
+    pending_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    failed_count = models.IntegerField(default=0)
+    failed_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    cancelled_count = models.IntegerField(default=0)
+    cancelled_amount = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['owner', 'month']
+        indexes = [
+            models.Index(fields=['owner', 'month']),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['owner', 'property', 'month'], name='unique_payment_rollup_bucket'),
+        ]
+    
+    def __str__(self):
+        return f"Rollup {self.owner_id}/{self.property_id} {self.month:%b %Y} - ₹{self.completed_amount} completed"
+    
+    @staticmethod
+    def bucket_month(payment):
+        """Month a payment is counted in"""
+        bucket_date = payment.payment_date or payment.created_at or timezone.now()
+        return timezone.localtime(bucket_date).date().replace(day=1)
+    
+    @classmethod
+    def payment_state(cls, payment):
+        """Snapshot of the payment fields the rollup depends on"""
+        if payment.status not in cls.TRACKED_STATUSES or not payment.unit_id:
+            return None
+        return (payment.unit_id, cls.bucket_month(payment), payment.status, payment.amount)
+    
+    @classmethod
+    def apply_change(cls, old_state, new_state):
+        """Move a payment between rollup buckets: remove its previous state and add its current one"""
+        from django.db import transaction
+        
+        if old_state == new_state:
+            return
+        
+        with transaction.atomic():
+            if old_state:
+                cls._apply(old_state, -1)
+            if new_state:
+                cls._apply(new_state, 1)
+    
+    @classmethod
+    def _apply(cls, state, sign):
+        from django.db.models import F
+        
+        unit_id, month, status, amount = state
+        unit = Unit.objects.filter(pk=unit_id).values('property_id', 'property__owner_id').first()
+        if not unit:
+            return
+        
+        rollup, _ = cls.objects.get_or_create(
+            owner_id=unit['property__owner_id'],
+            property_id=unit['property_id'],
+            month=month
+        )
+        cls.objects.filter(pk=rollup.pk).update(**{
+            f'{status}_count': F(f'{status}_count') + sign,
+            f'{status}_amount': F(f'{status}_amount') + sign * amount,
+            'updated_at': timezone.now(),
+        })
+    
+    @classmethod
+    def rebuild(cls, owner=None):
+        """Recompute rollup rows from the Payment table"""
+        from django.db import transaction
+        from django.db.models import Count
+        from django.db.models.functions import Coalesce, TruncMonth
+        
+        payments = Payment.objects.filter(status__in=cls.TRACKED_STATUSES)
+        rollups = cls.objects.all()
+        if owner is not None:
+            payments = payments.filter(unit__property__owner=owner)
+            rollups = rollups.filter(owner=owner)
+        
+        grouped = payments.annotate(
+            month=TruncMonth(Coalesce('payment_date', 'created_at'))
+        ).values('unit__property__owner_id', 'unit__property_id', 'month', 'status').annotate(
+            count=Count('id'), amount=Sum('amount')
+        ).order_by()
+        
+        buckets = {}
+        for row in grouped:
+            month = row['month']
+            month = (timezone.localtime(month) if timezone.is_aware(month) else month).date()
+            key = (row['unit__property__owner_id'], row['unit__property_id'], month)
+            rollup = buckets.setdefault(key, cls(owner_id=key[0], property_id=key[1], month=key[2]))
+            setattr(rollup, f"{row['status']}_count", row['count'])
+            setattr(rollup, f"{row['status']}_amount", row['amount'] or 0)
+        
+        with transaction.atomic():
+            rollups.delete()
+            cls.objects.bulk_create(buckets.values(), batch_size=500)
+        
+        return len(buckets)
+
+
+class ActivityEvent(models.Model):
+    """Append-only log of owner-facing events, read by the recent activity feed"""
+    EVENT_TYPES = [
+        ('payment_completed', 'Payment Completed'),
+        ('tenant_joined', 'Tenant Joined'),
+        ('tenant_left', 'Tenant Left'),
+        ('proof_verified', 'Payment Proof Verified'),
+    ]
+    
+    # Icon and colour shown by the mobile app for each event type
+    EVENT_DISPLAY = {
+        'payment_completed': ('card', 'success'),
+        'tenant_joined': ('person-add', 'primary'),
+        'tenant_left': ('person-remove', 'warning'),
+        'proof_verified': ('checkmark-circle', 'success'),
+    }
+    
+    owner = models.ForeignKey(Owner, on_delete=models.CASCADE, related_name='activity_events')
+    event_type = models.CharField(max_length=30, choices=EVENT_TYPES)
+    property = models.ForeignKey(Property, on_delete=models.SET_NULL, null=True, blank=True, related_name='activity_events')
+    unit = models.ForeignKey(Unit, on_delete=models.SET_NULL, null=True, blank=True, related_name='activity_events')
+    tenant = models.ForeignKey(Tenant, on_delete=models.SET_NULL, null=True, blank=True, related_name='activity_events')
+    payment = models.ForeignKey('Payment', on_delete=models.SET_NULL, null=True, blank=True, related_name='activity_events')
+    
+    # Display text is captured when the event happens so the feed never joins back to its sources
+    title = models.CharField(max_length=255)
+    subtitle = models.CharField(max_length=255, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_event_type_display()} - {self.title}"
+    
+    def get_display_style(self):
+        """Return the (icon, color) pair for the event type"""
+        return self.EVENT_DISPLAY.get(self.event_type, ('notifications', 'primary'))
+    
+    @staticmethod
+    def _tenant_name(tenant):
+        return tenant.user.get_full_name() or tenant.user.email
+    
+    @classmethod
+    def record(cls, event_type, unit, title, subtitle='', tenant=None, payment=None, created_at=None):
+        """Append an event for the owner of the given unit"""
+        property_obj = unit.property
+        return cls.objects.create(
+            owner_id=property_obj.owner_id,
+            event_type=event_type,
+            property=property_obj,
+            unit=unit,
+            tenant=tenant,
+            payment=payment,
+            title=title,
+            subtitle=subtitle,
+            created_at=created_at or timezone.now(),
+        )
+    
+    @classmethod
+    def record_payment_completed(cls, payment):
+        return cls.record(
+            'payment_completed',
+            payment.unit,
+            title=f'Payment from {cls._tenant_name(payment.tenant)}',
+            subtitle=f'Unit {payment.unit.unit_number} - ₹{payment.amount}',
+            tenant=payment.tenant,
+            payment=payment,
+        )
+    
+    @classmethod
+    def record_tenant_joined(cls, tenant_key):
+        return cls.record(
+            'tenant_joined',
+            tenant_key.unit,
+            title=f'New tenant: {cls._tenant_name(tenant_key.tenant)}',
+            subtitle=f'Joined {tenant_key.unit.property.name}',
+            tenant=tenant_key.tenant,
+        )
+    
+    @classmethod
+    def record_tenant_left(cls, tenant, unit):
+        return cls.record(
+            'tenant_left',
+            unit,
+            title=f'Tenant left: {cls._tenant_name(tenant)}',
+            subtitle=f'Unit {unit.unit_number} - {unit.property.name}',
+            tenant=tenant,
+        )
+    
+    @classmethod
+    def record_proof_verified(cls, proof):
+        return cls.record(
+            'proof_verified',
+            proof.unit,
+            title=f'Payment proof verified for {cls._tenant_name(proof.tenant)}',
+            subtitle=f'Unit {proof.unit.unit_number} - ₹{proof.amount}',
+            tenant=proof.tenant,
+        )
+
+
+class PayoutJob(models.Model):
+    """Outbox row written with a completed rent payment; a worker turns it into an owner payout"""
+    JOB_STATUS = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    
+    payment = models.OneToOneField('Payment', on_delete=models.CASCADE, related_name='payout_job')
+    payout = models.ForeignKey(OwnerPayout, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    status = models.CharField(max_length=20, choices=JOB_STATUS, default='pending')
+    
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now)
+    
+    # A claimed job whose lease has run out belongs to a crashed worker and is claimed again
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['available_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+            models.Index(fields=['status', 'locked_until']),
+        ]
+    
+    def __str__(self):
+        return f"Payout job {self.id} - payment {self.payment_id} ({self.status})"
+    
+    @classmethod
+    def enqueue_for_payment(cls, payment):
+        """Queue an owner payout for a completed payment; call inside the transaction that completes it"""
+        job, _ = cls.objects.get_or_create(payment=payment)
+        return job
+    
+    @classmethod
+    def claim_due(cls, limit=20, lease_seconds=300):
+        """
+        Claim up to `limit` due jobs for this worker.
+        Each job is claimed with a conditional update, so concurrent workers never claim the same job.
+        """
+        now = timezone.now()
+        due = cls.objects.filter(
+            models.Q(status='pending', available_at__lte=now) |
+            models.Q(status='processing', locked_until__lt=now)
+        ).order_by('available_at', 'id').values_list('id', 'status', 'attempts')[:limit]
+        
+        claimed_ids = []
+        for job_id, current_status, attempts in due:
+            claimed = cls.objects.filter(id=job_id, status=current_status, attempts=attempts).update(
+                status='processing',
+                attempts=attempts + 1,
+                locked_until=now + timedelta(seconds=lease_seconds),
+                updated_at=now,
+            )
+            if claimed:
+                claimed_ids.append(job_id)
+        
+        return list(
+            cls.objects.filter(id__in=claimed_ids).select_related(
+                'payment__unit__property__owner__user', 'payment__tenant__user'
+            )
+        )
+    
+    def _write_if_still_claimed(self, **fields):
+        """
+        Apply `fields` only while this worker's claim is current (still processing, same attempt).
+        A worker whose lease expired may have lost the job to another worker; its write is dropped.
+        """
+        fields['updated_at'] = timezone.now()
+        won = type(self).objects.filter(id=self.id, status='processing', attempts=self.attempts).update(**fields)
+        if won:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        else:
+            logger.warning(
+                f"Payout job {self.id} attempt {self.attempts} lost its claim; "
+                f"not recording status {fields.get('status')}"
+            )
+        return bool(won)
+    
+    def mark_completed(self, payout=None):
+        return self._write_if_still_claimed(
+            status='completed',
+            payout=payout,
+            locked_until=None,
+            last_error='',
+            completed_at=timezone.now(),
+        )
+    
+    def mark_attempt_failed(self, error):
+        """Retry later with exponential backoff (1, 2, 4, 8... minutes), or give up after max_attempts"""
+        if self.attempts >= self.max_attempts:
+            return self._write_if_still_claimed(status='failed', locked_until=None, last_error=str(error))
+        return self._write_if_still_claimed(
+            status='pending',
+            available_at=timezone.now() + timedelta(minutes=2 ** (self.attempts - 1)),
+            locked_until=None,
+            last_error=str(error),
+        )
+
+
+class WebhookEvent(models.Model):
+    """Inbox of validated PhonePe webhook deliveries; each distinct event is applied once by a worker"""
+    EVENT_STATUS = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('processed', 'Processed'),
+        ('failed', 'Failed'),
+    ]
+    
+    merchant_order_id = models.CharField(max_length=100)
+    callback_type = models.CharField(max_length=50)
+    state = models.CharField(max_length=30, blank=True)
+    payload = models.JSONField(default=dict, blank=True)
+    
+    status = models.CharField(max_length=20, choices=EVENT_STATUS, default='pending')
+    delivery_count = models.IntegerField(default=1)
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=5)
+    available_at = models.DateTimeField(default=timezone.now)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    result = models.JSONField(default=dict, blank=True)
+    
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['received_at', 'id']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['merchant_order_id', 'callback_type', 'state'],
+                name='unique_webhook_event'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'available_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.callback_type} {self.state} for {self.merchant_order_id} ({self.status})"
+    
+    @classmethod
+    def ingest(cls, merchant_order_id, callback_type, state, payload):
+        """Store a delivery, returning (event, created); redeliveries only bump delivery_count"""
+        from django.db import IntegrityError, transaction
+        
+        try:
+            with transaction.atomic():
+                return cls.objects.create(
+                    merchant_order_id=merchant_order_id,
+                    callback_type=callback_type,
+                    state=state or '',
+                    payload=payload,
+                ), True
+        except IntegrityError:
+            event = cls.objects.get(merchant_order_id=merchant_order_id, callback_type=callback_type, state=state or '')
+            cls.objects.filter(pk=event.pk).update(delivery_count=models.F('delivery_count') + 1)
+            return event, False
+    
+    @classmethod
+    def claim_due(cls, limit=50, lease_seconds=120):
+        """Claim up to `limit` due events with conditional updates, so each is handed to one worker"""
+        now = timezone.now()
+        due = cls.objects.filter(
+            models.Q(status='pending', available_at__lte=now) |
+            models.Q(status='processing', locked_until__lt=now)
+        ).order_by('available_at', 'id').values_list('id', 'status', 'attempts')[:limit]
+        
+        claimed_ids = []
+        for event_id, current_status, attempts in due:
+            if cls.objects.filter(id=event_id, status=current_status, attempts=attempts).update(
+                status='processing',
+                attempts=attempts + 1,
+                locked_until=now + timedelta(seconds=lease_seconds),
+            ):
+                claimed_ids.append(event_id)
+        
+        return list(cls.objects.filter(id__in=claimed_ids))
+    
+    def _write_if_still_claimed(self, **fields):
+        """
+        Apply `fields` only while this worker's claim is current (still processing, same attempt).
+        A worker whose lease expired may have lost the event to another worker; its write is dropped.
+        """
+        won = type(self).objects.filter(id=self.id, status='processing', attempts=self.attempts).update(**fields)
+        if won:
+            for name, value in fields.items():
+                setattr(self, name, value)
+        else:
+            logger.warning(
+                f"Webhook event {self.id} attempt {self.attempts} lost its claim; "
+                f"not recording status {fields.get('status')}"
+            )
+        return bool(won)
+    
+    def mark_processed(self, result):
+        return self._write_if_still_claimed(
+            status='processed',
+            result=result,
+            locked_until=None,
+            processed_at=timezone.now(),
+        )
+    
+    def mark_attempt_failed(self, error, give_up=False):
+        """Retry after 10s, 20s, 40s... or give up after max_attempts (or at once with give_up)"""
+        if give_up or self.attempts >= self.max_attempts:
+            return self._write_if_still_claimed(status='failed', locked_until=None, last_error=str(error))
+        return self._write_if_still_claimed(
+            status='pending',
+            available_at=timezone.now() + timedelta(seconds=10 * 2 ** (self.attempts - 1)),
+            locked_until=None,
+            last_error=str(error),
+        )
+
+
+class GatewayOrder(models.Model):
+    """Registry of PhonePe orders: maps merchant and gateway order IDs to the local payment they settle"""
+    ORDER_TYPES = [
+        ('tenant_payment', 'Tenant Payment'),
+        ('owner_payment', 'Owner Payment'),
+    ]
+    
+    merchant_order_id = models.CharField(max_length=100, unique=True)
+    phonepe_order_id = models.CharField(max_length=100, blank=True, db_index=True)
+    order_type = models.CharField(max_length=20, choices=ORDER_TYPES)
+    payment = models.ForeignKey(Payment, on_delete=models.CASCADE, null=True, blank=True, related_name='gateway_orders')
+    owner_payment = models.ForeignKey(OwnerPayment, on_delete=models.CASCADE, null=True, blank=True, related_name='gateway_orders')
+    transaction = models.ForeignKey(PaymentTransaction, on_delete=models.SET_NULL, null=True, blank=True, related_name='gateway_orders')
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.merchant_order_id} ({self.order_type})"
+    
+    @property
+    def target(self):
+        """The Payment or OwnerPayment this order settles"""
+        return self.payment if self.order_type == 'tenant_payment' else self.owner_payment
+    
+    @classmethod
+    def register(cls, merchant_order_id, phonepe_order_id='', payment=None, owner_payment=None, transaction=None):
+        """Create or refresh the registry row for an order"""
+        order, _ = cls.objects.update_or_create(
+            merchant_order_id=merchant_order_id,
+            defaults={
+                'phonepe_order_id': phonepe_order_id or '',
+                'order_type': 'tenant_payment' if payment is not None else 'owner_payment',
+                'payment': payment,
+                'owner_payment': owner_payment,
+                'transaction': transaction,
+            }
+        )
+        return order
+    
+    @classmethod
+    def _registry(cls):
+        return cls.objects.select_related('payment', 'owner_payment', 'transaction')
+    
+    @classmethod
+    def resolve(cls, merchant_order_id):
+        """
+        Look up an order by merchant order ID in one indexed query.
+        Orders created before the registry are found in the payment tables once and registered.
+        """
+        if not merchant_order_id:
+            return None
+        order = cls._registry().filter(merchant_order_id=merchant_order_id).first()
+        if order is not None:
+            return order
+        
+        payment = Payment.objects.filter(merchant_order_id=merchant_order_id).first()
+        owner_payment = None if payment else OwnerPayment.objects.filter(merchant_order_id=merchant_order_id).first()
+        if payment is None and owner_payment is None:
+            return None
+        target = payment or owner_payment
+        return cls.register(
+            merchant_order_id,
+            phonepe_order_id=target.phonepe_order_id,
+            payment=payment,
+            owner_payment=owner_payment,
+            transaction=PaymentTransaction.objects.filter(merchant_order_id=merchant_order_id).first(),
+        )
+    
+    @classmethod
+    def resolve_gateway_order(cls, phonepe_order_id, order_type=None):
+        """Look up an order by PhonePe's order ID"""
+        if not phonepe_order_id:
+            return None
+        orders = cls._registry().filter(phonepe_order_id=phonepe_order_id)
+        if order_type:
+            orders = orders.filter(order_type=order_type)
+        return orders.first()
 
 
 # Signal handlers to update property unit counts
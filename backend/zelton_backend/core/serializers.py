@@ -5,7 +5,7 @@ import re
 from .models import (
     Owner, Property, Unit, Tenant, TenantKey, Payment, Invoice, 
     PaymentProof, ManualPaymentProof, PricingPlan, PaymentTransaction, PropertyImage, UnitImage,
-    TenantDocument, OwnerPayment, OwnerPayout
+    TenantDocument, OwnerPayment, OwnerPayout, TenantLedger
 )
 
 
@@ -92,6 +92,80 @@ class UnitImageSerializer(serializers.ModelSerializer):
         fields = ['id', 'image', 'is_primary', 'created_at']
 
 
+def load_unit_states(units):
+    """
+    Derive the tenancy and rent state of many units in a constant number of queries.
+    Returns {unit_id: state} where state holds the active tenant key, the latest key,
+    the pending amount, whether this month's rent was paid and the rent status.
+    """
+    units = list(units)
+    unit_ids = [unit.pk for unit in units]
+    
+    active_keys = {}
+    latest_keys = {}
+    for tenant_key in TenantKey.objects.filter(unit_id__in=unit_ids).select_related('tenant__user').order_by('id'):
+        if tenant_key.is_used and tenant_key.unit_id not in active_keys:
+            active_keys[tenant_key.unit_id] = tenant_key
+        latest = latest_keys.get(tenant_key.unit_id)
+        if latest is None or tenant_key.created_at >= latest.created_at:
+            latest_keys[tenant_key.unit_id] = tenant_key
+    
+    tenants = [
+        tenant_key.tenant for unit in units
+        for tenant_key in [active_keys.get(unit.pk)]
+        if unit.status == 'occupied' and tenant_key and tenant_key.tenant
+    ]
+    
+    ledgers = TenantLedger.for_tenants(tenants) if tenants else {}
+    
+    current_month = timezone.now().replace(day=1)
+    paid_this_month = set(Payment.objects.filter(
+        tenant__in=tenants,
+        status='completed',
+        created_at__gte=current_month
+    ).values_list('tenant_id', flat=True).distinct()) if tenants else set()
+    
+    states = {}
+    for unit in units:
+        tenant_key = active_keys.get(unit.pk)
+        tenant = tenant_key.tenant if tenant_key else None
+        state = {
+            'tenant_key': tenant_key,
+            'tenant': tenant,
+            'latest_key': latest_keys.get(unit.pk),
+            'pending_amount': 0,
+            'current_month_paid': False,
+            'rent_status': 'available',
+        }
+        
+        if unit.status == 'occupied' and tenant:
+            ledger = ledgers.get(tenant.pk)
+            state['pending_amount'] = float(ledger.amount_due) if ledger else 0
+            state['current_month_paid'] = tenant.pk in paid_this_month
+            
+            # Determine payment status
+            if state['pending_amount'] <= 0:
+                state['rent_status'] = 'paid'
+            elif state['current_month_paid']:
+                state['rent_status'] = 'partial'
+            else:
+                state['rent_status'] = 'overdue'
+        
+        states[unit.pk] = state
+    
+    return states
+
+
+class UnitListSerializer(serializers.ListSerializer):
+    """Preloads the state of every unit in the page before the child serializer renders them"""
+    
+    def to_representation(self, data):
+        iterable = data.all() if hasattr(data, 'all') else data
+        units = list(iterable)
+        self.context.setdefault('unit_states', {}).update(load_unit_states(units))
+        return super().to_representation(units)
+
+
 class UnitSerializer(serializers.ModelSerializer):
     images = UnitImageSerializer(many=True, read_only=True)
     property_name = serializers.CharField(source='property.name', read_only=True)
@@ -104,60 +178,16 @@ class UnitSerializer(serializers.ModelSerializer):
     tenant_key = serializers.SerializerMethodField()
     tenant_key_status = serializers.SerializerMethodField()
     
+    def _get_unit_state(self, obj):
+        """Get the preloaded state for the unit, loading it on demand for single-unit serialization"""
+        unit_states = self.context.setdefault('unit_states', {})
+        if obj.pk not in unit_states:
+            unit_states.update(load_unit_states([obj]))
+        return unit_states[obj.pk]
+    
     def get_rent_status(self, obj):
         """Get rent status for the unit"""
-        # Check if unit is occupied
-        if obj.status != 'occupied':
-            return 'available'
-        
-        # Get tenant for this unit
-        tenant_key = obj.tenant_keys.filter(is_used=True).first()
-        if not tenant_key or not tenant_key.tenant:
-            return 'available'
-        
-        tenant = tenant_key.tenant
-        
-        # Calculate pending amount
-        from django.utils import timezone
-        today = timezone.now().date()
-        
-        # Calculate total rent owed (from tenant's move-in date to current month)
-        move_in_date = tenant_key.used_at.date() if tenant_key.used_at else today
-        
-        # Calculate months from move-in to current month
-        months_owed = (today.year - move_in_date.year) * 12 + (today.month - move_in_date.month) + 1
-        
-        # Total rent owed = months_owed * monthly_rent
-        total_rent_owed = months_owed * float(obj.rent_amount)
-        
-        # Get total payments made
-        from django.db.models import Sum
-        total_payments = Payment.objects.filter(
-            tenant=tenant,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Convert to float for calculation
-        total_payments = float(total_payments)
-        
-        # Calculate pending amount
-        pending_amount = total_rent_owed - total_payments
-        
-        # Check if current month rent is already paid
-        current_month = timezone.now().replace(day=1)
-        current_month_payment = Payment.objects.filter(
-            tenant=tenant,
-            status='completed',
-            created_at__gte=current_month
-        ).first()
-        
-        # Determine payment status
-        if pending_amount <= 0:
-            return 'paid'
-        elif current_month_payment:
-            return 'partial'
-        else:
-            return 'overdue'
+        return self._get_unit_state(obj)['rent_status']
     
     def get_rent_status_text(self, obj):
         """Get rent status text"""
@@ -187,52 +217,27 @@ class UnitSerializer(serializers.ModelSerializer):
     
     def get_current_month_paid(self, obj):
         """Check if current month rent is paid"""
-        if obj.status != 'occupied':
-            return False
-        
-        tenant_key = obj.tenant_keys.filter(is_used=True).first()
-        if not tenant_key or not tenant_key.tenant:
-            return False
-        
-        from django.utils import timezone
-        current_month = timezone.now().replace(day=1)
-        current_month_payment = Payment.objects.filter(
-            tenant=tenant_key.tenant,
-            status='completed',
-            created_at__gte=current_month
-        ).first()
-        
-        return current_month_payment is not None
+        return self._get_unit_state(obj)['current_month_paid']
     
     def get_pending_amount(self, obj):
         """Get pending rent amount"""
-        if obj.status != 'occupied':
-            return 0
-        
-        tenant_key = obj.tenant_keys.filter(is_used=True).first()
-        if not tenant_key or not tenant_key.tenant:
-            return 0
-        
-        # Use the Payment model's calculate_monthly_due method
-        from core.models import Payment
-        return float(Payment.calculate_monthly_due(tenant_key.tenant, obj))
+        return self._get_unit_state(obj)['pending_amount']
     
     def get_tenant_name(self, obj):
         """Get tenant name if unit is occupied"""
         if obj.status != 'occupied':
             return None
         
-        tenant_key = obj.tenant_keys.filter(is_used=True).first()
-        if not tenant_key or not tenant_key.tenant:
+        tenant = self._get_unit_state(obj)['tenant']
+        if not tenant:
             return None
         
-        tenant = tenant_key.tenant
         return f"{tenant.user.first_name} {tenant.user.last_name}".strip() or tenant.user.email
     
     def get_tenant_key(self, obj):
         """Get tenant key for the unit"""
         # Get the most recent tenant key (used or unused)
-        tenant_key = obj.tenant_keys.order_by('-created_at').first()
+        tenant_key = self._get_unit_state(obj)['latest_key']
         if not tenant_key:
             return None
         
@@ -241,7 +246,7 @@ class UnitSerializer(serializers.ModelSerializer):
     def get_tenant_key_status(self, obj):
         """Get tenant key status"""
         # Get the most recent tenant key (used or unused)
-        tenant_key = obj.tenant_keys.order_by('-created_at').first()
+        tenant_key = self._get_unit_state(obj)['latest_key']
         if not tenant_key:
             return 'no_key'
         
@@ -260,6 +265,7 @@ class UnitSerializer(serializers.ModelSerializer):
             'tenant_key', 'tenant_key_status'
         ]
         read_only_fields = ['id', 'property', 'created_at', 'updated_at']
+        list_serializer_class = UnitListSerializer
 
 
 class TenantSerializer(serializers.ModelSerializer):
@@ -307,7 +313,7 @@ class OwnerPayoutSerializer(serializers.ModelSerializer):
         model = OwnerPayout
         fields = [
             'id', 'payment', 'owner', 'owner_name', 'amount', 'status',
-            'beneficiary_type', 'cashfree_transfer_id', 'cashfree_utr',
+            'beneficiary_type', 'settlement_window', 'cashfree_transfer_id', 'cashfree_utr',
             'retry_count', 'max_retries', 'initiated_at', 'completed_at',
             'error_message', 'payment_details'
         ]
@@ -317,6 +323,20 @@ class OwnerPayoutSerializer(serializers.ModelSerializer):
         return f"{obj.owner.user.first_name} {obj.owner.user.last_name}"
     
     def get_payment_details(self, obj):
+        if obj.payment is None:
+            # Batched payout: one line per settled payment
+            return {
+                'settlement_window': obj.settlement_window,
+                'items': [
+                    {
+                        'payment': item.payment_id,
+                        'amount': item.amount,
+                        'unit_number': item.payment.unit.unit_number,
+                        'tenant_name': item.payment.tenant.user.get_full_name()
+                    }
+                    for item in obj.items.select_related('payment__unit', 'payment__tenant__user')
+                ]
+            }
         return {
             'unit_number': obj.payment.unit.unit_number,
             'property_name': obj.payment.unit.property.name,
@@ -338,10 +358,17 @@ class PaymentSerializer(serializers.ModelSerializer):
         transaction = obj.transactions.first()
         return transaction.reconciliation_status if transaction else 'not_started'
     
+    def _payout(self, obj):
+        """Instant payout of the payment, or the batched payout it is an item of"""
+        try:
+            return obj.owner_payout
+        except Exception:
+            return obj.payout_item.payout
+    
     def get_payout_status(self, obj):
         """Get payout status for owner visibility"""
         try:
-            payout = obj.owner_payout
+            payout = self._payout(obj)
             return payout.status
         except:
             return 'not_initiated'
@@ -349,10 +376,10 @@ class PaymentSerializer(serializers.ModelSerializer):
     def get_payout_message(self, obj):
         """Get user-friendly payout message"""
         try:
-            payout = obj.owner_payout
+            payout = self._payout(obj)
             if payout.status == 'completed':
                 return 'Payment transferred successfully'
-            elif payout.status in ['pending', 'processing', 'retry_scheduled']:
+            elif payout.status in ['accumulating', 'pending', 'processing', 'retry_scheduled']:
                 return 'Payment processing, contact admin if delayed'
             elif payout.status == 'failed':
                 return 'Payment processing failed, contact admin'
@@ -1,4 +1,5 @@
 import logging
+import random
 from decimal import Decimal
 from django.conf import settings
 from django.utils import timezone
@@ -6,7 +7,8 @@ from datetime import timedelta
 from cashfree_payout.api_client import Cashfree, CFEnvironment
 from cashfree_payout import CreateTransferRequest, CreateTransferRequestBeneficiaryDetails
 from cashfree_payout import CreateTransferRequestBeneficiaryDetailsBeneficiaryInstrumentDetails
-from core.models import OwnerPayout
+from core.models import OwnerPayout, PayoutJob, CashfreeBeneficiary
+from core.metrics import gateway_timer
 
 logger = logging.getLogger(__name__)
 
@@ -20,6 +22,11 @@ class CashfreePayoutService:
     @classmethod
     def initialize_client(cls):
         """Initialize Cashfree client (call once)"""
+        if not cls._client_initialized and getattr(settings, 'FAKE_GATEWAYS', False):
+            from core.services.fake_gateways import FakeCashfreeClient
+            cls._cashfree_client = FakeCashfreeClient()
+            cls._client_initialized = True
+            logger.warning("Using the offline fake Cashfree client (FAKE_GATEWAYS=True)")
         if not cls._client_initialized:
             Cashfree.XClientId = settings.CASHFREE_CLIENT_ID
             Cashfree.XClientSecret = settings.CASHFREE_CLIENT_SECRET
@@ -50,11 +57,17 @@ class CashfreePayoutService:
                 return validation
             
             # Check if payout already exists
-            existing_payout = OwnerPayout.objects.filter(payment=payment).first()
+            existing_payout = OwnerPayout.for_payment(payment)
             if existing_payout:
                 logger.info(f"Payout already exists for payment {payment.id}: {existing_payout.id}")
                 return {'success': True, 'payout_record': existing_payout, 'already_exists': True}
             
+            if getattr(settings, 'CASHFREE_PAYOUT_MODE', 'instant') == 'batched':
+                # Settled with the owner's other payments of the day by process_scheduled_payouts
+                payout_record = OwnerPayout.add_to_batch(payment, owner)
+                logger.info(f"Payment {payment.id} added to batched payout {payout_record.id}")
+                return {'success': True, 'payout_record': payout_record, 'batched': True}
+            
             # Create payout record
             payout_amount = Decimal(str(payment.amount))
             payout_record = OwnerPayout.objects.create(
@@ -80,20 +93,57 @@ class CashfreePayoutService:
             return {'success': False, 'error': str(e)}
     
     @classmethod
-    def create_or_get_beneficiary(cls, owner, x_api_version="2024-01-01"):
+    def process_payout_job(cls, job, x_api_version="2024-01-01"):
+        """
+        Run a claimed PayoutJob. The job is done once an OwnerPayout exists for the payment;
+        later transfer failures are retried through the OwnerPayout retry schedule.
+        """
+        try:
+            result = cls.initiate_owner_payout(job.payment, x_api_version)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        
+        payout_record = result.get('payout_record')
+        if payout_record is not None:
+            job.mark_completed(payout_record)
+            if not result['success']:
+                logger.warning(f"Payout job {job.id}: payout {payout_record.id} failed and was scheduled for retry: {result.get('error')}")
+        elif job.mark_attempt_failed(result.get('error', 'Payout was not created')):
+            logger.warning(f"Payout job {job.id} attempt {job.attempts} failed ({job.status}): {job.last_error}")
+        
+        return {'success': payout_record is not None, 'job': job, 'error': result.get('error')}
+    
+    @classmethod
+    def ensure_beneficiary(cls, owner, x_api_version="2024-01-01"):
+        """
+        Beneficiary ID to pay the owner with. Served from the local registry while the owner's
+        bank/UPI details are unchanged; Cashfree is only called for new or changed details.
+        """
+        beneficiary_id = CashfreeBeneficiary.lookup(owner)
+        if beneficiary_id:
+            return {'success': True, 'beneficiary_id': beneficiary_id, 'cached': True}
+        
+        result = cls.create_or_get_beneficiary(owner, x_api_version, beneficiary_id=CashfreeBeneficiary.beneficiary_id_for(owner))
+        if result['success']:
+            CashfreeBeneficiary.record(owner, result['beneficiary_id'])
+        return result
+    
+    @classmethod
+    def create_or_get_beneficiary(cls, owner, x_api_version="2024-01-01", beneficiary_id=None):
         """Create or get beneficiary in Cashfree"""
         from cashfree_payout import CreateBeneficiaryRequest, CreateBeneficiaryRequestBeneficiaryInstrumentDetails
         
         try:
             cls.initialize_client()
-            beneficiary_id = f"OWNER_{owner.id}"
+            beneficiary_id = beneficiary_id or f"OWNER_{owner.id}"
             
             # Try to fetch existing beneficiary first
             try:
-                response = cls._cashfree_client.PayoutFetchBeneficiary(
-                    x_api_version=x_api_version,
-                    beneficiary_id=beneficiary_id
-                )
+                with gateway_timer('cashfree', 'fetch_beneficiary'):
+                    response = cls._cashfree_client.PayoutFetchBeneficiary(
+                        x_api_version=x_api_version,
+                        beneficiary_id=beneficiary_id
+                    )
                 logger.info(f"Beneficiary {beneficiary_id} already exists")
                 return {'success': True, 'beneficiary_id': beneficiary_id, 'exists': True}
             except Exception as fetch_error:
@@ -125,10 +175,11 @@ class CashfreePayoutService:
             )
             
             # Create beneficiary
-            response = cls._cashfree_client.PayoutCreateBeneficiary(
-                x_api_version=x_api_version,
-                create_beneficiary_request=beneficiary_request
-            )
+            with gateway_timer('cashfree', 'create_beneficiary'):
+                response = cls._cashfree_client.PayoutCreateBeneficiary(
+                    x_api_version=x_api_version,
+                    create_beneficiary_request=beneficiary_request
+                )
             
             logger.info(f"Beneficiary {beneficiary_id} created successfully")
             return {'success': True, 'beneficiary_id': beneficiary_id, 'exists': False}
@@ -143,58 +194,51 @@ class CashfreePayoutService:
         try:
             cls.initialize_client()
             owner = payout_record.owner
-            transfer_id = f"PAYOUT_{payout_record.id}_{int(timezone.now().timestamp())}"
+            
+            transfer_id = payout_record.cashfree_transfer_id
+            if transfer_id:
+                # An earlier attempt got as far as sending this transfer; Cashfree may have accepted it
+                status_data = cls.find_sent_transfer(transfer_id, x_api_version)
+                if status_data is not None and not cls.transfer_failed(status_data):
+                    return cls.follow_sent_transfer(payout_record, status_data)
+                if status_data is not None:
+                    # That transfer failed for good, so the payout is sent again as a new transfer
+                    transfer_id = ''
             
             # First, ensure beneficiary exists
-            beneficiary_result = cls.create_or_get_beneficiary(owner, x_api_version)
+            beneficiary_result = cls.ensure_beneficiary(owner, x_api_version)
             if not beneficiary_result['success']:
                 raise Exception(f"Beneficiary creation failed: {beneficiary_result['error']}")
             
-            beneficiary_id = beneficiary_result['beneficiary_id']
+            beneficiary_details = cls.transfer_beneficiary_details(owner, beneficiary_result['beneficiary_id'])
             
-            # Prepare beneficiary instrument details
-            instrument_details = CreateTransferRequestBeneficiaryDetailsBeneficiaryInstrumentDetails()
-            
-            if owner.payment_method == 'bank':
-                instrument_details.bank_account_number = str(owner.account_number or '')
-                instrument_details.bank_ifsc = str(owner.ifsc_code or '')
-            else:  # UPI
-                instrument_details.vpa = str(owner.upi_id or '')
-            
-            # Prepare owner name safely
-            first_name = owner.user.first_name or 'Owner'
-            last_name = owner.user.last_name or ''
-            owner_name = f"{first_name} {last_name}".strip()
-            
-            # Prepare beneficiary details
-            beneficiary_details = CreateTransferRequestBeneficiaryDetails(
-                beneficiary_id=beneficiary_id,
-                beneficiary_name=owner_name,
-                beneficiary_instrument_details=instrument_details
-            )
+            if not transfer_id:
+                # Saved before the call: a retry after a crash or timeout then finds this transfer
+                # instead of paying the owner again under a new ID
+                transfer_id = f"PAYOUT_{payout_record.id}_{int(timezone.now().timestamp())}"
+                payout_record.cashfree_transfer_id = transfer_id
+                payout_record.save(update_fields=['cashfree_transfer_id'])
             
             # Prepare transfer request
-            # Determine transfer_mode based on payment method
-            transfer_mode = 'upi' if owner.payment_method == 'upi' else 'banktransfer'
-            
             transfer_request = CreateTransferRequest(
                 transfer_id=transfer_id,
                 transfer_amount=float(payout_record.amount),
-                transfer_mode=transfer_mode,
-                remarks=f"Rent payment for unit {payout_record.payment.unit.unit_number}",
+                transfer_mode=cls.transfer_mode(owner),
+                remarks=payout_record.remarks,
                 beneficiary_details=beneficiary_details
             )
             
             # Make API call
             logger.info(f"Initiating Cashfree payout: {transfer_id}, Amount: {payout_record.amount}")
-            response = cls._cashfree_client.PayoutInitiateTransfer(
-                x_api_version=x_api_version,
-                create_transfer_request=transfer_request
-            )
+            with gateway_timer('cashfree', 'initiate_transfer'):
+                response = cls._cashfree_client.PayoutInitiateTransfer(
+                    x_api_version=x_api_version,
+                    create_transfer_request=transfer_request
+                )
             
             # Update payout record
-            payout_record.cashfree_transfer_id = transfer_id
             payout_record.status = 'processing'
+            payout_record.locked_until = None
             
             # Extract response data safely
             try:
@@ -218,6 +262,7 @@ class CashfreePayoutService:
             
             payout_record.status = 'failed'
             payout_record.error_message = error_msg
+            payout_record.locked_until = None
             payout_record.save()
             
             # Schedule retry
@@ -226,6 +271,164 @@ class CashfreePayoutService:
             logger.error(f"Cashfree payout execution failed: {error_msg}\n{error_traceback}")
             return {'success': False, 'error': error_msg}
     
+    @classmethod
+    def find_sent_transfer(cls, transfer_id, x_api_version="2024-01-01"):
+        """
+        Status of a transfer that may already have been sent, or None if Cashfree never received it.
+        Any other error is raised: without an answer it is not safe to send the payout again.
+        """
+        try:
+            return cls.fetch_transfer_status(transfer_id, x_api_version)
+        except Exception as e:
+            if '404' in str(e):
+                return None
+            raise
+    
+    @classmethod
+    def follow_sent_transfer(cls, payout_record, status_data):
+        """Track a transfer Cashfree already has instead of sending the payout again"""
+        cls.apply_transfer_status(payout_record, status_data)
+        if payout_record.status != 'completed':
+            payout_record.status = 'processing'
+        payout_record.locked_until = None
+        payout_record.save()
+        
+        logger.info(
+            f"Payout {payout_record.id}: transfer {payout_record.cashfree_transfer_id} was already sent "
+            f"({status_data.get('status')}), not sending it again"
+        )
+        return {'success': True, 'transfer_id': payout_record.cashfree_transfer_id, 'already_sent': True}
+    
+    @classmethod
+    def transfer_beneficiary_details(cls, owner, beneficiary_id):
+        """Beneficiary block of a transfer request"""
+        instrument_details = CreateTransferRequestBeneficiaryDetailsBeneficiaryInstrumentDetails()
+        
+        if owner.payment_method == 'bank':
+            instrument_details.bank_account_number = str(owner.account_number or '')
+            instrument_details.bank_ifsc = str(owner.ifsc_code or '')
+        else:  # UPI
+            instrument_details.vpa = str(owner.upi_id or '')
+        
+        # Prepare owner name safely
+        first_name = owner.user.first_name or 'Owner'
+        last_name = owner.user.last_name or ''
+        owner_name = f"{first_name} {last_name}".strip()
+        
+        return CreateTransferRequestBeneficiaryDetails(
+            beneficiary_id=beneficiary_id,
+            beneficiary_name=owner_name,
+            beneficiary_instrument_details=instrument_details
+        )
+    
+    @classmethod
+    def transfer_mode(cls, owner):
+        return 'upi' if owner.payment_method == 'upi' else 'banktransfer'
+    
+    @classmethod
+    def settle_payout_batches(cls, limit=500, x_api_version="2024-01-01"):
+        """
+        Settle batched payouts whose day has ended with a single Cashfree batch transfer.
+        Payouts that cannot be sent, or whose batch request fails, go through the normal retry schedule.
+        """
+        from cashfree_payout import CreateBatchTransferRequest, CreateBatchTransferRequestTransfersInner
+        
+        payouts = OwnerPayout.claim_closed_batches(limit=limit)
+        if not payouts:
+            return {'success': True, 'settled': 0, 'failed': 0}
+        
+        cls.initialize_client()
+        timestamp = int(timezone.now().timestamp())
+        batch_transfer_id = f"BATCH_{timestamp}_{payouts[0].id}"
+        
+        transfers = []
+        sendable = []
+        failed = 0
+        for payout_record in payouts:
+            owner = payout_record.owner
+            validation = cls.validate_owner_payment_details(owner)
+            beneficiary_result = cls.ensure_beneficiary(owner, x_api_version) if validation['success'] else validation
+            if not beneficiary_result['success']:
+                cls._fail_payout(payout_record, beneficiary_result['error'])
+                failed += 1
+                continue
+            
+            payout_record.cashfree_transfer_id = f"PAYOUT_{payout_record.id}_{timestamp}"
+            transfers.append(CreateBatchTransferRequestTransfersInner(
+                transfer_id=payout_record.cashfree_transfer_id,
+                transfer_amount=float(payout_record.amount),
+                transfer_mode=cls.transfer_mode(owner),
+                remarks=payout_record.remarks,
+                beneficiary_details=cls.transfer_beneficiary_details(owner, beneficiary_result['beneficiary_id'])
+            ))
+            sendable.append(payout_record)
+        
+        if not sendable:
+            return {'success': True, 'settled': 0, 'failed': failed}
+        
+        # Saved before the call, so retries check these transfers instead of paying the owners again
+        for payout_record in sendable:
+            payout_record.cashfree_batch_transfer_id = batch_transfer_id
+        OwnerPayout.objects.bulk_update(sendable, ['cashfree_transfer_id', 'cashfree_batch_transfer_id'])
+        
+        try:
+            logger.info(f"Initiating Cashfree batch transfer {batch_transfer_id} with {len(sendable)} payouts")
+            with gateway_timer('cashfree', 'initiate_batch_transfer'):
+                cls._cashfree_client.PayoutInitiateBatchTransfer(
+                    x_api_version=x_api_version,
+                    create_batch_transfer_request=CreateBatchTransferRequest(
+                        batch_transfer_id=batch_transfer_id,
+                        transfers=transfers
+                    )
+                )
+        except Exception as e:
+            # The batch may still have been accepted (e.g. a read timeout); only retry transfers Cashfree does not have
+            logger.error(f"Cashfree batch transfer {batch_transfer_id} failed: {str(e)}")
+            sent = 0
+            for payout_record in sendable:
+                if cls._settle_unconfirmed_transfer(payout_record, str(e), x_api_version):
+                    sent += 1
+            return {
+                'success': False,
+                'settled': sent,
+                'failed': failed + len(sendable) - sent,
+                'error': str(e),
+                'batch_transfer_id': batch_transfer_id,
+            }
+        
+        for payout_record in sendable:
+            payout_record.status = 'processing'
+            payout_record.locked_until = None
+            payout_record.save()
+        
+        return {'success': True, 'settled': len(sendable), 'failed': failed, 'batch_transfer_id': batch_transfer_id}
+    
+    @classmethod
+    def _settle_unconfirmed_transfer(cls, payout_record, error, x_api_version):
+        """
+        After a failed batch request: follow the payout's transfer if Cashfree has it, otherwise schedule
+        a retry, which resends under the same transfer ID. Returns True if the transfer was sent.
+        """
+        try:
+            status_data = cls.find_sent_transfer(payout_record.cashfree_transfer_id, x_api_version)
+        except Exception as e:
+            logger.warning(f"Status check for batched payout {payout_record.id} failed: {str(e)}")
+            status_data = None
+        
+        if status_data is not None and not cls.transfer_failed(status_data):
+            cls.follow_sent_transfer(payout_record, status_data)
+            return True
+        cls._fail_payout(payout_record, error)
+        return False
+    
+    @classmethod
+    def _fail_payout(cls, payout_record, error):
+        payout_record.status = 'failed'
+        payout_record.error_message = error
+        payout_record.locked_until = None
+        payout_record.save()
+        cls.schedule_retry(payout_record)
+    
     @classmethod
     def prepare_beneficiary_data(cls, owner, transfer_id):
         """Prepare beneficiary data for Cashfree"""
@@ -279,8 +482,9 @@ class CashfreePayoutService:
             payout_record.retry_count += 1
             payout_record.status = 'retry_scheduled'
             
-            # Exponential backoff: 5min, 15min, 45min
-            delay_minutes = 5 * (3 ** (payout_record.retry_count - 1))
+            # Exponential backoff (5min, 15min, 45min) with +/-20% jitter, so payouts that failed
+            # together (e.g. during a Cashfree outage) do not all retry in the same minute
+            delay_minutes = 5 * (3 ** (payout_record.retry_count - 1)) * random.uniform(0.8, 1.2)
             payout_record.next_retry_at = timezone.now() + timedelta(minutes=delay_minutes)
             payout_record.save()
             
@@ -288,17 +492,13 @@ class CashfreePayoutService:
     
     @classmethod
     def retry_failed_payout(cls, payout_id, x_api_version="2024-01-01"):
-        """Manually or automatically retry a failed payout"""
+        """Manually retry a failed payout now, unless a retry worker already holds it"""
         try:
-            payout_record = OwnerPayout.objects.get(id=payout_id)
+            payout_record = OwnerPayout.claim_for_retry(payout_id)
             
-            if payout_record.status not in ['failed', 'retry_scheduled']:
+            if payout_record is None:
                 return {'success': False, 'error': 'Payout is not in failed/retry state'}
             
-            payout_record.last_retry_at = timezone.now()
-            payout_record.status = 'pending'
-            payout_record.save()
-            
             result = cls.execute_payout(payout_record, x_api_version)
             return result
             
@@ -306,53 +506,69 @@ class CashfreePayoutService:
             logger.error(f"Error retrying payout {payout_id}: {str(e)}")
             return {'success': False, 'error': str(e)}
     
+    @classmethod
+    def fetch_transfer_status(cls, transfer_id, x_api_version="2024-01-01"):
+        """Fetch a transfer's status from Cashfree as a dict (one HTTP call)"""
+        cls.initialize_client()
+        with gateway_timer('cashfree', 'fetch_transfer'):
+            response = cls._cashfree_client.PayoutFetchTransfer(
+                x_api_version=x_api_version,
+                transfer_id=transfer_id
+            )
+        
+        # Extract response data safely
+        try:
+            if hasattr(response, 'data'):
+                status_data = response.data if isinstance(response.data, dict) else response.data.dict() if hasattr(response.data, 'dict') else {}
+            else:
+                status_data = {}
+            
+            # Handle response object attributes if dict is empty
+            if not status_data and hasattr(response, '__dict__'):
+                status_data = {
+                    'status': getattr(response, 'status', None),
+                    'utr': getattr(response, 'utr', None),
+                    'reason': getattr(response, 'reason', None) or getattr(response, 'message', None)
+                }
+        except:
+            status_data = {}
+        
+        return status_data
+    
+    FAILED_TRANSFER_STATUSES = ['FAILED', 'REJECTED', 'CANCELLED', 'REVERSED']
+    
+    @classmethod
+    def transfer_failed(cls, status_data):
+        """Whether Cashfree reports the transfer as finally failed"""
+        return (status_data.get('status') or '').upper() in cls.FAILED_TRANSFER_STATUSES
+    
+    @classmethod
+    def apply_transfer_status(cls, payout_record, status_data):
+        """Update the payout in memory from Cashfree's transfer status; the caller saves it"""
+        cashfree_status = (status_data.get('status') or '').upper()
+        
+        if cashfree_status == 'SUCCESS':
+            payout_record.status = 'completed'
+            payout_record.completed_at = timezone.now()
+            payout_record.cashfree_utr = status_data.get('utr', '') or status_data.get('transfer_utr', '')
+        elif cls.transfer_failed(status_data):
+            payout_record.status = 'failed'
+            payout_record.error_message = status_data.get('reason') or status_data.get('message') or 'Payout failed'
+        
+        payout_record.cashfree_response = status_data
+        return payout_record
+    
     @classmethod
     def check_payout_status(cls, payout_id, x_api_version="2024-01-01"):
         """Check status of a payout with Cashfree"""
         try:
-            cls.initialize_client()
             payout_record = OwnerPayout.objects.get(id=payout_id)
             
             if not payout_record.cashfree_transfer_id:
                 return {'success': False, 'error': 'No transfer ID found'}
             
-            response = cls._cashfree_client.PayoutFetchTransfer(
-                x_api_version=x_api_version,
-                transfer_id=payout_record.cashfree_transfer_id
-            )
-            
-            # Extract response data safely
-            try:
-                if hasattr(response, 'data'):
-                    status_data = response.data if isinstance(response.data, dict) else response.data.dict() if hasattr(response.data, 'dict') else {}
-                else:
-                    status_data = {}
-                
-                # Handle response object attributes if dict is empty
-                if not status_data and hasattr(response, '__dict__'):
-                    status_data = {
-                        'status': getattr(response, 'status', None),
-                        'utr': getattr(response, 'utr', None),
-                        'reason': getattr(response, 'reason', None) or getattr(response, 'message', None)
-                    }
-            except:
-                status_data = {}
-            
-            cashfree_status = (status_data.get('status') or '').upper()
-            
-            if cashfree_status == 'SUCCESS':
-                payout_record.status = 'completed'
-                payout_record.completed_at = timezone.now()
-                payout_record.cashfree_utr = status_data.get('utr', '') or status_data.get('transfer_utr', '')
-            elif cashfree_status in ['FAILED', 'REJECTED', 'CANCELLED', 'CANCELLED']:
-                payout_record.status = 'failed'
-                payout_record.error_message = status_data.get('reason') or status_data.get('message') or 'Payout failed'
-                if 'RECEIVED' in cashfree_status or 'PROCESSING' in cashfree_status:
-                    # Check if it's actually failed by examining the response
-                    if status_data.get('status') == 'REJECTED' or 'reject' in str(status_data).lower():
-                        payout_record.status = 'failed'
-            
-            payout_record.cashfree_response = status_data
+            status_data = cls.fetch_transfer_status(payout_record.cashfree_transfer_id, x_api_version)
+            cls.apply_transfer_status(payout_record, status_data)
             payout_record.save()
             
             return {'success': True, 'status': payout_record.status}
@@ -360,4 +576,35 @@ class CashfreePayoutService:
         except Exception as e:
             logger.error(f"Error checking payout status: {str(e)}")
             return {'success': False, 'error': str(e)}
-
+    
+    STATUS_UPDATE_FIELDS = ['status', 'completed_at', 'cashfree_utr', 'error_message', 'cashfree_response']
+    
+    @classmethod
+    def refresh_payout_statuses(cls, payouts, executor, rate_limiter, x_api_version="2024-01-01"):
+        """
+        Refresh a batch of payouts: one Cashfree call per payout, made concurrently on `executor`
+        within the shared `rate_limiter`, and one bulk_update for the whole batch.
+        """
+        def fetch(payout_record):
+            rate_limiter.acquire()
+            try:
+                return payout_record, cls.fetch_transfer_status(payout_record.cashfree_transfer_id, x_api_version), None
+            except Exception as e:
+                return payout_record, None, str(e)
+        
+        outcomes = {}
+        updated = []
+        for payout_record, status_data, error in executor.map(fetch, payouts):
+            if error is not None:
+                logger.warning(f"Status check for payout {payout_record.id} failed: {error}")
+                outcomes['error'] = outcomes.get('error', 0) + 1
+                if '429' in error:
+                    rate_limiter.drain()
+                continue
+            
+            cls.apply_transfer_status(payout_record, status_data)
+            outcomes[payout_record.status] = outcomes.get(payout_record.status, 0) + 1
+            updated.append(payout_record)
+        
+        OwnerPayout.objects.bulk_update(updated, cls.STATUS_UPDATE_FIELDS, batch_size=500)
+        return {'checked': len(payouts), 'updated': len(updated), 'outcomes': outcomes}
@@ -0,0 +1,232 @@
+"""
+Offline stand-ins for the PhonePe Standard Checkout and Cashfree Payout clients, for load tests
+and local development. Enable with FAKE_GATEWAYS=True; never in production.
+
+They implement the client methods our services call and keep order and transfer state in the
+shared cache, so the web workers, webhook worker and reconciler of one deployment agree on it.
+Every call sleeps for FAKE_GATEWAY_LATENCY_MS (+/- 50%), answers 429 with probability
+FAKE_GATEWAY_RATE_LIMIT_RATE and fails with probability FAKE_GATEWAY_ERROR_RATE. Orders and
+transfers settle FAKE_GATEWAY_SETTLE_SECONDS after creation; FAKE_GATEWAY_DECLINE_RATE of them fail.
+"""
+import hashlib
+import json
+import random
+import time
+import uuid
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.core.cache import cache
+from phonepe.sdk.pg.common.exceptions import PhonePeException
+
+# Fake orders and transfers outlive any load test run
+STATE_TTL = 24 * 3600
+
+
+class FakePhonePeException(PhonePeException):
+    """PhonePeException raised by the fake client, independent of the SDK's constructor signature"""
+
+    def __init__(self, code, message):
+        Exception.__init__(self, message)
+        self.code = code
+        self.message = message
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _simulate_call(rate_limited, failed):
+    """Sleep for the configured latency, then inject a rate limit or failure"""
+    latency = _setting('FAKE_GATEWAY_LATENCY_MS', 150) / 1000
+    if latency:
+        time.sleep(random.uniform(latency * 0.5, latency * 1.5))
+    if random.random() < _setting('FAKE_GATEWAY_RATE_LIMIT_RATE', 0.0):
+        raise rate_limited
+    if random.random() < _setting('FAKE_GATEWAY_ERROR_RATE', 0.0):
+        raise failed
+
+
+def _settled_state(record, pending, succeeded, failed):
+    """State of an order or transfer, deciding its outcome once the settle delay has passed"""
+    if record['state'] != pending:
+        return record['state']
+    if time.time() - record['created'] < _setting('FAKE_GATEWAY_SETTLE_SECONDS', 5):
+        return pending
+    return failed if record['declined'] else succeeded
+
+
+def webhook_authorization(username, password):
+    """Authorization header PhonePe sends with webhooks: SHA-256 of username:password"""
+    return hashlib.sha256(f"{username}:{password}".encode()).hexdigest()
+
+
+class FakePhonePeClient:
+    """Stand-in for phonepe StandardCheckoutClient"""
+
+    def _call(self):
+        _simulate_call(
+            FakePhonePeException(429, '429 Too Many Requests'),
+            FakePhonePeException('INTERNAL_SERVER_ERROR', 'Fake PhonePe internal error'),
+        )
+
+    @staticmethod
+    def _key(merchant_order_id):
+        return f'fake-phonepe:order:{merchant_order_id}'
+
+    def _order(self, merchant_order_id):
+        order = cache.get(self._key(merchant_order_id))
+        if order is None:
+            raise FakePhonePeException('ORDER_NOT_FOUND', f'Order {merchant_order_id} not found')
+        state = _settled_state(order, 'PENDING', 'COMPLETED', 'FAILED')
+        if state != order['state']:
+            order['state'] = state
+            cache.set(self._key(merchant_order_id), order, STATE_TTL)
+        return order
+
+    def pay(self, pay_request):
+        self._call()
+        order = {
+            'merchant_order_id': pay_request.merchant_order_id,
+            'order_id': f"OMO{uuid.uuid4().hex[:20].upper()}",
+            'amount': pay_request.amount,
+            'state': 'PENDING',
+            'created': time.time(),
+            'declined': random.random() < _setting('FAKE_GATEWAY_DECLINE_RATE', 0.0),
+        }
+        cache.set(self._key(order['merchant_order_id']), order, STATE_TTL)
+        return SimpleNamespace(
+            order_id=order['order_id'],
+            redirect_url=f"https://fake-phonepe.local/checkout/{order['order_id']}",
+            expire_at=int((order['created'] + 1800) * 1000),
+            state=order['state'],
+        )
+
+    def get_order_status(self, merchant_order_id, details=False):
+        self._call()
+        order = self._order(merchant_order_id)
+        return SimpleNamespace(
+            order_id=order['order_id'],
+            state=order['state'],
+            amount=order['amount'],
+            expire_at=int((order['created'] + 1800) * 1000),
+            payment_details=[],
+            meta_info=None,
+        )
+
+    def refund(self, refund_request):
+        self._call()
+        order = self._order(refund_request.original_merchant_order_id)
+        return SimpleNamespace(
+            refund_id=f"OMR{uuid.uuid4().hex[:20].upper()}",
+            state='PENDING',
+            amount=getattr(refund_request, 'amount', order['amount']),
+        )
+
+    def get_refund_status(self, merchant_refund_id):
+        self._call()
+        return SimpleNamespace(
+            refund_id=merchant_refund_id,
+            state='COMPLETED',
+            amount=0,
+            original_merchant_order_id='',
+            payment_details=[],
+        )
+
+    def validate_callback(self, username, password, callback_header_data, callback_response_data):
+        if callback_header_data != webhook_authorization(username, password):
+            raise FakePhonePeException(417, 'Invalid callback authorization')
+        body = json.loads(callback_response_data)
+        payload = body.get('payload', {})
+        return SimpleNamespace(
+            callback_type=body.get('event', '').replace('.', '_').upper(),
+            callback_data=SimpleNamespace(
+                merchant_order_id=payload.get('merchantOrderId'),
+                order_id=payload.get('orderId'),
+                state=payload.get('state'),
+                amount=payload.get('amount'),
+            ),
+        )
+
+    def webhook_body(self, merchant_order_id):
+        """Body PhonePe would post for the order's current final state, or None while it is pending"""
+        order = self._order(merchant_order_id)
+        if order['state'] == 'PENDING':
+            return None
+        return json.dumps({
+            'event': f"checkout.order.{order['state'].lower()}",
+            'payload': {
+                'merchantOrderId': order['merchant_order_id'],
+                'orderId': order['order_id'],
+                'state': order['state'],
+                'amount': order['amount'],
+            },
+        })
+
+
+class FakeCashfreeClient:
+    """Stand-in for the cashfree_payout Cashfree client"""
+
+    def _call(self):
+        _simulate_call(
+            Exception('(429) Reason: Too Many Requests'),
+            Exception('(500) Reason: Fake Cashfree internal error'),
+        )
+
+    @staticmethod
+    def _key(kind, identifier):
+        return f'fake-cashfree:{kind}:{identifier}'
+
+    def PayoutFetchBeneficiary(self, x_api_version, beneficiary_id):
+        self._call()
+        beneficiary = cache.get(self._key('beneficiary', beneficiary_id))
+        if beneficiary is None:
+            raise Exception('(404) Reason: Beneficiary does not exist')
+        return SimpleNamespace(data=beneficiary)
+
+    def PayoutCreateBeneficiary(self, x_api_version, create_beneficiary_request):
+        self._call()
+        beneficiary = {'beneficiary_id': create_beneficiary_request.beneficiary_id, 'beneficiary_status': 'VERIFIED'}
+        cache.set(self._key('beneficiary', beneficiary['beneficiary_id']), beneficiary, STATE_TTL)
+        return SimpleNamespace(data=beneficiary)
+
+    def _create_transfer(self, transfer_request):
+        transfer = {
+            'transfer_id': transfer_request.transfer_id,
+            'cf_transfer_id': uuid.uuid4().hex[:12],
+            'transfer_amount': transfer_request.transfer_amount,
+            'state': 'RECEIVED',
+            'created': time.time(),
+            'declined': random.random() < _setting('FAKE_GATEWAY_DECLINE_RATE', 0.0),
+        }
+        cache.set(self._key('transfer', transfer['transfer_id']), transfer, STATE_TTL)
+        return {'transfer_id': transfer['transfer_id'], 'cf_transfer_id': transfer['cf_transfer_id'], 'status': 'RECEIVED'}
+
+    def PayoutInitiateTransfer(self, x_api_version, create_transfer_request):
+        self._call()
+        return SimpleNamespace(data=self._create_transfer(create_transfer_request))
+
+    def PayoutInitiateBatchTransfer(self, x_api_version, create_batch_transfer_request):
+        self._call()
+        for transfer_request in create_batch_transfer_request.transfers:
+            self._create_transfer(transfer_request)
+        return SimpleNamespace(data={
+            'batch_transfer_id': create_batch_transfer_request.batch_transfer_id,
+            'status': 'RECEIVED',
+        })
+
+    def PayoutFetchTransfer(self, x_api_version, transfer_id):
+        self._call()
+        transfer = cache.get(self._key('transfer', transfer_id))
+        if transfer is None:
+            raise Exception('(404) Reason: Transfer does not exist')
+        state = _settled_state(transfer, 'RECEIVED', 'SUCCESS', 'FAILED')
+        if state != transfer['state']:
+            transfer['state'] = state
+            cache.set(self._key('transfer', transfer_id), transfer, STATE_TTL)
+        status = {'transfer_id': transfer_id, 'cf_transfer_id': transfer['cf_transfer_id'], 'status': state}
+        if state == 'SUCCESS':
+            status['utr'] = f"FAKEUTR{transfer['cf_transfer_id'].upper()}"
+        elif state == 'FAILED':
+            status['reason'] = 'Fake beneficiary bank declined the transfer'
+        return SimpleNamespace(data=status)
@@ -4,13 +4,15 @@ import logging
 from datetime import datetime, timedelta
 from django.conf import settings
 from django.utils import timezone
+from django.db import transaction as db_transaction
 from phonepe.sdk.pg.payments.v2.standard_checkout_client import StandardCheckoutClient
 from phonepe.sdk.pg.payments.v2.models.request.standard_checkout_pay_request import StandardCheckoutPayRequest
 from phonepe.sdk.pg.common.models.request.meta_info import MetaInfo
 from phonepe.sdk.pg.env import Env
 from phonepe.sdk.pg.common.exceptions import PhonePeException
 
-from core.models import Payment, OwnerPayment, PaymentTransaction
+from core.models import Payment, OwnerPayment, PaymentTransaction, PayoutJob, GatewayOrder, Invoice
+from core.metrics import gateway_timer
 from decimal import Decimal, ROUND_HALF_UP
 
 logger = logging.getLogger(__name__)
@@ -69,6 +71,10 @@ class PhonePeService:
         """Get PhonePe client instance (singleton)"""
         # Always ensure timeout patch is applied, even if client is cached.
         cls._apply_request_timeout()
+        if cls._client is None and getattr(settings, 'FAKE_GATEWAYS', False):
+            from core.services.fake_gateways import FakePhonePeClient
+            logger.warning("Using the offline fake PhonePe client (FAKE_GATEWAYS=True)")
+            cls._client = FakePhonePeClient()
         if cls._client is None:
             try:
                 env = Env.SANDBOX if settings.PHONEPE_ENVIRONMENT == 'SANDBOX' else Env.PRODUCTION
@@ -146,7 +152,8 @@ class PhonePeService:
             )
             
             # Initiate payment
-            response = client.pay(pay_request)
+            with gateway_timer('phonepe', 'pay'):
+                response = client.pay(pay_request)
             
             logger.info(f"Rent payment initiated for tenant {tenant.id}, order {merchant_order_id}")
             
@@ -247,7 +254,8 @@ class PhonePeService:
             
             logger.info(f"Making PhonePe payment request for order {merchant_order_id}")
             # Initiate payment
-            response = client.pay(pay_request)
+            with gateway_timer('phonepe', 'pay'):
+                response = client.pay(pay_request)
             
             logger.info(f"Subscription payment initiated for owner {owner.id}, order {merchant_order_id}, PhonePe order ID: {response.order_id}")
             
@@ -299,7 +307,8 @@ class PhonePeService:
         for attempt in range(max_retries):
             try:
                 client = cls.get_client()
-                response = client.get_order_status(merchant_order_id, details=True)
+                with gateway_timer('phonepe', 'get_order_status'):
+                    response = client.get_order_status(merchant_order_id, details=True)
                 
                 logger.info(f"Payment status checked for order {merchant_order_id}: {response.state}")
                 
@@ -372,73 +381,148 @@ class PhonePeService:
             'error_code': 'MAX_RETRIES_EXCEEDED'
         }
     
+    @classmethod
+    def get_local_order_state(cls, merchant_order_id):
+        """Return 'COMPLETED' or 'FAILED' if the order's final state is already recorded locally"""
+        order = GatewayOrder.resolve(merchant_order_id)
+        if order is None or order.target is None:
+            return None
+        return {'completed': 'COMPLETED', 'failed': 'FAILED'}.get(order.target.status)
+    
+    @classmethod
+    def get_order_status(cls, merchant_order_id):
+        """
+        Order status for client polling.
+        Final states already recorded locally are served from the DB. Otherwise concurrent callers in
+        every worker share one gateway call, whose result is cached for PHONEPE_STATUS_CACHE_TTL seconds.
+        Callers waiting for another request's call give up after PHONEPE_STATUS_WAIT_SECONDS and answer
+        with the last known state (or PENDING), so a slow gateway never ties up every worker.
+        """
+        import time
+        import uuid
+        from django.core.cache import cache
+        
+        local_state = cls.get_local_order_state(merchant_order_id)
+        if local_state:
+            return {'success': True, 'state': local_state, 'source': 'local'}
+        
+        cache_key = f'phonepe-status:{merchant_order_id}'
+        last_known_key = f'phonepe-status-last:{merchant_order_id}'
+        lock_key = f'phonepe-status-lock:{merchant_order_id}'
+        lock_timeout = getattr(settings, 'PHONEPE_REQUEST_TIMEOUT', 30) + 5
+        
+        cached = cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
+        lock_token = uuid.uuid4().hex
+        deadline = time.monotonic() + getattr(settings, 'PHONEPE_STATUS_WAIT_SECONDS', 1.5)
+        while not cache.add(lock_key, lock_token, lock_timeout):
+            # Another request is already asking PhonePe; wait briefly for its result
+            if time.monotonic() > deadline:
+                return cache.get(last_known_key) or {'success': True, 'state': 'PENDING', 'source': 'waiting'}
+            time.sleep(0.1)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        try:
+            # Clients poll again anyway, so never sleep on rate limits or timeouts here
+            response = cls.verify_payment_status(merchant_order_id, max_retries=1)
+            result = {
+                key: response[key]
+                for key in ('success', 'state', 'amount', 'order_id', 'error', 'error_code')
+                if key in response
+            }
+            result['source'] = 'gateway'
+            cache.set(cache_key, result, getattr(settings, 'PHONEPE_STATUS_CACHE_TTL', 5))
+            if result['success']:
+                cache.set(last_known_key, dict(result, source='last_known'), lock_timeout)
+            return result
+        finally:
+            # The lock may have expired and been taken by another request; only release our own
+            if cache.get(lock_key) == lock_token:
+                cache.delete(lock_key)
+    
+    @classmethod
+    def _already_settled(cls, payment_type, payment_id, model, to_status):
+        """Result for a caller that lost the transition to another processor"""
+        current_status = model.objects.filter(pk=payment_id).values_list('status', flat=True).first()
+        if current_status != to_status:
+            logger.warning(
+                f"{payment_type.title()} payment {payment_id} is {current_status}, not moving it to {to_status}"
+            )
+        return {
+            'success': True,
+            'payment_type': payment_type,
+            'payment_id': payment_id,
+            'transitioned': False,
+            'status': current_status,
+        }
+    
     @classmethod
     def handle_payment_completed(cls, merchant_order_id):
-        """Mark payment as completed and update records"""
+        """
+        Mark payment as completed and update records.
+        Safe to call concurrently: only the caller that moves the payment out of pending runs the side effects.
+        """
         try:
             # Find payment record
-            payment = Payment.objects.filter(merchant_order_id=merchant_order_id).first()
-            owner_payment = OwnerPayment.objects.filter(merchant_order_id=merchant_order_id).first()
+            order = GatewayOrder.resolve(merchant_order_id)
+            payment = order.payment if order else None
+            owner_payment = order.owner_payment if order else None
             
             if payment:
-                payment.status = 'completed'
-                payment.payment_date = timezone.now()
-                payment.save()
-                
-                # Update transaction record
-                transaction = PaymentTransaction.objects.filter(merchant_order_id=merchant_order_id).first()
-                if transaction:
-                    transaction.status = 'success'
-                    transaction.reconciliation_status = 'completed'
-                    transaction.save()
-                
-                logger.info(f"Tenant payment {payment.id} marked as completed")
-                
-                # CRITICAL: Trigger Cashfree payout (synchronous but isolated with try-except)
-                try:
-                    from core.services.cashfree_payout_service import CashfreePayoutService
-                    payout_result = CashfreePayoutService.initiate_owner_payout(payment)
+                # The payout job is written in the same transaction, so a completed payment
+                # always has its owner payout queued; process_payout_jobs calls Cashfree later
+                with db_transaction.atomic():
+                    payment = Payment.transition(payment.id, 'completed', payment_date=timezone.now())
+                    if payment is None:
+                        return cls._already_settled('tenant', order.payment_id, Payment, 'completed')
                     
-                    if payout_result['success']:
-                        logger.info(f"Owner payout initiated: {payout_result.get('payout_record').id if payout_result.get('payout_record') else 'N/A'}")
-                    else:
-                        logger.warning(f"Owner payout failed but payment completed: {payout_result.get('error')}")
-                except Exception as e:
-                    # CRITICAL: Never let payout failure affect payment completion
-                    logger.error(f"Exception during payout initiation (payment still completed): {str(e)}")
+                    # Update transaction record
+                    transaction = order.transaction
+                    if transaction:
+                        transaction.status = 'success'
+                        transaction.reconciliation_status = 'completed'
+                        transaction.save()
+                    
+                    Invoice.issue_for_payment(payment)
+                    payout_job = PayoutJob.enqueue_for_payment(payment)
+                
+                logger.info(f"Tenant payment {payment.id} marked as completed, payout job {payout_job.id} queued")
                 
-                return {'success': True, 'payment_type': 'tenant', 'payment_id': payment.id}
+                return {'success': True, 'payment_type': 'tenant', 'payment_id': payment.id, 'transitioned': True}
             
             elif owner_payment:
                 # Handle new OwnerPayment model
-                owner_payment.status = 'completed'
-                owner_payment.payment_date = timezone.now()
-                
-                # Set subscription dates
                 now = timezone.now()
-                owner_payment.subscription_start_date = now
+                changes = {'payment_date': now, 'subscription_start_date': now}
                 
                 if owner_payment.pricing_plan:
                     # Determine period based on amount (this is a fallback)
                     # In practice, the period should be stored in the payment record
                     if owner_payment.amount >= owner_payment.pricing_plan.yearly_price:
-                        owner_payment.subscription_end_date = now + timedelta(days=365)
+                        changes['subscription_end_date'] = now + timedelta(days=365)
                     else:
-                        owner_payment.subscription_end_date = now + timedelta(days=30)
-                
-                owner_payment.save()
+                        changes['subscription_end_date'] = now + timedelta(days=30)
                 
-                # Update owner subscription status
-                owner = owner_payment.owner
-                owner.subscription_status = 'active'
-                if owner_payment.pricing_plan:
-                    owner.subscription_plan = owner_payment.pricing_plan
-                owner.subscription_start_date = now
-                owner.subscription_end_date = owner_payment.subscription_end_date
-                owner.save()
+                with db_transaction.atomic():
+                    owner_payment = OwnerPayment.transition(owner_payment.id, 'completed', **changes)
+                    if owner_payment is None:
+                        return cls._already_settled('owner', order.owner_payment_id, OwnerPayment, 'completed')
+                    
+                    # Update owner subscription status
+                    owner = owner_payment.owner
+                    owner.subscription_status = 'active'
+                    if owner_payment.pricing_plan:
+                        owner.subscription_plan = owner_payment.pricing_plan
+                    owner.subscription_start_date = now
+                    owner.subscription_end_date = owner_payment.subscription_end_date
+                    owner.save()
                 
                 logger.info(f"Owner payment {owner_payment.id} marked as completed")
-                return {'success': True, 'payment_type': 'owner', 'payment_id': owner_payment.id}
+                return {'success': True, 'payment_type': 'owner', 'payment_id': owner_payment.id, 'transitioned': True}
             
             else:
                 logger.warning(f"No payment record found for merchant_order_id: {merchant_order_id}")
@@ -450,33 +534,37 @@ class PhonePeService:
     
     @classmethod
     def handle_payment_failed(cls, merchant_order_id):
-        """Mark payment as failed"""
+        """Mark payment as failed; like completion, only the winning caller updates related records"""
         try:
             # Find payment record
-            payment = Payment.objects.filter(merchant_order_id=merchant_order_id).first()
-            owner_payment = OwnerPayment.objects.filter(merchant_order_id=merchant_order_id).first()
+            order = GatewayOrder.resolve(merchant_order_id)
+            payment = order.payment if order else None
+            owner_payment = order.owner_payment if order else None
             
             if payment:
-                payment.status = 'failed'
-                payment.save()
-                
-                # Update transaction record
-                transaction = PaymentTransaction.objects.filter(merchant_order_id=merchant_order_id).first()
-                if transaction:
-                    transaction.status = 'failed'
-                    transaction.reconciliation_status = 'completed'
-                    transaction.save()
+                with db_transaction.atomic():
+                    payment = Payment.transition(payment.id, 'failed')
+                    if payment is None:
+                        return cls._already_settled('tenant', order.payment_id, Payment, 'failed')
+                    
+                    # Update transaction record
+                    transaction = order.transaction
+                    if transaction:
+                        transaction.status = 'failed'
+                        transaction.reconciliation_status = 'completed'
+                        transaction.save()
                 
                 logger.info(f"Tenant payment {payment.id} marked as failed")
-                return {'success': True, 'payment_type': 'tenant', 'payment_id': payment.id}
+                return {'success': True, 'payment_type': 'tenant', 'payment_id': payment.id, 'transitioned': True}
             
             elif owner_payment:
                 # Handle new OwnerPayment model
-                owner_payment.status = 'failed'
-                owner_payment.save()
+                owner_payment = OwnerPayment.transition(owner_payment.id, 'failed')
+                if owner_payment is None:
+                    return cls._already_settled('owner', order.owner_payment_id, OwnerPayment, 'failed')
                 
                 logger.info(f"Owner payment {owner_payment.id} marked as failed")
-                return {'success': True, 'payment_type': 'owner', 'payment_id': owner_payment.id}
+                return {'success': True, 'payment_type': 'owner', 'payment_id': owner_payment.id, 'transitioned': True}
             
             else:
                 logger.warning(f"No payment record found for merchant_order_id: {merchant_order_id}")
@@ -507,6 +595,7 @@ class PhonePeService:
                 if transaction:
                     transaction.payment_attempt_count += 1
                     transaction.reconciliation_status = 'in_progress'
+                    transaction.next_check_at = transaction.next_check_after()
                     transaction.save()
                 
                 return {'success': True, 'state': 'PENDING', 'message': 'Payment still pending'}
@@ -526,15 +615,10 @@ class PhonePeService:
             
             # Find original payment to get amount if not provided
             if not amount:
-                payment = Payment.objects.filter(merchant_order_id=original_merchant_order_id).first()
-                owner_payment = OwnerPayment.objects.filter(merchant_order_id=original_merchant_order_id).first()
-                
-                if payment:
-                    amount = payment.amount
-                elif owner_payment:
-                    amount = owner_payment.amount
-                else:
+                order = GatewayOrder.resolve(original_merchant_order_id)
+                if order is None or order.target is None:
                     return {'success': False, 'error': 'Original payment not found'}
+                amount = order.target.amount
             
             # Convert amount to paise
             amount_paise = int(float(amount) * 100)
@@ -548,7 +632,8 @@ class PhonePeService:
             )
             
             # Initiate refund
-            response = client.refund(refund_request)
+            with gateway_timer('phonepe', 'refund'):
+                response = client.refund(refund_request)
             
             logger.info(f"Refund initiated for order {original_merchant_order_id}, refund_id {merchant_refund_id}")
             
@@ -580,7 +665,8 @@ class PhonePeService:
         """Check refund status"""
         try:
             client = cls.get_client()
-            response = client.get_refund_status(merchant_refund_id)
+            with gateway_timer('phonepe', 'get_refund_status'):
+                response = client.get_refund_status(merchant_refund_id)
             
             logger.info(f"Refund status checked for {merchant_refund_id}: {response.state}")
             
@@ -643,45 +729,73 @@ class PhonePeService:
                 'error_code': 'UNEXPECTED_ERROR'
             }
     
+    @classmethod
+    def parse_webhook_callback(cls, validated_callback):
+        """Return (callback_type, merchant_order_id, state) from a validated callback"""
+        callback_type = validated_callback['callback_type']
+        callback_type = str(getattr(callback_type, 'value', callback_type))
+        callback_data = validated_callback['callback_data']
+        
+        merchant_order_id = None
+        if hasattr(callback_data, 'original_merchant_order_id'):
+            merchant_order_id = callback_data.original_merchant_order_id
+        elif hasattr(callback_data, 'merchant_order_id'):
+            merchant_order_id = callback_data.merchant_order_id
+        
+        return callback_type, merchant_order_id, getattr(callback_data, 'state', None)
+    
+    @classmethod
+    def apply_webhook_event(cls, callback_type, merchant_order_id, state):
+        """Apply the effect of a webhook event to our payment records"""
+        if callback_type in ['CHECKOUT_ORDER_COMPLETED', 'CHECKOUT_ORDER_FAILED']:
+            if state == 'COMPLETED':
+                result = cls.handle_payment_completed(merchant_order_id)
+            elif state == 'FAILED':
+                result = cls.handle_payment_failed(merchant_order_id)
+            else:
+                result = {'success': False, 'error': f'Unknown payment state: {state}', 'retryable': False}
+            
+            logger.info(f"Webhook processed for payment {merchant_order_id}: {state}")
+            return result
+        
+        elif callback_type in ['PG_REFUND_COMPLETED', 'PG_REFUND_FAILED']:
+            # Handle refund webhooks
+            logger.info(f"Refund webhook received for {merchant_order_id}: {state}")
+            return {'success': True, 'message': 'Refund webhook processed'}
+        
+        else:
+            logger.warning(f"Unknown webhook callback type: {callback_type}")
+            return {'success': False, 'error': f'Unknown callback type: {callback_type}', 'retryable': False}
+    
     @classmethod
     def process_webhook_callback(cls, validated_callback):
         """Process validated webhook callback"""
         try:
-            callback_type = validated_callback['callback_type']
-            callback_data = validated_callback['callback_data']
-            
-            merchant_order_id = None
-            if hasattr(callback_data, 'original_merchant_order_id'):
-                merchant_order_id = callback_data.original_merchant_order_id
-            elif hasattr(callback_data, 'merchant_order_id'):
-                merchant_order_id = callback_data.merchant_order_id
+            callback_type, merchant_order_id, state = cls.parse_webhook_callback(validated_callback)
             
             if not merchant_order_id:
                 logger.warning("No merchant order ID found in webhook callback")
                 return {'success': False, 'error': 'No merchant order ID found'}
             
-            state = callback_data.state
-            
-            if callback_type in ['CHECKOUT_ORDER_COMPLETED', 'CHECKOUT_ORDER_FAILED']:
-                if state == 'COMPLETED':
-                    result = cls.handle_payment_completed(merchant_order_id)
-                elif state == 'FAILED':
-                    result = cls.handle_payment_failed(merchant_order_id)
-                else:
-                    result = {'success': False, 'error': f'Unknown payment state: {state}'}
-                
-                logger.info(f"Webhook processed for payment {merchant_order_id}: {state}")
-                return result
-            
-            elif callback_type in ['PG_REFUND_COMPLETED', 'PG_REFUND_FAILED']:
-                # Handle refund webhooks
-                logger.info(f"Refund webhook received for {merchant_order_id}: {state}")
-                return {'success': True, 'message': 'Refund webhook processed'}
-            
-            else:
-                logger.warning(f"Unknown webhook callback type: {callback_type}")
-                return {'success': False, 'error': f'Unknown callback type: {callback_type}'}
+            return cls.apply_webhook_event(callback_type, merchant_order_id, state)
                 
         except Exception as e:
             logger.error(f"Error processing webhook callback: {str(e)}")
             return {'success': False, 'error': str(e)}
+    
+    @classmethod
+    def process_webhook_event(cls, event):
+        """Apply a claimed WebhookEvent from the inbox and record the outcome"""
+        try:
+            result = cls.apply_webhook_event(event.callback_type, event.merchant_order_id, event.state)
+        except Exception as e:
+            result = {'success': False, 'error': str(e)}
+        
+        if result.get('success'):
+            event.mark_processed(result)
+        elif not result.get('retryable', True):
+            # Nothing to retry for event types or states we do not handle
+            event.mark_attempt_failed(result['error'], give_up=True)
+        elif event.mark_attempt_failed(result.get('error', 'Webhook event was not applied')):
+            logger.warning(f"Webhook event {event.id} attempt {event.attempts} failed ({event.status}): {event.last_error}")
+        return result
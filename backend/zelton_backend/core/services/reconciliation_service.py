@@ -0,0 +1,244 @@
+import heapq
+import logging
+import random
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from core.models import PaymentTransaction
+from core.services.phonepe_service import PhonePeService
+
+logger = logging.getLogger(__name__)
+
+# verify_payment_status error codes worth retrying after a backoff
+RETRYABLE_ERRORS = {'RATE_LIMIT_EXCEEDED', 'TIMEOUT_ERROR', 429}
+
+
+class TokenBucket:
+    """Thread-safe token bucket: `rate` tokens per second, bursting up to `capacity`"""
+
+    def __init__(self, rate, capacity, clock=time.monotonic, sleep=time.sleep):
+        self.rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._clock = clock
+        self._sleep = sleep
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available, returning the seconds to wait otherwise (0 on success)"""
+        with self._lock:
+            now = self._clock()
+            self._refill(now)
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, timeout=None):
+        """Block until a token is available; returns False if `timeout` seconds pass first"""
+        deadline = None if timeout is None else self._clock() + timeout
+        while True:
+            wait_seconds = self.try_acquire()
+            if not wait_seconds:
+                return True
+            if deadline is not None and self._clock() + wait_seconds > deadline:
+                return False
+            self._sleep(wait_seconds)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the gateway answers 429, so every caller slows down"""
+        with self._lock:
+            self._refill(self._clock())
+            self._tokens = min(self._tokens, 0)
+
+
+_status_rate_limiter = None
+_status_rate_limiter_lock = threading.Lock()
+
+
+def get_status_rate_limiter():
+    """Process-wide limiter for PhonePe order status calls"""
+    global _status_rate_limiter
+    with _status_rate_limiter_lock:
+        if _status_rate_limiter is None:
+            _status_rate_limiter = TokenBucket(
+                rate=getattr(settings, 'PHONEPE_STATUS_RATE_LIMIT', 10),
+                capacity=getattr(settings, 'PHONEPE_STATUS_RATE_BURST', 20),
+            )
+        return _status_rate_limiter
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class ReconciliationEngine:
+    """
+    Check pending PhonePe orders concurrently.
+
+    All status calls share one token bucket. An order that hits a rate limit or timeout
+    is re-queued with its own exponential backoff instead of sleeping on a worker thread,
+    so one slow order never holds up the rest of the sweep.
+    """
+
+    def __init__(self, max_workers=8, rate_limiter=None, max_attempts=3, base_backoff=2.0, dry_run=False):
+        self.max_workers = max_workers
+        self.rate_limiter = rate_limiter or get_status_rate_limiter()
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.dry_run = dry_run
+        self._clock = time.monotonic
+
+    def backoff_seconds(self, attempt):
+        """Exponential backoff with full jitter for the given (1-based) failed attempt"""
+        return random.uniform(0, self.base_backoff * (2 ** (attempt - 1)))
+
+    def run(self, transactions):
+        """Reconcile the given PaymentTransactions and return a metrics dict"""
+        started = self._clock()
+        started_at = timezone.now()
+        outcomes = {}
+        check_latencies = []
+        queue_waits = []
+        resolution_lags = []
+        gateway_calls = 0
+
+        # (ready_at, sequence, transaction, attempt) ordered by when the order may be checked again
+        queue = []
+        for sequence, transaction in enumerate(transactions):
+            heapq.heappush(queue, (started, sequence, transaction, 1))
+        sequence = len(queue)
+
+        in_flight = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while queue or in_flight:
+                now = self._clock()
+                while queue and queue[0][0] <= now and len(in_flight) < self.max_workers:
+                    ready_at, _, transaction, attempt = heapq.heappop(queue)
+                    queue_waits.append(now - ready_at)
+                    future = executor.submit(self._check, transaction)
+                    in_flight[future] = (transaction, attempt)
+
+                if not in_flight:
+                    # Everything left is backing off
+                    time.sleep(max(0, queue[0][0] - self._clock()))
+                    continue
+
+                if queue and len(in_flight) < self.max_workers:
+                    # A worker is free: wake up when the next backed-off order is ready
+                    timeout = max(0, queue[0][0] - self._clock())
+                else:
+                    # Nothing can be submitted until a check finishes
+                    timeout = None
+                done, _ = wait(in_flight, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    transaction, attempt = in_flight.pop(future)
+                    result = future.result()
+                    if result['called_gateway']:
+                        gateway_calls += 1
+                        check_latencies.append(result['elapsed'])
+
+                    if result['outcome'] == 'retry':
+                        if result.get('rate_limited'):
+                            self.rate_limiter.drain()
+                        if attempt < self.max_attempts:
+                            heapq.heappush(
+                                queue,
+                                (self._clock() + self.backoff_seconds(attempt), sequence, transaction, attempt + 1)
+                            )
+                            sequence += 1
+                            continue
+                        result['outcome'] = 'error'
+
+                    outcomes[result['outcome']] = outcomes.get(result['outcome'], 0) + 1
+                    if result['outcome'] in ('completed', 'failed'):
+                        resolution_lags.append((timezone.now() - transaction.created_at).total_seconds())
+
+        elapsed = self._clock() - started
+        processed = sum(outcomes.values())
+        return {
+            'started_at': started_at.isoformat(),
+            'orders': processed,
+            'outcomes': outcomes,
+            'gateway_calls': gateway_calls,
+            'elapsed_seconds': round(elapsed, 3),
+            'orders_per_second': round(processed / elapsed, 2) if elapsed else 0,
+            'check_latency_p50_ms': round(_percentile(check_latencies, 50) * 1000, 1),
+            'check_latency_p95_ms': round(_percentile(check_latencies, 95) * 1000, 1),
+            'queue_wait_p95_ms': round(_percentile(queue_waits, 95) * 1000, 1),
+            'resolution_lag_p50_seconds': round(_percentile(resolution_lags, 50), 1),
+            'resolution_lag_max_seconds': round(max(resolution_lags), 1) if resolution_lags else 0,
+        }
+
+    def _check(self, transaction):
+        """Check one order on a pool thread"""
+        try:
+            return self.reconcile_transaction(transaction)
+        except Exception as e:
+            logger.error(f"Error reconciling transaction {transaction.id}: {str(e)}")
+            return {'outcome': 'error', 'called_gateway': False, 'error': str(e)}
+        finally:
+            connection.close()
+
+    def reconcile_transaction(self, transaction):
+        """Check a single order once and apply the result; never sleeps except for the shared rate limit"""
+        merchant_order_id = transaction.merchant_order_id
+
+        if self.dry_run:
+            logger.info(f"DRY RUN: Would reconcile transaction {transaction.id}")
+            return {'outcome': 'skipped', 'called_gateway': False}
+
+        now = timezone.now()
+        PaymentTransaction.objects.filter(id=transaction.id).update(
+            payment_attempt_count=F('payment_attempt_count') + 1,
+            reconciliation_status='in_progress',
+            next_check_at=transaction.next_check_after(now),
+            updated_at=now,
+        )
+
+        self.rate_limiter.acquire()
+        check_started = self._clock()
+        response = PhonePeService.verify_payment_status(merchant_order_id, max_retries=1)
+        elapsed = self._clock() - check_started
+
+        if not response['success']:
+            error_code = response.get('error_code')
+            if error_code in RETRYABLE_ERRORS:
+                return {
+                    'outcome': 'retry',
+                    'called_gateway': True,
+                    'elapsed': elapsed,
+                    'rate_limited': error_code in ('RATE_LIMIT_EXCEEDED', 429),
+                }
+            logger.warning(f"Error checking status for {merchant_order_id}: {response['error']}")
+            return {'outcome': 'error', 'called_gateway': True, 'elapsed': elapsed}
+
+        state = response['state']
+        if state == 'COMPLETED':
+            result = PhonePeService.handle_payment_completed(merchant_order_id)
+            outcome = 'completed' if result['success'] else 'error'
+        elif state == 'FAILED':
+            result = PhonePeService.handle_payment_failed(merchant_order_id)
+            outcome = 'failed' if result['success'] else 'error'
+        elif state == 'PENDING':
+            outcome = 'pending'
+        else:
+            logger.warning(f"Unknown payment state for {merchant_order_id}: {state}")
+            outcome = 'error'
+
+        return {'outcome': outcome, 'called_gateway': True, 'elapsed': elapsed}
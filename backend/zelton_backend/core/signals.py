@@ -1,6 +1,12 @@
-from django.db.models.signals import post_save, post_delete
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
-from .models import Unit, Property, Owner, TenantKey, Payment, OwnerPayment
+from .models import (
+    Unit, Property, Owner, Tenant, TenantKey, Payment, OwnerPayment, TenantLedger, PaymentMonthlyRollup,
+    ActivityEvent, PricingPlan, CashfreeBeneficiary
+)
+from .cache import invalidate_owner_cache, invalidate_all_owner_caches
+from .streams import FINAL_STATUSES, notify_order_status
 
 
 @receiver(post_save, sender=Unit)
@@ -75,12 +81,85 @@ def update_unit_status_on_tenant_join(sender, instance, created, **kwargs):
         property_obj.save(update_fields=['occupied_units'])
 
 
+@receiver(pre_save, sender=TenantKey)
+def track_previous_key_tenant(sender, instance, **kwargs):
+    """Remember which tenant held the key before this save"""
+    instance._previous_tenant_id = None
+    if instance.pk:
+        instance._previous_tenant_id = TenantKey.objects.filter(
+            pk=instance.pk, is_used=True
+        ).values_list('tenant_id', flat=True).first()
+
+
+@receiver(post_save, sender=TenantKey)
+def handle_tenancy_change(sender, instance, created, **kwargs):
+    """Open or close the rent ledger and log activity when a tenant joins or leaves"""
+    previous_tenant_id = getattr(instance, '_previous_tenant_id', None)
+    current_tenant_id = instance.tenant_id if instance.is_used else None
+    if previous_tenant_id == current_tenant_id or not instance.unit_id:
+        return
+    
+    if previous_tenant_id:
+        TenantLedger.close_for_tenant(previous_tenant_id, unit_id=instance.unit_id)
+        previous_tenant = Tenant.objects.select_related('user').filter(pk=previous_tenant_id).first()
+        if previous_tenant:
+            ActivityEvent.record_tenant_left(previous_tenant, instance.unit)
+    
+    if current_tenant_id:
+        if not TenantLedger.objects.filter(tenant_id=current_tenant_id, is_active=True).exists():
+            TenantLedger.open_for_tenant_key(instance).accrue_rent()
+        ActivityEvent.record_tenant_joined(instance)
+
+
 @receiver(post_save, sender=Payment)
 def update_unit_remaining_amount_on_payment(sender, instance, created, **kwargs):
-    """Update unit remaining amount when payment status changes"""
-    if instance.tenant and instance.unit:
-        # Update the remaining amount for the unit
-        instance.unit.update_remaining_amount(instance.tenant)
+    """Post the payment to the tenant's rent ledger and refresh the unit remaining amount"""
+    if not (instance.tenant_id and instance.unit_id):
+        return
+    if created and instance.status != 'completed':
+        # A new pending payment does not move the balance
+        return
+    
+    ledger = TenantLedger.record_payment(instance)
+    if ledger:
+        ledger.accrue_rent()
+        ledger.sync_unit_remaining_amount()
+
+
+@receiver(pre_save, sender=Payment)
+def snapshot_payment_for_rollup(sender, instance, **kwargs):
+    """Load the stored payment state when the instance was not read with its rollup fields"""
+    if instance.pk and not hasattr(instance, '_rollup_state'):
+        stored = Payment.objects.filter(pk=instance.pk).only(*Payment.ROLLUP_FIELDS).first()
+        instance._rollup_state = PaymentMonthlyRollup.payment_state(stored) if stored else None
+    
+    previous_state = getattr(instance, '_rollup_state', None)
+    instance._previous_status = previous_state[2] if previous_state else None
+
+
+@receiver(post_save, sender=Payment)
+def record_payment_completed_activity(sender, instance, created, **kwargs):
+    """Log an activity event when a payment becomes completed, unless a verified payment proof completed it"""
+    if getattr(instance, '_completed_by_proof', False):
+        return
+    if instance.status == 'completed' and getattr(instance, '_previous_status', None) != 'completed':
+        ActivityEvent.record_payment_completed(instance)
+
+
+@receiver(post_save, sender=Payment)
+def update_payment_rollup(sender, instance, created, **kwargs):
+    """Move the payment between monthly rollup buckets when its status, amount or date changes"""
+    new_state = PaymentMonthlyRollup.payment_state(instance)
+    PaymentMonthlyRollup.apply_change(getattr(instance, '_rollup_state', None), new_state)
+    instance._rollup_state = new_state
+
+
+@receiver(post_delete, sender=Payment)
+def remove_payment_from_rollup(sender, instance, **kwargs):
+    """Remove a deleted payment from its monthly rollup bucket"""
+    PaymentMonthlyRollup.apply_change(
+        getattr(instance, '_rollup_state', PaymentMonthlyRollup.payment_state(instance)), None
+    )
 
 
 @receiver(post_save, sender=OwnerPayment)
@@ -103,3 +182,66 @@ def handle_subscription_payment_completion(sender, instance, created, **kwargs):
             f"Plan changed to {instance.pricing_plan.name if instance.pricing_plan else 'Unknown'} "
             f"(max units: {instance.pricing_plan.max_units if instance.pricing_plan else 'Unknown'})"
         )
+
+
+def _owner_id_for_property(property_id):
+    return Property.objects.filter(pk=property_id).values_list('owner_id', flat=True).first()
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_delete, sender=Payment)
+def invalidate_owner_cache_on_payment_change(sender, instance, **kwargs):
+    """Invalidate cached owner responses when a tenant payment changes"""
+    invalidate_owner_cache(
+        Property.objects.filter(units__id=instance.unit_id).values_list('owner_id', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=Unit)
+@receiver(post_delete, sender=Unit)
+@receiver(post_save, sender=TenantKey)
+@receiver(post_delete, sender=TenantKey)
+def invalidate_owner_cache_on_unit_change(sender, instance, **kwargs):
+    """Invalidate cached owner responses when a unit or tenant key changes"""
+    invalidate_owner_cache(_owner_id_for_property(instance.property_id))
+
+
+@receiver(post_save, sender=Property)
+@receiver(post_delete, sender=Property)
+@receiver(post_save, sender=OwnerPayment)
+@receiver(post_delete, sender=OwnerPayment)
+def invalidate_owner_cache_on_owner_data_change(sender, instance, **kwargs):
+    """Invalidate cached owner responses when a property or subscription payment changes"""
+    invalidate_owner_cache(instance.owner_id)
+
+
+@receiver(post_save, sender=Owner)
+def invalidate_owner_cache_on_profile_change(sender, instance, **kwargs):
+    """Invalidate cached owner responses when the owner's profile or subscription changes"""
+    invalidate_owner_cache(instance.id)
+
+
+@receiver(post_save, sender=PricingPlan)
+@receiver(post_delete, sender=PricingPlan)
+def invalidate_owner_caches_on_plan_change(sender, instance, **kwargs):
+    """Pricing plans feed every owner's limits, so invalidate all owners"""
+    invalidate_all_owner_caches()
+
+
+@receiver(post_save, sender=Payment)
+@receiver(post_save, sender=OwnerPayment)
+def notify_payment_status_waiters(sender, instance, **kwargs):
+    """Wake clients waiting on the payment status stream once a final status is committed"""
+    if instance.status in FINAL_STATUSES and instance.merchant_order_id:
+        merchant_order_id = instance.merchant_order_id
+        transaction.on_commit(lambda: notify_order_status(merchant_order_id))
+
+
+@receiver(post_save, sender=Owner)
+def invalidate_cashfree_beneficiary(sender, instance, created, update_fields=None, **kwargs):
+    """Force the next payout to re-register the beneficiary when the owner's bank/UPI details change"""
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(CashfreeBeneficiary.PAYOUT_DETAIL_FIELDS):
+        return
+    CashfreeBeneficiary.invalidate_if_changed(instance)
@@ -0,0 +1,207 @@
+"""
+Server-push payment status for the mobile app.
+
+Clients wait on /api/payments/status-stream/<merchant_order_id>/ instead of polling verify-payment.
+The view is async: served by the ASGI app (zelton_backend.asgi under a uvicorn worker) a waiting
+client costs an idle coroutine rather than a sync gunicorn worker.
+
+Whenever a Payment or OwnerPayment is saved with a final status, a per-order version key in the
+shared cache is bumped after commit. One poller task per event loop watches the keys of every
+order that has waiters with a single get_many per tick and wakes the waiters whose key changed.
+"""
+import asyncio
+import json
+import logging
+import time
+import weakref
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = {'completed', 'failed', 'cancelled', 'refunded'}
+GATEWAY_STATES = {'completed': 'COMPLETED', 'failed': 'FAILED'}
+
+# How often the poller reads the version keys of watched orders
+POLL_INTERVAL = 0.25
+# Seconds between SSE keep-alive comments, so proxies do not drop idle streams
+HEARTBEAT_INTERVAL = 15
+
+
+def _version_key(merchant_order_id):
+    return f'payment-status:{merchant_order_id}:version'
+
+
+def notify_order_status(merchant_order_id):
+    """Wake every client waiting on this order, in any process"""
+    if not merchant_order_id:
+        return
+    key = _version_key(merchant_order_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), 3600)
+
+
+class PaymentStatusHub:
+    """Waiters of one event loop, woken by a single poller task"""
+
+    def __init__(self, interval=POLL_INTERVAL):
+        self.interval = interval
+        self._waiters = {}
+        self._task = None
+
+    async def wait(self, merchant_order_id, version, timeout):
+        """Wait until the order's version differs from `version`; returns the new version or None on timeout"""
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(merchant_order_id, []).append((version, future))
+        if self._task is None or self._task.done():
+            self._task = asyncio.ensure_future(self._poll())
+
+        try:
+            return await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            waiters = self._waiters.get(merchant_order_id, [])
+            self._waiters[merchant_order_id] = [w for w in waiters if w[1] is not future]
+            if not self._waiters[merchant_order_id]:
+                del self._waiters[merchant_order_id]
+
+    async def _poll(self):
+        while self._waiters:
+            keys = {_version_key(order_id): order_id for order_id in self._waiters}
+            try:
+                versions = await sync_to_async(cache.get_many, thread_sensitive=False)(list(keys))
+            except Exception as e:
+                logger.error(f"Payment status poll failed: {str(e)}")
+                versions = {}
+
+            for key, order_id in keys.items():
+                current = versions.get(key)
+                for version, future in self._waiters.get(order_id, []):
+                    if current != version and not future.done():
+                        future.set_result(current)
+
+            await asyncio.sleep(self.interval)
+
+
+_hubs = weakref.WeakKeyDictionary()
+
+
+def get_hub():
+    loop = asyncio.get_running_loop()
+    if loop not in _hubs:
+        _hubs[loop] = PaymentStatusHub()
+    return _hubs[loop]
+
+
+def _authenticate(request):
+    """Authenticate with the same classes as the API views"""
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    try:
+        user = drf_request.user
+    except Exception:
+        return None
+    return user if user and user.is_authenticated else None
+
+
+def _load_order_status(merchant_order_id, user):
+    """Current status of a tenant rent payment or owner subscription payment the user may see"""
+    from .models import Payment, OwnerPayment
+
+    payment = Payment.objects.filter(
+        merchant_order_id=merchant_order_id, tenant__user=user
+    ).only('id', 'status', 'amount').first()
+    payment_type = 'tenant'
+    if payment is None:
+        payment = OwnerPayment.objects.filter(
+            merchant_order_id=merchant_order_id, owner__user=user
+        ).only('id', 'status', 'amount').first()
+        payment_type = 'owner'
+    if payment is None:
+        return None
+
+    return {
+        'merchant_order_id': merchant_order_id,
+        'payment_type': payment_type,
+        'payment_id': payment.id,
+        'status': payment.status,
+        'state': GATEWAY_STATES.get(payment.status, 'PENDING'),
+        'amount': str(payment.amount),
+        'is_final': payment.status in FINAL_STATUSES,
+    }
+
+
+async def _watch(merchant_order_id, user, version, order_status, deadline):
+    """Yield the order status every time it changes until it is final or the deadline passes"""
+    hub = get_hub()
+    while not order_status['is_final']:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return
+        new_version = await hub.wait(merchant_order_id, version, min(remaining, HEARTBEAT_INTERVAL))
+        if new_version is None:
+            yield None
+            continue
+        version = new_version
+        refreshed = await sync_to_async(_load_order_status)(merchant_order_id, user)
+        if refreshed is None:
+            return
+        if refreshed != order_status:
+            order_status = refreshed
+            yield order_status
+
+
+async def _event_stream(merchant_order_id, user, version, order_status, deadline):
+    yield f"event: status\ndata: {json.dumps(order_status)}\n\n"
+    async for update in _watch(merchant_order_id, user, version, order_status, deadline):
+        if update is None:
+            yield ": keep-alive\n\n"
+        else:
+            yield f"event: status\ndata: {json.dumps(update)}\n\n"
+    yield "event: end\ndata: {}\n\n"
+
+
+async def payment_status_stream(request, merchant_order_id):
+    """
+    Wait for a payment to reach a final state.
+    Long-poll by default (?timeout= seconds, capped by PAYMENT_STATUS_WAIT_TIMEOUT);
+    Server-Sent Events when the client sends Accept: text/event-stream.
+    """
+    user = await sync_to_async(_authenticate)(request)
+    if user is None:
+        return JsonResponse({'error': 'Authentication credentials were not provided.'}, status=401)
+
+    # Read the version before the status, so a change in between still wakes this waiter
+    version = await sync_to_async(cache.get, thread_sensitive=False)(_version_key(merchant_order_id))
+    order_status = await sync_to_async(_load_order_status)(merchant_order_id, user)
+    if order_status is None:
+        return JsonResponse({'error': 'Payment not found'}, status=404)
+
+    max_wait = getattr(settings, 'PAYMENT_STATUS_WAIT_TIMEOUT', 25)
+
+    if 'text/event-stream' in request.headers.get('Accept', ''):
+        deadline = time.monotonic() + getattr(settings, 'PAYMENT_STATUS_STREAM_TIMEOUT', 300)
+        response = StreamingHttpResponse(
+            _event_stream(merchant_order_id, user, version, order_status, deadline),
+            content_type='text/event-stream'
+        )
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    try:
+        timeout = min(float(request.GET.get('timeout', max_wait)), max_wait)
+    except ValueError:
+        return JsonResponse({'error': 'timeout must be a number of seconds'}, status=400)
+
+    async for update in _watch(merchant_order_id, user, version, order_status, time.monotonic() + timeout):
+        if update is not None:
+            order_status = update
+    return JsonResponse(order_status)
@@ -1,11 +1,15 @@
+from datetime import date
 from decimal import Decimal
+from io import StringIO
 from unittest.mock import patch
 
 from django.contrib.auth.models import User
-from django.test import TestCase
+from django.core.management import CommandError, call_command
+from django.test import TestCase, override_settings
 from django.utils import timezone
 from rest_framework.test import APIClient
 
+from core.cache import invalidate_owner_cache
 from core.models import (
     Owner,
     Property,
@@ -14,9 +18,110 @@ from core.models import (
     TenantKey,
     Payment,
     PaymentTransaction,
+    TenantLedger,
+    LedgerEntry,
+    PaymentMonthlyRollup,
+    ActivityEvent,
+    ManualPaymentProof,
+    OwnerPayout,
+    PayoutJob,
+    WebhookEvent,
+    GatewayOrder,
+    Invoice,
+    CashfreeBeneficiary,
+    OwnerPayoutItem,
 )
 
 
+def create_owner(username="owner@example.com", **owner_fields):
+    owner_user = User.objects.create_user(
+        username=username,
+        email=username,
+        password="password123",
+        first_name="Owner",
+        last_name="User",
+    )
+    return Owner.objects.create(
+        user=owner_user,
+        phone="9999999999",
+        address="Owner Address",
+        city="City",
+        state="State",
+        pincode="123456",
+        **owner_fields,
+    )
+
+
+def create_property(owner, name="Test Property"):
+    return Property.objects.create(
+        owner=owner,
+        name=name,
+        address="123 Test Street",
+        city="City",
+        state="State",
+        pincode="123456",
+        property_type="apartment",
+    )
+
+
+def create_unit(property_obj, unit_number="A-101", rent="10000.00"):
+    return Unit.objects.create(
+        property=property_obj,
+        unit_number=unit_number,
+        unit_type="1BHK",
+        rent_amount=Decimal(rent),
+    )
+
+
+def create_tenant(username="tenant@example.com", first_name="Tenant", last_name="User", **tenant_fields):
+    tenant_user = User.objects.create_user(
+        username=username,
+        email=username,
+        password="password123",
+        first_name=first_name,
+        last_name=last_name,
+    )
+    return Tenant.objects.create(user=tenant_user, **tenant_fields)
+
+
+def move_in(tenant, unit):
+    """Give the tenant the key created with the unit, as joining with it does"""
+    tenant_key = unit.tenant_keys.get()
+    tenant_key.tenant = tenant
+    tenant_key.is_used = True
+    tenant_key.used_at = timezone.now()
+    tenant_key.save()
+    return tenant_key
+
+
+def create_payment(tenant, unit, amount="10000.00", status="completed", **fields):
+    if status == "completed":
+        fields.setdefault("payment_date", timezone.now())
+    fields.setdefault("due_date", timezone.now().date())
+    return Payment.objects.create(
+        tenant=tenant,
+        unit=unit,
+        amount=Decimal(amount),
+        payment_type="rent",
+        status=status,
+        **fields,
+    )
+
+
+class OwnerPropertyTestCase(TestCase):
+    """An owner with one property and unit, and a tenant who has not moved in yet"""
+
+    owner_fields = {}
+
+    def setUp(self):
+        self.owner = create_owner(**self.owner_fields)
+        self.owner_user = self.owner.user
+        self.property = create_property(self.owner)
+        self.unit = create_unit(self.property)
+        self.tenant = create_tenant()
+        self.tenant_user = self.tenant.user
+
+
 class TenantPaymentChargeTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -162,3 +267,1682 @@ class TenantPaymentChargeTests(TestCase):
         called_args, called_kwargs = mock_phonepe.call_args
         self.assertEqual(called_kwargs["payment_charge"], Decimal("300.00"))
 
+
+class OwnerDashboardTotalDueTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = create_owner()
+        self.property = create_property(self.owner)
+        self.client.force_authenticate(user=self.owner.user)
+
+    def _add_tenant(self, index, rent, paid=None):
+        tenant = create_tenant(f"tenant{index}@example.com")
+        unit = create_unit(self.property, f"U-{index}", rent)
+        move_in(tenant, unit)
+        if paid:
+            create_payment(tenant, unit, paid)
+        return tenant, unit
+
+    def test_total_due_matches_per_tenant_calculation(self):
+        tenants = [
+            self._add_tenant(1, "10000.00"),
+            self._add_tenant(2, "8000.00", paid="3000.00"),
+            self._add_tenant(3, "5000.00", paid="5000.00"),
+        ]
+
+        expected = sum(Payment.calculate_monthly_due(tenant, unit) for tenant, unit in tenants)
+
+        self.assertEqual(Payment.calculate_total_due_for_properties([self.property]), expected)
+        response = self.client.get("/api/owners/dashboard/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Decimal(response.data["total_due"]), expected)
+
+    def test_total_due_query_count_does_not_grow_with_tenants(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._add_tenant(1, "10000.00", paid="1000.00")
+        with CaptureQueriesContext(connection) as single_tenant:
+            Payment.calculate_total_due_for_properties([self.property])
+
+        for index in range(2, 12):
+            self._add_tenant(index, "10000.00", paid="1000.00")
+        with CaptureQueriesContext(connection) as many_tenants:
+            total_due = Payment.calculate_total_due_for_properties([self.property])
+
+        self.assertEqual(len(many_tenants), len(single_tenant))
+        self.assertEqual(total_due, Decimal("99000.00"))
+
+
+class TenantLedgerTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tenant_key = move_in(self.tenant, self.unit)
+
+    def _pay(self, amount, status="completed"):
+        return create_payment(self.tenant, self.unit, amount, status, payment_date=timezone.now())
+
+    def test_ledger_opened_on_join_with_current_month_accrued(self):
+        ledger = TenantLedger.objects.get(tenant=self.tenant, is_active=True)
+
+        self.assertEqual(ledger.unit, self.unit)
+        self.assertEqual(ledger.balance, Decimal("10000.00"))
+        self.assertEqual(ledger.entries.filter(entry_type="rent_accrual").count(), 1)
+
+    def test_completed_payment_posted_once_and_reversed_on_status_change(self):
+        payment = self._pay("4000.00", status="pending")
+        self.assertEqual(Payment.calculate_monthly_due(self.tenant, self.unit), Decimal("10000.00"))
+
+        payment.status = "completed"
+        payment.save()
+        payment.save()
+        self.assertEqual(LedgerEntry.objects.filter(payment=payment).count(), 1)
+        self.assertEqual(Payment.calculate_monthly_due(self.tenant, self.unit), Decimal("6000.00"))
+        self.unit.refresh_from_db()
+        self.assertEqual(self.unit.remaining_amount, Decimal("6000.00"))
+
+        payment.status = "failed"
+        payment.save()
+        self.assertEqual(Payment.calculate_monthly_due(self.tenant, self.unit), Decimal("10000.00"))
+
+    def test_rent_accrues_once_per_elapsed_month(self):
+        ledger = TenantLedger.objects.get(tenant=self.tenant, is_active=True)
+        current_month = timezone.now().date().replace(day=1)
+        three_months_later = date(
+            current_month.year + (current_month.month + 2) // 12,
+            (current_month.month + 2) % 12 + 1,
+            15,
+        )
+
+        ledger.accrue_rent(three_months_later)
+        ledger.accrue_rent(three_months_later)
+
+        self.assertEqual(ledger.balance, Decimal("40000.00"))
+        self.assertEqual(ledger.entries.filter(entry_type="rent_accrual").count(), 4)
+
+    def test_existing_tenancy_backfilled_with_previous_balance(self):
+        self._pay("2500.00")
+        TenantLedger.objects.all().delete()
+
+        self.assertEqual(Payment.calculate_monthly_due(self.tenant, self.unit), Decimal("7500.00"))
+        self.assertEqual(TenantLedger.objects.filter(tenant=self.tenant, is_active=True).count(), 1)
+
+    def test_ledger_closed_when_tenant_key_released(self):
+        self.tenant_key.tenant = None
+        self.tenant_key.is_used = False
+        self.tenant_key.used_at = None
+        self.tenant_key.save()
+
+        self.assertFalse(TenantLedger.objects.filter(tenant=self.tenant, is_active=True).exists())
+
+
+class UnitListBatchLoadingTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.property = create_property(create_owner())
+        self.client.force_authenticate(user=self.property.owner.user)
+
+    def _add_unit(self, index, paid=None):
+        unit = create_unit(self.property, f"U-{index}")
+        tenant = create_tenant(f"tenant{index}@example.com", last_name=str(index))
+        move_in(tenant, unit)
+        if paid:
+            create_payment(tenant, unit, paid)
+        return unit
+
+    def test_unit_list_reports_rent_state_per_unit(self):
+        self._add_unit(1)
+        self._add_unit(2, paid="4000.00")
+        self._add_unit(3, paid="10000.00")
+
+        response = self.client.get("/api/units/")
+
+        self.assertEqual(response.status_code, 200)
+        units = {unit["unit_number"]: unit for unit in response.data["results"]}
+        self.assertEqual(units["U-1"]["rent_status"], "overdue")
+        self.assertEqual(units["U-1"]["pending_amount"], 10000.0)
+        self.assertEqual(units["U-2"]["rent_status"], "partial")
+        self.assertEqual(units["U-2"]["rent_status_color"], "orange")
+        self.assertEqual(units["U-2"]["pending_amount"], 6000.0)
+        self.assertTrue(units["U-3"]["current_month_paid"])
+        self.assertEqual(units["U-3"]["rent_status_text"], "Rent Paid")
+        self.assertEqual(units["U-3"]["tenant_name"], "Tenant 3")
+        self.assertEqual(units["U-3"]["tenant_key_status"], "used")
+
+    def test_unit_list_query_count_does_not_grow_with_units(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._add_unit(1, paid="1000.00")
+        with CaptureQueriesContext(connection) as single_unit:
+            self.client.get("/api/units/")
+
+        for index in range(2, 22):
+            self._add_unit(index, paid="1000.00")
+        with CaptureQueriesContext(connection) as many_units:
+            response = self.client.get("/api/units/")
+
+        self.assertEqual(len(response.data["results"]), 20)
+        self.assertEqual(len(many_units), len(single_unit))
+
+
+class PropertyListPaymentTotalsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = create_owner()
+        self.tenant = create_tenant()
+        self.client.force_authenticate(user=self.owner.user)
+
+    def _bulk_create_properties(self, count, start=0):
+        """Create properties with one unit and three payments each, bypassing signals"""
+        properties = Property.objects.bulk_create([
+            Property(
+                owner=self.owner,
+                name=f"Property {start + index}",
+                address="123 Test Street",
+                city="City",
+                state="State",
+                pincode="123456",
+                property_type="apartment",
+            )
+            for index in range(count)
+        ])
+        units = Unit.objects.bulk_create([
+            Unit(
+                property=property_obj,
+                unit_number="A-101",
+                unit_type="1BHK",
+                rent_amount=Decimal("10000.00"),
+            )
+            for property_obj in properties
+        ])
+        last_month = timezone.now() - timezone.timedelta(days=40)
+        Payment.objects.bulk_create([
+            Payment(
+                tenant=self.tenant,
+                unit=unit,
+                amount=Decimal(amount),
+                payment_type="rent",
+                status=payment_status,
+                payment_date=payment_date,
+                due_date=timezone.now().date(),
+                merchant_order_id=f"ORDER-{unit.id}-{payment_status}-{amount}",
+            )
+            for unit in units
+            for amount, payment_status, payment_date in [
+                ("5000.00", "completed", timezone.now()),
+                ("3000.00", "completed", last_month),
+                ("2000.00", "pending", None),
+            ]
+        ])
+        return properties
+
+    def test_property_list_includes_payment_totals(self):
+        self._bulk_create_properties(2)
+
+        response = self.client.get("/api/properties/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data), 2)
+        for property_data in response.data:
+            self.assertEqual(property_data["total_payments"], 8000.0)
+            self.assertEqual(property_data["current_month_payments"], 5000.0)
+            self.assertEqual(property_data["pending_payments"], 2000.0)
+
+    def test_property_list_query_count_constant_from_1_to_500_properties(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._bulk_create_properties(1)
+        with CaptureQueriesContext(connection) as one_property:
+            self.client.get("/api/properties/")
+
+        self._bulk_create_properties(499, start=1)
+        # bulk_create skips the signals that invalidate cached owner responses
+        invalidate_owner_cache(self.owner.id)
+        with CaptureQueriesContext(connection) as many_properties:
+            response = self.client.get("/api/properties/")
+
+        self.assertEqual(len(response.data), 500)
+        self.assertEqual(len(many_properties), len(one_property))
+
+
+class DetailedPropertiesTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.owner = create_owner()
+        self.client.force_authenticate(user=self.owner.user)
+
+    def _add_property(self, index, units=2):
+        property_obj = create_property(self.owner, f"Property {index}")
+        for unit_index in range(units):
+            unit = create_unit(property_obj, f"{index}-{unit_index}")
+            tenant = create_tenant(f"tenant{index}-{unit_index}@example.com", phone="9876543210")
+            move_in(tenant, unit)
+            create_payment(tenant, unit, "4000.00")
+        return property_obj
+
+    def test_detailed_properties_reports_unit_tenants_and_totals(self):
+        self._add_property(1)
+
+        response = self.client.get("/api/properties/detailed_properties/")
+
+        self.assertEqual(response.status_code, 200)
+        property_data = response.data["data"][0]
+        self.assertEqual(property_data["total_payments"], 8000.0)
+        self.assertEqual(property_data["current_month_payments"], 8000.0)
+        self.assertEqual(len(property_data["units"]), 2)
+        unit_data = property_data["units"][0]
+        self.assertEqual(unit_data["total_payments"], 4000.0)
+        self.assertEqual(unit_data["tenant"]["email"], "tenant1-0@example.com")
+
+    def test_detailed_properties_query_count_does_not_grow_with_portfolio(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._add_property(1)
+        with CaptureQueriesContext(connection) as small_portfolio:
+            self.client.get("/api/properties/detailed_properties/")
+
+        for index in range(2, 7):
+            self._add_property(index, units=4)
+        with CaptureQueriesContext(connection) as large_portfolio:
+            response = self.client.get("/api/properties/detailed_properties/")
+
+        self.assertEqual(len(response.data["data"]), 6)
+        self.assertEqual(len(large_portfolio), len(small_portfolio))
+
+    def test_detailed_properties_cursor_pagination(self):
+        for index in range(1, 6):
+            self._add_property(index, units=1)
+
+        response = self.client.get("/api/properties/detailed_properties/", {"page_size": 2})
+        self.assertEqual(response.status_code, 200)
+        names = [property_data["name"] for property_data in response.data["data"]]
+        self.assertIsNone(response.data["previous"])
+
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            names.extend(property_data["name"] for property_data in response.data["data"])
+
+        self.assertEqual(names, [f"Property {index}" for index in range(1, 6)])
+
+
+class AnalyticsTimeSeriesTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner_user)
+
+    def _add_payment(self, amount, payment_date, payment_status="completed"):
+        return Payment.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal(amount),
+            payment_type="rent",
+            status=payment_status,
+            payment_date=payment_date,
+            due_date=payment_date.date(),
+        )
+
+    def test_monthly_revenue_is_grouped_and_zero_filled(self):
+        this_month = timezone.now().replace(day=2)
+        last_month = (this_month.replace(day=1) - timezone.timedelta(days=1)).replace(day=2)
+        two_months_ago = (last_month.replace(day=1) - timezone.timedelta(days=1)).replace(day=2)
+        self._add_payment("1000.00", this_month)
+        self._add_payment("500.00", this_month)
+        self._add_payment("2000.00", two_months_ago)
+        self._add_payment("700.00", this_month, payment_status="failed")
+
+        response = self.client.get("/api/analytics/", {"period": "3months"})
+
+        self.assertEqual(response.status_code, 200)
+        revenue = {row["month"]: row["value"] for row in response.data["monthlyRevenue"]}
+        self.assertEqual(revenue[this_month.strftime("%b %Y")], 1500.0)
+        self.assertEqual(revenue[two_months_ago.strftime("%b %Y")], 2000.0)
+        self.assertIn(0, revenue.values())
+        self.assertEqual(response.data["paymentStatusDistribution"], {
+            "pending": 0, "completed": 3, "failed": 1, "cancelled": 0,
+        })
+
+    def test_period_all_stays_constant_queries_for_long_history(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        self._add_payment("1000.00", timezone.now())
+        with CaptureQueriesContext(connection) as recent_range:
+            self.client.get("/api/analytics/", {"period": "6months"})
+
+        self._add_payment("3000.00", timezone.now() - timezone.timedelta(days=3 * 365))
+        with CaptureQueriesContext(connection) as full_range:
+            response = self.client.get("/api/analytics/", {"period": "all"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertGreaterEqual(len(response.data["monthlyRevenue"]), 36)
+        self.assertEqual(response.data["totalRevenue"], 4000.0)
+        self.assertEqual(len(full_range), len(recent_range))
+
+    def test_custom_start_and_end(self):
+        self._add_payment("1000.00", timezone.make_aware(timezone.datetime(2024, 1, 15)))
+        self._add_payment("2000.00", timezone.make_aware(timezone.datetime(2024, 3, 10)))
+        self._add_payment("4000.00", timezone.make_aware(timezone.datetime(2024, 5, 10)))
+
+        response = self.client.get("/api/analytics/", {"start": "2024-01-01", "end": "2024-03-31"})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["monthlyRevenue"], [
+            {"month": "Jan 2024", "value": 1000.0},
+            {"month": "Feb 2024", "value": 0},
+            {"month": "Mar 2024", "value": 2000.0},
+        ])
+        self.assertEqual(response.data["totalRevenue"], 3000.0)
+
+        response = self.client.get("/api/analytics/", {"start": "2024-13-01"})
+        self.assertEqual(response.status_code, 400)
+
+
+class PaymentMonthlyRollupTests(OwnerPropertyTestCase):
+    def _rollup_values(self):
+        return list(PaymentMonthlyRollup.objects.order_by("month").values(
+            "month", "completed_count", "completed_amount", "pending_count", "pending_amount",
+            "failed_count", "failed_amount", "cancelled_count", "cancelled_amount",
+        ))
+
+    def test_rollup_follows_payment_status_changes(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal("5000.00"),
+            payment_type="rent",
+            due_date=timezone.now().date(),
+        )
+        rollup = PaymentMonthlyRollup.objects.get(owner=self.owner, property=self.property)
+        self.assertEqual((rollup.pending_count, rollup.pending_amount), (1, Decimal("5000.00")))
+
+        payment = Payment.objects.get(pk=payment.pk)
+        payment.status = "completed"
+        payment.payment_date = timezone.now()
+        payment.save()
+        payment.save()
+
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.pending_count, rollup.pending_amount), (0, Decimal("0.00")))
+        self.assertEqual((rollup.completed_count, rollup.completed_amount), (1, Decimal("5000.00")))
+
+        payment.delete()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.completed_count, rollup.completed_amount), (0, Decimal("0.00")))
+
+    def test_rebuild_matches_incremental_rollup(self):
+        long_ago = timezone.now() - timezone.timedelta(days=70)
+        for amount, payment_status, payment_date in [
+            ("1000.00", "completed", timezone.now()),
+            ("2000.00", "completed", long_ago),
+            ("300.00", "failed", long_ago),
+            ("400.00", "pending", None),
+        ]:
+            Payment.objects.create(
+                tenant=self.tenant,
+                unit=self.unit,
+                amount=Decimal(amount),
+                payment_type="rent",
+                status=payment_status,
+                payment_date=payment_date,
+                due_date=timezone.now().date(),
+            )
+        incremental = self._rollup_values()
+
+        call_command("rebuild_payment_rollups", stdout=StringIO())
+
+        self.assertEqual(self._rollup_values(), incremental)
+        self.assertEqual(len(incremental), 2)
+
+
+class ActivityEventTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.tenant_key = move_in(self.tenant, self.unit)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner_user)
+
+    def _event_types(self):
+        return list(ActivityEvent.objects.filter(owner=self.owner).values_list("event_type", flat=True))
+
+    def test_events_written_for_join_payment_proof_and_leave(self):
+        payment = Payment.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal("5000.00"),
+            payment_type="rent",
+            due_date=timezone.now().date(),
+        )
+        payment.status = "completed"
+        payment.save()
+        payment.save()
+
+        proof = ManualPaymentProof.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal("2000.00"),
+            payment_proof_image="manual_payment_proofs/receipt.png",
+        )
+        proof.verify_payment(self.owner_user)
+
+        self.tenant_key.tenant = None
+        self.tenant_key.is_used = False
+        self.tenant_key.used_at = None
+        self.tenant_key.save()
+
+        self.assertEqual(self._event_types(), [
+            "tenant_left", "proof_verified", "payment_completed", "tenant_joined",
+        ])
+        joined = ActivityEvent.objects.get(event_type="tenant_joined")
+        self.assertEqual(joined.title, "New tenant: Tenant User")
+        self.assertEqual(joined.subtitle, "Joined Test Property")
+
+    def test_proof_approval_is_a_single_activity_event(self):
+        proof = ManualPaymentProof.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal("2000.00"),
+            payment_proof_image="manual_payment_proofs/receipt.png",
+        )
+        ActivityEvent.objects.all().delete()
+        proof.verify_payment(self.owner_user)
+
+        self.assertEqual(self._event_types(), ["proof_verified"])
+        self.assertTrue(Payment.objects.filter(unit=self.unit, amount=Decimal("2000.00"), status="completed").exists())
+
+    def test_recent_activity_and_cursor_feed(self):
+        for index in range(25):
+            ActivityEvent.record(
+                "payment_completed",
+                self.unit,
+                title=f"Event {index}",
+                created_at=timezone.now() - timezone.timedelta(minutes=index + 1),
+            )
+
+        response = self.client.get("/api/analytics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["recentActivity"]), 8)
+        self.assertEqual(response.data["recentActivity"][0]["title"], "New tenant: Tenant User")
+        self.assertEqual(response.data["recentActivity"][1]["title"], "Event 0")
+
+        response = self.client.get("/api/analytics/activity/", {"page_size": 10})
+        titles = [event["title"] for event in response.data["results"]]
+        while response.data["next"]:
+            response = self.client.get(response.data["next"])
+            titles.extend(event["title"] for event in response.data["results"])
+
+        self.assertEqual(titles, ["New tenant: Tenant User"] + [f"Event {index}" for index in range(25)])
+
+
+class OwnerResponseCacheTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.owner_user)
+
+    def test_repeat_read_is_served_from_cache(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        first = self.client.get("/api/owners/dashboard/")
+        with CaptureQueriesContext(connection) as cached_read:
+            second = self.client.get("/api/owners/dashboard/")
+
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second.data, first.data)
+        # Only the owner lookup and the version counters remain
+        self.assertEqual(len(cached_read), 1)
+
+    def test_payment_change_invalidates_owner_responses(self):
+        self.assertEqual(self.client.get("/api/analytics/").data["totalRevenue"], 0.0)
+        self.assertEqual(self.client.get("/api/properties/").data[0]["total_payments"], 0.0)
+
+        Payment.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal("5000.00"),
+            payment_type="rent",
+            status="completed",
+            payment_date=timezone.now(),
+            due_date=timezone.now().date(),
+        )
+
+        self.assertEqual(self.client.get("/api/analytics/").data["totalRevenue"], 5000.0)
+        self.assertEqual(self.client.get("/api/properties/").data[0]["total_payments"], 5000.0)
+
+    def test_query_parameters_are_cached_separately(self):
+        Payment.objects.create(
+            tenant=self.tenant,
+            unit=self.unit,
+            amount=Decimal("5000.00"),
+            payment_type="rent",
+            status="completed",
+            payment_date=timezone.make_aware(timezone.datetime(2024, 2, 10)),
+            due_date=timezone.now().date(),
+        )
+
+        january = self.client.get("/api/analytics/", {"start": "2024-01-01", "end": "2024-01-31"})
+        february = self.client.get("/api/analytics/", {"start": "2024-02-01", "end": "2024-02-29"})
+
+        self.assertEqual(january.data["totalRevenue"], 0.0)
+        self.assertEqual(february.data["totalRevenue"], 5000.0)
+
+
+class SQLiteCacheBackendTests(TestCase):
+    def setUp(self):
+        import tempfile
+        from core.cache_backends import SQLiteCache
+
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = f"{self.temp_dir.name}/cache.sqlite3"
+        self.params = {"TIMEOUT": 300, "OPTIONS": {"MAX_ENTRIES": 10, "CULL_FREQUENCY": 2}}
+        self.cache = SQLiteCache(self.path, self.params)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_entries_are_shared_between_backend_instances(self):
+        from core.cache_backends import SQLiteCache
+
+        self.cache.set("dashboard", {"total_due": Decimal("10.00")})
+        other_worker = SQLiteCache(self.path, self.params)
+
+        self.assertEqual(other_worker.get("dashboard"), {"total_due": Decimal("10.00")})
+        self.assertEqual(other_worker.get_many(["dashboard", "missing"]), {"dashboard": {"total_due": Decimal("10.00")}})
+
+    def test_expired_entries_are_not_returned(self):
+        self.cache.set("stale", 1, timeout=0)
+        self.cache.set("forever", 2, timeout=None)
+
+        self.assertIsNone(self.cache.get("stale"))
+        self.assertFalse(self.cache.has_key("stale"))
+        self.assertEqual(self.cache.get("forever"), 2)
+
+    def test_add_and_incr(self):
+        self.assertTrue(self.cache.add("version", 1))
+        self.assertFalse(self.cache.add("version", 5))
+        self.assertEqual(self.cache.incr("version"), 2)
+        self.assertEqual(self.cache.get("version"), 2)
+        with self.assertRaises(ValueError):
+            self.cache.incr("missing")
+
+    def test_cull_evicts_least_recently_used_entries(self):
+        import time
+
+        for index in range(12):
+            self.cache.set(f"key:{index}", index)
+        # Make key:0 the most recently used entry
+        self.cache._connection().execute(
+            "UPDATE cache_entries SET accessed = ? WHERE key = ?",
+            (time.time() + 60, self.cache.make_key("key:0")),
+        )
+
+        self.cache.cull()
+
+        remaining = [index for index in range(12) if self.cache.has_key(f"key:{index}")]
+        self.assertEqual(len(remaining), 5)
+        self.assertIn(0, remaining)
+
+
+class PayoutJobOutboxTests(OwnerPropertyTestCase):
+    owner_fields = {"payment_method": "upi", "upi_id": "owner@upi"}
+
+    def setUp(self):
+        super().setUp()
+        self.payment = create_payment(self.tenant, self.unit, status="pending", merchant_order_id="TXN_OUTBOX_1")
+
+    def test_payment_completion_queues_job_without_calling_cashfree(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+        from core.services.phonepe_service import PhonePeService
+
+        with patch.object(CashfreePayoutService, "initiate_owner_payout") as initiate:
+            result = PhonePeService.handle_payment_completed("TXN_OUTBOX_1")
+            # Redelivered completions must not queue a second payout
+            PhonePeService.handle_payment_completed("TXN_OUTBOX_1")
+
+        self.assertTrue(result["success"])
+        initiate.assert_not_called()
+        job = PayoutJob.objects.get()
+        self.assertEqual(job.payment, self.payment)
+        self.assertEqual(job.status, "pending")
+
+    def test_worker_links_created_payout_and_completes_job(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        PayoutJob.enqueue_for_payment(self.payment)
+        payout = OwnerPayout.objects.create(
+            payment=self.payment,
+            owner=self.owner,
+            amount=self.payment.amount,
+            status="processing",
+            beneficiary_type="upi",
+        )
+
+        jobs = PayoutJob.claim_due()
+        self.assertEqual(len(jobs), 1)
+        # A second worker finds nothing to claim while the lease is held
+        self.assertEqual(PayoutJob.claim_due(), [])
+
+        with patch.object(
+            CashfreePayoutService,
+            "initiate_owner_payout",
+            return_value={"success": True, "payout_record": payout},
+        ):
+            result = CashfreePayoutService.process_payout_job(jobs[0])
+
+        self.assertTrue(result["success"])
+        job = PayoutJob.objects.get()
+        self.assertEqual(job.status, "completed")
+        self.assertEqual(job.payout, payout)
+        self.assertEqual(job.attempts, 1)
+
+    def test_failed_attempt_backs_off_and_abandoned_lease_is_reclaimed(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        PayoutJob.enqueue_for_payment(self.payment)
+        job = PayoutJob.claim_due()[0]
+
+        with patch.object(
+            CashfreePayoutService,
+            "initiate_owner_payout",
+            return_value={"success": False, "error": "UPI ID not configured"},
+        ):
+            CashfreePayoutService.process_payout_job(job)
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, "pending")
+        self.assertEqual(job.last_error, "UPI ID not configured")
+        self.assertGreater(job.available_at, timezone.now())
+        self.assertEqual(PayoutJob.claim_due(), [])
+
+        # Simulate a worker that crashed while holding the job
+        PayoutJob.objects.filter(id=job.id).update(
+            status="processing",
+            locked_until=timezone.now() - timezone.timedelta(seconds=1),
+        )
+        reclaimed = PayoutJob.claim_due()
+        self.assertEqual([j.id for j in reclaimed], [job.id])
+        self.assertEqual(reclaimed[0].attempts, 2)
+
+    def test_worker_with_expired_lease_cannot_overwrite_reclaimed_job(self):
+        PayoutJob.enqueue_for_payment(self.payment)
+        stale = PayoutJob.claim_due()[0]
+        PayoutJob.objects.filter(id=stale.id).update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        current = PayoutJob.claim_due()[0]
+
+        # The first worker finishes late, after the job was handed to the second one
+        self.assertFalse(stale.mark_attempt_failed("timed out"))
+        self.assertFalse(stale.mark_completed())
+        job = PayoutJob.objects.get()
+        self.assertEqual((job.status, job.attempts, job.last_error), ("processing", 2, ""))
+        self.assertEqual(job.locked_until, current.locked_until)
+
+        self.assertTrue(current.mark_completed())
+        job.refresh_from_db()
+        self.assertEqual(job.status, "completed")
+
+
+class PaymentReconciliationEngineTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.transactions = []
+        for index in range(2):
+            payment = create_payment(self.tenant, self.unit, status="pending", merchant_order_id=f"TXN_RECON_{index}")
+            self.transactions.append(
+                PaymentTransaction.objects.create(
+                    merchant_order_id=f"TXN_RECON_{index}",
+                    phonepe_transaction_id=f"TXN_RECON_{index}",
+                    phonepe_order_id=f"OMO_RECON_{index}",
+                    amount=Decimal("10000.00"),
+                    user=self.tenant_user,
+                    payment=payment,
+                )
+            )
+
+    def test_token_bucket_limits_rate_and_drains_on_rate_limit(self):
+        from core.services.reconciliation_service import TokenBucket
+
+        now = [100.0]
+        bucket = TokenBucket(rate=2, capacity=2, clock=lambda: now[0], sleep=lambda seconds: None)
+
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+
+        now[0] += 0.5
+        self.assertEqual(bucket.try_acquire(), 0)
+
+        now[0] += 1.0
+        bucket.drain()
+        self.assertAlmostEqual(bucket.try_acquire(), 0.5)
+        self.assertFalse(bucket.acquire(timeout=0.1))
+
+    def test_reconcile_transaction_applies_completed_state_without_inline_retries(self):
+        from core.services.phonepe_service import PhonePeService
+        from core.services.reconciliation_service import ReconciliationEngine, TokenBucket
+
+        engine = ReconciliationEngine(rate_limiter=TokenBucket(rate=100, capacity=10))
+        transaction = self.transactions[0]
+
+        with patch.object(PhonePeService, "verify_payment_status", return_value={"success": True, "state": "COMPLETED"}) as verify, \
+                patch.object(PayoutJob, "enqueue_for_payment"):
+            result = engine.reconcile_transaction(transaction)
+
+        verify.assert_called_once_with("TXN_RECON_0", max_retries=1)
+        self.assertEqual(result["outcome"], "completed")
+        transaction.refresh_from_db()
+        self.assertEqual(transaction.status, "success")
+        self.assertEqual(transaction.payment_attempt_count, 1)
+        self.assertEqual(transaction.payment.status, "completed")
+
+        with patch.object(
+            PhonePeService,
+            "verify_payment_status",
+            return_value={"success": False, "error": "Rate limit exceeded", "error_code": "RATE_LIMIT_EXCEEDED"},
+        ):
+            result = engine.reconcile_transaction(self.transactions[1])
+        self.assertEqual(result["outcome"], "retry")
+        self.assertTrue(result["rate_limited"])
+
+    def test_engine_requeues_rate_limited_orders_and_reports_metrics(self):
+        from core.services.reconciliation_service import ReconciliationEngine, TokenBucket
+
+        limiter = TokenBucket(rate=100, capacity=10)
+        engine = ReconciliationEngine(max_workers=4, rate_limiter=limiter, base_backoff=0)
+        attempts = {}
+
+        def fake_reconcile(transaction):
+            attempts[transaction.id] = attempts.get(transaction.id, 0) + 1
+            if transaction.id == self.transactions[0].id and attempts[transaction.id] == 1:
+                return {"outcome": "retry", "called_gateway": True, "elapsed": 0.01, "rate_limited": True}
+            outcome = "completed" if transaction.id == self.transactions[0].id else "pending"
+            return {"outcome": outcome, "called_gateway": True, "elapsed": 0.01}
+
+        with patch.object(engine, "reconcile_transaction", side_effect=fake_reconcile):
+            metrics = engine.run(self.transactions)
+
+        self.assertEqual(attempts, {self.transactions[0].id: 2, self.transactions[1].id: 1})
+        self.assertEqual(metrics["outcomes"], {"completed": 1, "pending": 1})
+        self.assertEqual(metrics["orders"], 2)
+        self.assertEqual(metrics["gateway_calls"], 3)
+        self.assertGreater(metrics["orders_per_second"], 0)
+
+    def test_coordinator_blocks_while_all_workers_are_busy(self):
+        import time
+        from core.services import reconciliation_service
+        from core.services.reconciliation_service import ReconciliationEngine, TokenBucket
+
+        engine = ReconciliationEngine(max_workers=2, rate_limiter=TokenBucket(rate=1000, capacity=100))
+
+        def slow_reconcile(transaction):
+            time.sleep(0.05)
+            return {"outcome": "pending", "called_gateway": True, "elapsed": 0.05}
+
+        # Six ready orders for two workers: four wait in the queue while both workers are busy
+        with patch.object(engine, "reconcile_transaction", side_effect=slow_reconcile), \
+                patch.object(reconciliation_service, "wait", wraps=reconciliation_service.wait) as wait:
+            metrics = engine.run(self.transactions * 3)
+
+        self.assertEqual(metrics["orders"], 6)
+        # One wakeup per finished check, not a busy loop
+        self.assertLessEqual(wait.call_count, 6)
+        self.assertTrue(all(call.kwargs["timeout"] is None for call in wait.call_args_list))
+
+    def test_transactions_are_scheduled_and_unscheduled_with_status(self):
+        transaction = self.transactions[0]
+        self.assertAlmostEqual(
+            (transaction.next_check_at - transaction.created_at).total_seconds(),
+            PaymentTransaction.FIRST_CHECK_DELAY,
+            delta=1,
+        )
+
+        self.assertEqual(PaymentTransaction.check_interval(30), 3)
+        self.assertEqual(PaymentTransaction.check_interval(100), 6)
+        self.assertEqual(PaymentTransaction.check_interval(200), 30)
+        self.assertEqual(PaymentTransaction.check_interval(3600), 60)
+        checked_at = transaction.created_at + timezone.timedelta(seconds=100)
+        self.assertEqual(transaction.next_check_after(checked_at), checked_at + timezone.timedelta(seconds=6))
+
+        transaction.status = "success"
+        transaction.save(update_fields=["status"])
+        transaction.refresh_from_db()
+        self.assertIsNone(transaction.next_check_at)
+
+    def test_sweep_reads_only_due_transactions(self):
+        created_at = timezone.now() - timezone.timedelta(minutes=5)
+        PaymentTransaction.objects.update(created_at=created_at)
+        PaymentTransaction.objects.filter(id=self.transactions[0].id).update(
+            next_check_at=timezone.now() - timezone.timedelta(seconds=5)
+        )
+        PaymentTransaction.objects.filter(id=self.transactions[1].id).update(
+            next_check_at=timezone.now() + timezone.timedelta(seconds=30)
+        )
+
+        out = StringIO()
+        call_command("reconcile_pending_payments", "--dry-run", "--workers", "1", stdout=out)
+
+        self.assertIn("Found 1 pending transactions due for reconciliation", out.getvalue())
+        self.assertIn("'skipped': 1", out.getvalue())
+
+
+class PaymentStatusPollingTests(OwnerPropertyTestCase):
+    def setUp(self):
+        from django.core.cache import cache
+
+        super().setUp()
+        cache.clear()
+        self.client = APIClient()
+        self.payment = create_payment(self.tenant, self.unit, status="pending", merchant_order_id="TXN_POLL_1")
+
+    def test_pending_status_is_cached_between_polls(self):
+        from core.services.phonepe_service import PhonePeService
+
+        with patch.object(
+            PhonePeService, "verify_payment_status", return_value={"success": True, "state": "PENDING"}
+        ) as verify:
+            first = PhonePeService.get_order_status("TXN_POLL_1")
+            second = PhonePeService.get_order_status("TXN_POLL_1")
+
+        verify.assert_called_once_with("TXN_POLL_1", max_retries=1)
+        self.assertEqual(first["state"], "PENDING")
+        self.assertEqual(second, first)
+
+    def test_concurrent_polls_share_one_gateway_call(self):
+        import threading
+        import time
+        from core.services.phonepe_service import PhonePeService
+
+        calls = []
+
+        def slow_status(merchant_order_id, max_retries=3):
+            calls.append(merchant_order_id)
+            time.sleep(0.3)
+            return {"success": True, "state": "PENDING"}
+
+        results = []
+        with patch.object(PhonePeService, "get_local_order_state", return_value=None), \
+                patch.object(PhonePeService, "verify_payment_status", side_effect=slow_status):
+            threads = [
+                threading.Thread(target=lambda: results.append(PhonePeService.get_order_status("TXN_POLL_1")))
+                for _ in range(8)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual([result["state"] for result in results], ["PENDING"] * 8)
+
+    @override_settings(PHONEPE_STATUS_WAIT_SECONDS=0.2)
+    def test_waiting_poll_answers_quickly_and_keeps_the_other_callers_lock(self):
+        import time
+        from django.core.cache import cache
+        from core.services.phonepe_service import PhonePeService
+
+        # Another request holds the lock and its PhonePe call is still running
+        cache.set("phonepe-status-lock:TXN_POLL_1", "other-request", 60)
+        self.addCleanup(cache.delete, "phonepe-status-lock:TXN_POLL_1")
+
+        with patch.object(PhonePeService, "verify_payment_status") as verify:
+            started = time.monotonic()
+            result = PhonePeService.get_order_status("TXN_POLL_1")
+            waited = time.monotonic() - started
+
+        verify.assert_not_called()
+        self.assertLess(waited, 1)
+        self.assertEqual((result["success"], result["state"]), (True, "PENDING"))
+        self.assertEqual(cache.get("phonepe-status-lock:TXN_POLL_1"), "other-request")
+
+        # Once a status was seen, waiting callers get it back instead of a bare PENDING
+        cache.set("phonepe-status-last:TXN_POLL_1", {"success": True, "state": "COMPLETED", "source": "last_known"}, 60)
+        self.addCleanup(cache.delete, "phonepe-status-last:TXN_POLL_1")
+        self.assertEqual(PhonePeService.get_order_status("TXN_POLL_1")["state"], "COMPLETED")
+
+    def test_verify_payment_serves_recorded_final_state_without_gateway(self):
+        from core.services.phonepe_service import PhonePeService
+
+        self.payment.status = "completed"
+        self.payment.payment_date = timezone.now()
+        self.payment.save()
+        self.client.force_authenticate(self.tenant_user)
+
+        with patch.object(PhonePeService, "verify_payment_status") as verify, \
+                patch.object(PhonePeService, "handle_payment_completed") as handle_completed:
+            response = self.client.get("/api/payments/verify-payment/TXN_POLL_1/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["state"], "COMPLETED")
+        verify.assert_not_called()
+        handle_completed.assert_not_called()
+
+
+class PaymentStatusStreamTests(OwnerPropertyTestCase):
+    def setUp(self):
+        from rest_framework.authtoken.models import Token
+
+        super().setUp()
+        self.payment = create_payment(self.tenant, self.unit, status="pending", merchant_order_id="TXN_STREAM_1")
+        self.auth_header = f"Token {Token.objects.create(user=self.tenant_user).key}"
+        self.url = "/api/payments/status-stream/TXN_STREAM_1/"
+
+    def _complete_payment(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.payment.status = "completed"
+            self.payment.payment_date = timezone.now()
+            self.payment.save()
+
+    async def test_long_poll_wakes_when_payment_completes(self):
+        import asyncio
+        import time
+        from asgiref.sync import sync_to_async
+
+        waiter = asyncio.ensure_future(
+            self.async_client.get(self.url, {"timeout": "10"}, AUTHORIZATION=self.auth_header)
+        )
+        await asyncio.sleep(0.5)
+        self.assertFalse(waiter.done())
+
+        completed_at = time.monotonic()
+        await sync_to_async(self._complete_payment)()
+        response = await waiter
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "COMPLETED")
+        self.assertTrue(response.json()["is_final"])
+        self.assertLess(time.monotonic() - completed_at, 2)
+
+    async def test_long_poll_times_out_with_current_status(self):
+        response = await self.async_client.get(self.url, {"timeout": "0.3"}, AUTHORIZATION=self.auth_header)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["state"], "PENDING")
+        self.assertFalse(response.json()["is_final"])
+
+    async def test_event_stream_sends_final_status_and_ends(self):
+        from asgiref.sync import sync_to_async
+
+        await sync_to_async(self._complete_payment)()
+        response = await self.async_client.get(
+            self.url, AUTHORIZATION=self.auth_header, ACCEPT="text/event-stream"
+        )
+        body = b"".join([chunk async for chunk in response.streaming_content]).decode()
+
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        self.assertIn('"state": "COMPLETED"', body)
+        self.assertTrue(body.endswith("event: end\ndata: {}\n\n"))
+
+    async def test_requires_authentication_and_ownership(self):
+        from asgiref.sync import sync_to_async
+        from rest_framework.authtoken.models import Token
+
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        other_user = await sync_to_async(User.objects.create_user)(
+            username="other@example.com",
+            email="other@example.com",
+            password="password123",
+        )
+        token = await Token.objects.acreate(user=other_user)
+        response = await self.async_client.get(self.url, AUTHORIZATION=f"Token {token.key}")
+        self.assertEqual(response.status_code, 404)
+
+
+class WebhookInboxTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.payment = create_payment(self.tenant, self.unit, status="pending", merchant_order_id="TXN_WEBHOOK_1")
+
+    def _deliver(self, state="COMPLETED"):
+        from types import SimpleNamespace
+        from core.services.phonepe_service import PhonePeService
+
+        validated = {
+            "success": True,
+            "callback_type": "CHECKOUT_ORDER_COMPLETED",
+            "callback_data": SimpleNamespace(merchant_order_id="TXN_WEBHOOK_1", state=state),
+        }
+        with patch.object(PhonePeService, "validate_webhook_signature", return_value=validated):
+            return self.client.post(
+                "/api/webhooks/phonepe-webhook/",
+                data='{"event": "checkout.order.completed"}',
+                content_type="application/json",
+            )
+
+    def test_webhook_is_stored_and_acknowledged_without_applying_it(self):
+        from core.services.phonepe_service import PhonePeService
+
+        with patch.object(PhonePeService, "handle_payment_completed") as handle_completed:
+            first = self._deliver()
+            redelivery = self._deliver()
+
+        handle_completed.assert_not_called()
+        self.assertEqual(first.status_code, 200)
+        self.assertFalse(first.data["duplicate"])
+        self.assertTrue(redelivery.data["duplicate"])
+        self.assertEqual(redelivery.data["event_id"], first.data["event_id"])
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.callback_type, event.state, event.status), ("CHECKOUT_ORDER_COMPLETED", "COMPLETED", "pending"))
+        self.assertEqual(event.delivery_count, 2)
+        self.assertEqual(event.payload, {"event": "checkout.order.completed"})
+
+    def test_worker_applies_each_event_once(self):
+        from core.services.phonepe_service import PhonePeService
+
+        self._deliver()
+        self._deliver()
+
+        with patch.object(
+            PhonePeService, "handle_payment_completed", wraps=PhonePeService.handle_payment_completed
+        ) as handle_completed:
+            call_command("process_webhook_events", stdout=StringIO())
+            call_command("process_webhook_events", stdout=StringIO())
+
+        handle_completed.assert_called_once_with("TXN_WEBHOOK_1")
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "completed")
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, "processed")
+        self.assertIsNotNone(event.processed_at)
+
+    def test_failed_event_is_retried_later_and_unknown_states_are_not(self):
+        from core.services.phonepe_service import PhonePeService
+
+        self._deliver()
+        with patch.object(
+            PhonePeService, "handle_payment_completed", return_value={"success": False, "error": "database is locked"}
+        ):
+            call_command("process_webhook_events", stdout=StringIO())
+
+        event = WebhookEvent.objects.get()
+        self.assertEqual(event.status, "pending")
+        self.assertEqual(event.last_error, "database is locked")
+        self.assertGreater(event.available_at, timezone.now())
+
+        self._deliver(state="EXPIRED")
+        call_command("process_webhook_events", stdout=StringIO())
+        self.assertEqual(WebhookEvent.objects.get(state="EXPIRED").status, "failed")
+
+    def test_worker_with_expired_lease_cannot_overwrite_reclaimed_event(self):
+        self._deliver()
+        stale = WebhookEvent.claim_due()[0]
+        WebhookEvent.objects.filter(id=stale.id).update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        current = WebhookEvent.claim_due()[0]
+        self.assertTrue(current.mark_processed({"success": True}))
+
+        # The first worker finishes late, after the second one already processed the event
+        self.assertFalse(stale.mark_attempt_failed("timed out"))
+        self.assertFalse(stale.mark_processed({"success": False}))
+        event = WebhookEvent.objects.get()
+        self.assertEqual((event.status, event.attempts, event.last_error), ("processed", 2, ""))
+        self.assertEqual(event.result, {"success": True})
+
+
+class GatewayOrderRegistryTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.payment = create_payment(
+            self.tenant,
+            self.unit,
+            status="pending",
+            merchant_order_id="TXN_REGISTRY_1",
+            phonepe_order_id="OMO_REGISTRY_1",
+        )
+        self.transaction = PaymentTransaction.objects.create(
+            merchant_order_id="TXN_REGISTRY_1",
+            phonepe_transaction_id="TXN_REGISTRY_1",
+            phonepe_order_id="OMO_REGISTRY_1",
+            amount=Decimal("10000.00"),
+            user=self.tenant_user,
+            payment=self.payment,
+            status="initiated",
+        )
+
+    def test_unregistered_order_is_registered_on_first_resolve(self):
+        order = GatewayOrder.resolve("TXN_REGISTRY_1")
+
+        self.assertEqual(order.order_type, "tenant_payment")
+        self.assertEqual(order.target, self.payment)
+        self.assertEqual(order.transaction, self.transaction)
+        self.assertEqual(order.phonepe_order_id, "OMO_REGISTRY_1")
+        self.assertIsNone(GatewayOrder.resolve("TXN_UNKNOWN"))
+
+        with self.assertNumQueries(1):
+            order = GatewayOrder.resolve("TXN_REGISTRY_1")
+            self.assertEqual(order.payment.status, "pending")
+            self.assertEqual(order.transaction.status, "initiated")
+
+    def test_completion_updates_payment_and_transaction_through_the_registry(self):
+        from core.services.phonepe_service import PhonePeService
+
+        GatewayOrder.register(
+            "TXN_REGISTRY_1", phonepe_order_id="OMO_REGISTRY_1", payment=self.payment, transaction=self.transaction
+        )
+        result = PhonePeService.handle_payment_completed("TXN_REGISTRY_1")
+
+        self.assertTrue(result["success"])
+        self.payment.refresh_from_db()
+        self.transaction.refresh_from_db()
+        self.assertEqual(self.payment.status, "completed")
+        self.assertEqual(self.transaction.status, "success")
+        self.assertEqual(PhonePeService.get_local_order_state("TXN_REGISTRY_1"), "COMPLETED")
+
+    def test_callback_finds_payment_by_gateway_order_id(self):
+        from core.services.phonepe_service import PhonePeService
+
+        GatewayOrder.register("TXN_REGISTRY_1", phonepe_order_id="OMO_REGISTRY_1", payment=self.payment)
+        with patch.object(
+            PhonePeService, "verify_payment_status", return_value={"success": True, "state": "PENDING"}
+        ):
+            response = self.client.post("/api/payments/handle_payment_callback/", {"orderId": "OMO_REGISTRY_1"})
+            missing = self.client.post("/api/payments/handle_payment_callback/", {"orderId": "OMO_UNKNOWN"})
+
+        self.assertEqual(response.data["payment"]["id"], self.payment.id)
+        self.assertEqual(missing.status_code, 404)
+        self.assertIsNone(GatewayOrder.resolve_gateway_order("OMO_REGISTRY_1", order_type="owner_payment"))
+
+
+class PaymentStateMachineTests(OwnerPropertyTestCase):
+    def setUp(self):
+        super().setUp()
+        self.payment = create_payment(self.tenant, self.unit, status="pending", merchant_order_id="TXN_STATE_1")
+
+    def test_side_effects_run_only_for_the_winning_transition(self):
+        from core.services.phonepe_service import PhonePeService
+
+        first = PhonePeService.handle_payment_completed("TXN_STATE_1")
+        second = PhonePeService.handle_payment_completed("TXN_STATE_1")
+        late_failure = PhonePeService.handle_payment_failed("TXN_STATE_1")
+
+        self.assertTrue(first["transitioned"])
+        self.assertFalse(second["transitioned"])
+        self.assertTrue(second["success"])
+        self.assertFalse(late_failure["transitioned"])
+        self.assertEqual(late_failure["status"], "completed")
+
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "completed")
+        self.assertEqual(PayoutJob.objects.filter(payment=self.payment).count(), 1)
+        self.assertEqual(Invoice.objects.filter(payment=self.payment).count(), 1)
+        self.assertEqual(ActivityEvent.objects.filter(event_type="payment_completed").count(), 1)
+
+    def test_transition_loses_when_status_changed_underneath(self):
+        # Another processor settled the payment after this one read it as pending
+        stale = Payment.objects.get(pk=self.payment.pk)
+        Payment.objects.filter(pk=self.payment.pk).update(status="failed")
+
+        self.assertIsNone(Payment.transition(stale.pk, "completed", payment_date=timezone.now()))
+        self.payment.refresh_from_db()
+        self.assertEqual(self.payment.status, "failed")
+        self.assertIsNone(self.payment.payment_date)
+
+
+class CashfreeBeneficiaryRegistryTests(TestCase):
+    def setUp(self):
+        self.owner = create_owner(payment_method="upi", upi_id="owner@upi")
+
+    def _ensure(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        def remote(owner, x_api_version, beneficiary_id=None):
+            return {"success": True, "beneficiary_id": beneficiary_id, "exists": False}
+
+        with patch.object(CashfreePayoutService, "create_or_get_beneficiary", side_effect=remote) as create_or_get:
+            result = CashfreePayoutService.ensure_beneficiary(self.owner)
+        return result, create_or_get.call_count
+
+    def test_beneficiary_is_registered_once_per_payout_details(self):
+        result, remote_calls = self._ensure()
+        self.assertEqual((result["beneficiary_id"], remote_calls), (f"OWNER_{self.owner.id}", 1))
+
+        result, remote_calls = self._ensure()
+        self.assertEqual(remote_calls, 0)
+        self.assertTrue(result["cached"])
+
+        # Unrelated profile updates keep the registered beneficiary
+        self.owner.phone = "8888888888"
+        self.owner.save()
+        self.assertEqual(self._ensure()[1], 0)
+
+    def test_changed_payout_details_invalidate_and_register_a_new_beneficiary(self):
+        self._ensure()
+
+        self.owner.upi_id = "new-owner@upi"
+        self.owner.save()
+        self.assertFalse(CashfreeBeneficiary.objects.get(owner=self.owner).is_valid)
+
+        result, remote_calls = self._ensure()
+        self.assertEqual(remote_calls, 1)
+        self.assertNotEqual(result["beneficiary_id"], f"OWNER_{self.owner.id}")
+        entry = CashfreeBeneficiary.objects.get(owner=self.owner)
+        self.assertTrue(entry.is_valid)
+        self.assertEqual(entry.beneficiary_id, result["beneficiary_id"])
+        self.assertEqual(self._ensure()[1], 0)
+
+
+@override_settings(CASHFREE_PAYOUT_MODE="batched")
+class BatchedOwnerPayoutTests(OwnerPropertyTestCase):
+    owner_fields = {"payment_method": "upi", "upi_id": "owner@upi"}
+
+    def setUp(self):
+        super().setUp()
+        self.payments = [
+            create_payment(self.tenant, self.unit, amount, merchant_order_id=f"TXN_BATCH_{index}")
+            for index, amount in enumerate(["10000.00", "2500.00"])
+        ]
+
+    def _settle(self, fetch_transfer=None, **client_behaviour):
+        from unittest.mock import MagicMock
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        client = MagicMock()
+        client.PayoutInitiateBatchTransfer.configure_mock(**client_behaviour)
+        client.PayoutFetchTransfer.side_effect = fetch_transfer
+        with patch.object(CashfreePayoutService, "_cashfree_client", client), \
+                patch.object(CashfreePayoutService, "initialize_client"), \
+                patch.object(
+                    CashfreePayoutService,
+                    "ensure_beneficiary",
+                    return_value={"success": True, "beneficiary_id": f"OWNER_{self.owner.id}"},
+                ):
+            call_command("process_scheduled_payouts", stdout=StringIO())
+        return client
+
+    def test_payments_accumulate_into_one_payout_settled_by_one_batch_transfer(self):
+        from core.serializers import PaymentSerializer
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        results = [CashfreePayoutService.initiate_owner_payout(payment) for payment in self.payments]
+        again = CashfreePayoutService.initiate_owner_payout(self.payments[0])
+
+        payout = OwnerPayout.objects.get()
+        self.assertEqual({result["payout_record"].id for result in results + [again]}, {payout.id})
+        self.assertEqual((payout.status, payout.amount), ("accumulating", Decimal("12500.00")))
+        self.assertEqual(OwnerPayoutItem.objects.filter(payout=payout).count(), 2)
+        self.assertEqual(PaymentSerializer(self.payments[1]).data["payout_status"], "accumulating")
+
+        # Today's window is still open
+        client = self._settle()
+        client.PayoutInitiateBatchTransfer.assert_not_called()
+
+        OwnerPayout.objects.filter(pk=payout.pk).update(settlement_window=timezone.localdate() - timezone.timedelta(days=1))
+        client = self._settle()
+
+        client.PayoutInitiateBatchTransfer.assert_called_once()
+        request = client.PayoutInitiateBatchTransfer.call_args.kwargs["create_batch_transfer_request"]
+        self.assertEqual(len(request.transfers), 1)
+        self.assertEqual(request.transfers[0].transfer_amount, 12500.0)
+        payout.refresh_from_db()
+        self.assertEqual(payout.status, "processing")
+        self.assertEqual(payout.cashfree_batch_transfer_id, request.batch_transfer_id)
+        self.assertEqual(payout.cashfree_transfer_id, request.transfers[0].transfer_id)
+
+    def test_failed_batch_request_schedules_retries(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        CashfreePayoutService.initiate_owner_payout(self.payments[0])
+        OwnerPayout.objects.update(settlement_window=timezone.localdate() - timezone.timedelta(days=1))
+
+        def not_received(x_api_version, transfer_id):
+            raise Exception("(404) Reason: Transfer does not exist")
+
+        client = self._settle(fetch_transfer=not_received, side_effect=Exception("503 Service Unavailable"))
+
+        payout = OwnerPayout.objects.get()
+        self.assertEqual(payout.status, "retry_scheduled")
+        self.assertEqual(payout.error_message, "503 Service Unavailable")
+        self.assertIsNotNone(payout.next_retry_at)
+        # The retry resends under the same transfer ID, so Cashfree can reject a duplicate
+        request = client.PayoutInitiateBatchTransfer.call_args.kwargs["create_batch_transfer_request"]
+        self.assertEqual(payout.cashfree_transfer_id, request.transfers[0].transfer_id)
+        self.assertEqual(payout.cashfree_batch_transfer_id, request.batch_transfer_id)
+
+    def test_batch_accepted_despite_read_timeout_is_not_paid_again(self):
+        from unittest.mock import MagicMock
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        for payment in self.payments:
+            CashfreePayoutService.initiate_owner_payout(payment)
+        OwnerPayout.objects.update(settlement_window=timezone.localdate() - timezone.timedelta(days=1))
+
+        def received(x_api_version, transfer_id):
+            return MagicMock(data={"transfer_id": transfer_id, "status": "RECEIVED"})
+
+        client = self._settle(fetch_transfer=received, side_effect=Exception("Read timed out"))
+
+        payout = OwnerPayout.objects.get()
+        self.assertEqual(payout.status, "processing")
+        self.assertIsNone(payout.next_retry_at)
+        self.assertEqual(payout.retry_count, 0)
+        request = client.PayoutInitiateBatchTransfer.call_args.kwargs["create_batch_transfer_request"]
+        self.assertEqual(client.PayoutFetchTransfer.call_args.kwargs["transfer_id"], request.transfers[0].transfer_id)
+        self.assertEqual(payout.cashfree_transfer_id, request.transfers[0].transfer_id)
+        client.PayoutInitiateTransfer.assert_not_called()
+
+
+class PayoutRetrySchedulerTests(OwnerPropertyTestCase):
+    owner_fields = {"payment_method": "upi", "upi_id": "owner@upi"}
+
+    def setUp(self):
+        super().setUp()
+        self.payouts = []
+        for index, next_retry_in in enumerate([-60, -30, 600]):
+            payment = create_payment(self.tenant, self.unit, merchant_order_id=f"TXN_RETRY_{index}")
+            self.payouts.append(OwnerPayout.objects.create(
+                payment=payment,
+                owner=self.owner,
+                amount=payment.amount,
+                status="retry_scheduled",
+                beneficiary_type="upi",
+                retry_count=1,
+                next_retry_at=timezone.now() + timezone.timedelta(seconds=next_retry_in),
+            ))
+
+    def test_due_payouts_are_claimed_once_and_expired_leases_recovered(self):
+        claimed = OwnerPayout.claim_due_retries(limit=10, lease_seconds=300)
+
+        self.assertEqual([payout.id for payout in claimed], [payout.id for payout in self.payouts[:2]])
+        self.assertTrue(all(payout.status == "pending" and payout.locked_until for payout in claimed))
+        # Another worker finds nothing while the leases are held
+        self.assertEqual(OwnerPayout.claim_due_retries(limit=10), [])
+        self.assertIsNone(OwnerPayout.claim_for_retry(claimed[0].id))
+
+        # The worker holding the first payout died
+        OwnerPayout.objects.filter(pk=claimed[0].pk).update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+        self.assertEqual([payout.id for payout in OwnerPayout.claim_due_retries(limit=10)], [claimed[0].id])
+
+    def test_failed_retry_is_rescheduled_with_jittered_backoff(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        payout = OwnerPayout.claim_due_retries(limit=1)[0]
+        with patch.object(CashfreePayoutService, "ensure_beneficiary", return_value={"success": False, "error": "bank down"}), \
+                patch.object(CashfreePayoutService, "initialize_client"):
+            result = CashfreePayoutService.execute_payout(payout)
+
+        self.assertFalse(result["success"])
+        payout.refresh_from_db()
+        self.assertEqual((payout.status, payout.retry_count), ("retry_scheduled", 2))
+        self.assertIsNone(payout.locked_until)
+        # Second retry: 15 minutes +/- 20%
+        delay = (payout.next_retry_at - timezone.now()).total_seconds() / 60
+        self.assertTrue(11.9 <= delay <= 18.1, delay)
+
+    def test_payout_reclaimed_after_its_transfer_was_sent_is_not_paid_twice(self):
+        from unittest.mock import MagicMock
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        class WorkerDied(BaseException):
+            pass
+
+        sent = {}
+
+        def initiate_transfer(x_api_version, create_transfer_request):
+            sent[create_transfer_request.transfer_id] = sent.get(create_transfer_request.transfer_id, 0) + 1
+            if len(sent) == 1 and sent[create_transfer_request.transfer_id] == 1:
+                # Cashfree accepted the transfer, then the worker was killed before saving 'processing'
+                raise WorkerDied()
+            return MagicMock(data={"status": "RECEIVED"})
+
+        def fetch_transfer(x_api_version, transfer_id):
+            if transfer_id not in sent:
+                raise Exception("(404) Reason: Transfer does not exist")
+            return MagicMock(data={"status": "PENDING"})
+
+        client = MagicMock()
+        client.PayoutInitiateTransfer.side_effect = initiate_transfer
+        client.PayoutFetchTransfer.side_effect = fetch_transfer
+
+        with patch.object(CashfreePayoutService, "_cashfree_client", client), \
+                patch.object(CashfreePayoutService, "initialize_client"), \
+                patch.object(
+                    CashfreePayoutService,
+                    "ensure_beneficiary",
+                    return_value={"success": True, "beneficiary_id": f"OWNER_{self.owner.id}"},
+                ):
+            first, second = OwnerPayout.claim_due_retries(limit=2)
+            with self.assertRaises(WorkerDied):
+                CashfreePayoutService.execute_payout(first)
+            first.refresh_from_db()
+            self.assertEqual(first.status, "pending")
+            self.assertTrue(first.cashfree_transfer_id)
+
+            # The dead worker's lease runs out and another worker claims the payout again
+            OwnerPayout.objects.filter(pk=first.pk).update(locked_until=timezone.now() - timezone.timedelta(seconds=1))
+            reclaimed = OwnerPayout.claim_due_retries(limit=10)
+            self.assertEqual([payout.id for payout in reclaimed], [first.id])
+            result = CashfreePayoutService.execute_payout(reclaimed[0])
+
+            # A payout whose transfer never reached Cashfree is resent under its saved ID
+            OwnerPayout.objects.filter(pk=second.pk).update(cashfree_transfer_id=f"PAYOUT_{second.id}_1")
+            second.refresh_from_db()
+            resent = CashfreePayoutService.execute_payout(second)
+
+        self.assertTrue(result["already_sent"])
+        first.refresh_from_db()
+        self.assertEqual(first.status, "processing")
+        self.assertIsNone(first.locked_until)
+        self.assertEqual(sent, {first.cashfree_transfer_id: 1, f"PAYOUT_{second.id}_1": 1})
+        self.assertTrue(resent["success"])
+        self.assertEqual(OwnerPayout.objects.get(pk=second.pk).cashfree_transfer_id, f"PAYOUT_{second.id}_1")
+
+    def test_status_poller_writes_back_processing_payouts(self):
+        from unittest.mock import MagicMock
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        OwnerPayout.objects.filter(pk__in=[payout.pk for payout in self.payouts]).update(
+            status="processing", initiated_at=timezone.now() - timezone.timedelta(minutes=10)
+        )
+        for payout in self.payouts:
+            OwnerPayout.objects.filter(pk=payout.pk).update(cashfree_transfer_id=f"PAYOUT_{payout.id}")
+        statuses = {
+            f"PAYOUT_{self.payouts[0].id}": {"status": "SUCCESS", "utr": "UTR123"},
+            f"PAYOUT_{self.payouts[1].id}": {"status": "REJECTED", "reason": "Invalid VPA"},
+            f"PAYOUT_{self.payouts[2].id}": {"status": "PENDING"},
+        }
+        client = MagicMock()
+        client.PayoutFetchTransfer.side_effect = lambda x_api_version, transfer_id: MagicMock(data=statuses[transfer_id])
+
+        with patch.object(CashfreePayoutService, "_cashfree_client", client), \
+                patch.object(CashfreePayoutService, "initialize_client"), \
+                patch.object(OwnerPayout.objects, "bulk_update", wraps=OwnerPayout.objects.bulk_update) as bulk_update:
+            call_command("poll_payout_status", "--batch-size", "2", "--rate", "1000", stdout=StringIO())
+
+        self.assertEqual(client.PayoutFetchTransfer.call_count, 3)
+        self.assertEqual(bulk_update.call_count, 2)
+        completed, rejected, pending = [OwnerPayout.objects.get(pk=payout.pk) for payout in self.payouts]
+        self.assertEqual((completed.status, completed.cashfree_utr), ("completed", "UTR123"))
+        self.assertIsNotNone(completed.completed_at)
+        self.assertEqual((rejected.status, rejected.error_message), ("failed", "Invalid VPA"))
+        self.assertEqual(pending.status, "processing")
+
+
+@override_settings(
+    FAKE_GATEWAYS=True,
+    FAKE_GATEWAY_LATENCY_MS=0,
+    FAKE_GATEWAY_SETTLE_SECONDS=0,
+    PHONEPE_WEBHOOK_USERNAME="hook-user",
+    PHONEPE_WEBHOOK_PASSWORD="hook-pass",
+)
+class FakeGatewayTests(TestCase):
+    def setUp(self):
+        from core.services.cashfree_payout_service import CashfreePayoutService
+        from core.services.phonepe_service import PhonePeService
+
+        PhonePeService.reset_client()
+        CashfreePayoutService._client_initialized = False
+        self.addCleanup(PhonePeService.reset_client)
+        self.addCleanup(setattr, CashfreePayoutService, "_client_initialized", False)
+
+    def test_phonepe_order_settles_and_produces_a_valid_webhook(self):
+        from types import SimpleNamespace
+        from core.services.fake_gateways import FakePhonePeClient, FakePhonePeException, webhook_authorization
+        from core.services.phonepe_service import PhonePeService
+
+        client = PhonePeService.get_client()
+        self.assertIsInstance(client, FakePhonePeClient)
+
+        client.pay(SimpleNamespace(merchant_order_id="TXN_FAKE_1", amount=50000))
+        self.assertEqual(client.get_order_status("TXN_FAKE_1").state, "COMPLETED")
+
+        callback = client.validate_callback(
+            "hook-user", "hook-pass", webhook_authorization("hook-user", "hook-pass"), client.webhook_body("TXN_FAKE_1")
+        )
+        self.assertEqual(callback.callback_type, "CHECKOUT_ORDER_COMPLETED")
+        self.assertEqual(callback.callback_data.merchant_order_id, "TXN_FAKE_1")
+        with self.assertRaises(FakePhonePeException):
+            client.validate_callback("hook-user", "hook-pass", "forged", client.webhook_body("TXN_FAKE_1"))
+
+    @override_settings(FAKE_GATEWAY_DECLINE_RATE=1.0)
+    def test_cashfree_transfers_settle_with_injected_declines_and_rate_limits(self):
+        from types import SimpleNamespace
+        from core.services.cashfree_payout_service import CashfreePayoutService
+
+        CashfreePayoutService.initialize_client()
+        client = CashfreePayoutService._cashfree_client
+        with self.assertRaisesMessage(Exception, "404"):
+            client.PayoutFetchBeneficiary("2024-01-01", "OWNER_UNKNOWN")
+
+        client.PayoutInitiateTransfer("2024-01-01", SimpleNamespace(transfer_id="PAYOUT_FAKE_1", transfer_amount=500.0))
+        status = CashfreePayoutService.fetch_transfer_status("PAYOUT_FAKE_1")
+        self.assertEqual(status["status"], "FAILED")
+        self.assertTrue(status["reason"])
+
+        with override_settings(FAKE_GATEWAY_RATE_LIMIT_RATE=1.0):
+            with self.assertRaisesMessage(Exception, "429"):
+                client.PayoutFetchTransfer("2024-01-01", "PAYOUT_FAKE_1")
+
+
+@override_settings(DEBUG=True)
+class SyntheticDatasetTests(TestCase):
+    def test_dataset_is_consistent_and_grows_to_the_requested_scale(self):
+        call_command("generate_dataset", "--scale", "2", "--months", "3", stdout=StringIO())
+        owners = Owner.objects.filter(user__username__startswith="dataset-owner-")
+        self.assertEqual(owners.count(), 2)
+
+        completed = Payment.objects.filter(unit__property__owner__in=owners, status="completed")
+        self.assertTrue(completed.exists())
+        self.assertEqual(Invoice.objects.filter(payment__in=completed).count(), completed.count())
+        self.assertEqual(OwnerPayout.objects.filter(payment__in=completed).count(), completed.count())
+        # No synthetic payout is left for the retry or status workers to send to Cashfree
+        self.assertFalse(OwnerPayout.objects.exclude(status__in=["completed", "failed"]).exists())
+        self.assertFalse(OwnerPayout.objects.filter(next_retry_at__isnull=False).exists())
+        occupied = Unit.objects.filter(property__owner__in=owners, status="occupied")
+        self.assertEqual(TenantLedger.objects.filter(unit__in=occupied, is_active=True).count(), occupied.count())
+        for property_obj in Property.objects.filter(owner__in=owners):
+            self.assertEqual(property_obj.total_units, property_obj.units.count())
+
+        payment_count = Payment.objects.count()
+        call_command("generate_dataset", "--scale", "3", "--months", "3", stdout=StringIO())
+        self.assertEqual(owners.count(), 3)
+        self.assertGreater(Payment.objects.count(), payment_count)
+
+        call_command("generate_dataset", "--clear", stdout=StringIO())
+        self.assertFalse(User.objects.filter(username__startswith="dataset-").exists())
+
+        with override_settings(DEBUG=False), self.assertRaises(CommandError):
+            call_command("generate_dataset", "--scale", "1", stdout=StringIO())
+
+    def test_benchmark_reports_every_endpoint_and_flags_regressions(self):
+        import json
+        import os
+        import tempfile
+
+        call_command("generate_dataset", "--scale", "1", "--months", "2", stdout=StringIO())
+        output = os.path.join(tempfile.mkdtemp(), "benchmark.json")
+        call_command("benchmark_endpoints", "--repeat", "1", "--output", output, stdout=StringIO())
+
+        with open(output) as f:
+            results = json.load(f)
+        endpoints = results["scales"]["current"]["endpoints"]
+        self.assertIn("owner_dashboard", endpoints)
+        self.assertIn("tenant_payment_history", endpoints)
+        self.assertTrue(all(stats["status"] == 200 and stats["queries"] > 0 for stats in endpoints.values()))
+
+        # A baseline that used fewer queries is reported as a regression
+        endpoints["unit_list"]["queries"] = 1
+        with open(output, "w") as f:
+            json.dump(results, f)
+        with self.assertRaises(CommandError):
+            call_command(
+                "benchmark_endpoints", "--repeat", "1", "--endpoint", "unit_list", "--compare", output,
+                "--fail-on-regression", stdout=StringIO()
+            )
+
+
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def _histogram(self, name, route):
+        from core import metrics
+
+        for metric_name, labels, histogram in metrics.registry.snapshot()["histograms"]:
+            if metric_name == name and ("route", route) in labels:
+                return histogram
+        return {"count": 0, "sum": 0}
+
+    @override_settings(METRICS_AUTH_TOKEN="scrape-token")
+    def test_requests_are_recorded_per_route_and_exposed_to_prometheus(self):
+        before = self._histogram("zelton_http_request_db_queries", "pricingplan-list")
+
+        response = self.client.get("/api/pricing-plans/")
+        self.assertEqual(response.status_code, 200)
+
+        after = self._histogram("zelton_http_request_db_queries", "pricingplan-list")
+        self.assertEqual(after["count"], before["count"] + 1)
+        self.assertGreater(after["sum"], before["sum"])
+
+        self.assertEqual(self.client.get("/metrics").status_code, 404)
+        scrape = self.client.get("/metrics", HTTP_AUTHORIZATION="Bearer scrape-token")
+        body = scrape.content.decode()
+        self.assertEqual(scrape.status_code, 200)
+        self.assertIn('zelton_http_requests_total{method="GET",route="pricingplan-list",status="200"}', body)
+        self.assertIn('zelton_http_request_duration_seconds_bucket{method="GET",route="pricingplan-list",le="+Inf"}', body)
+
+    @override_settings(SLOW_REQUEST_THRESHOLD_MS=0, SLOW_REQUEST_SQL_COUNT=1)
+    def test_slow_requests_are_logged_with_their_slowest_sql(self):
+        with self.assertLogs("core.metrics", level="WARNING") as logs:
+            self.client.get("/api/pricing-plans/")
+
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn("Slow request GET /api/pricing-plans/ (pricingplan-list) -> 200", logs.output[0])
+        self.assertIn("core_pricingplan", logs.output[0])
+
+    def test_worker_files_and_exited_workers_are_summed(self):
+        import os
+        import tempfile
+        from core import metrics
+
+        metrics_dir = tempfile.mkdtemp()
+        other_worker = metrics.MetricsRegistry()
+        other_worker.increment(metrics.REQUESTS_TOTAL, {"route": "exited-worker-route", "method": "GET", "status": "200"}, 5)
+        other_worker.observe("zelton_gateway_call_duration_seconds", {"gateway": "phonepe", "operation": "exited-worker-op"}, 0.2)
+        for pid in (111, 222):
+            metrics._write_json(os.path.join(metrics_dir, f"metrics-{pid}.json"), other_worker.snapshot())
+
+        with override_settings(METRICS_DIR=metrics_dir):
+            metrics.merge_exited_worker(metrics_dir, 111)
+            self.assertFalse(os.path.exists(os.path.join(metrics_dir, "metrics-111.json")))
+            total = metrics.collect()
+
+        requests_key = (metrics.REQUESTS_TOTAL, (("method", "GET"), ("route", "exited-worker-route"), ("status", "200")))
+        self.assertEqual(total["counters"][requests_key], 10)
+        gateway_key = ("zelton_gateway_call_duration_seconds", (("gateway", "phonepe"), ("operation", "exited-worker-op")))
+        self.assertEqual(total["histograms"][gateway_key]["count"], 2)
+
+    def test_gateway_time_is_attributed_to_the_current_request(self):
+        from core import metrics
+
+        token = metrics.start_request()
+        with metrics.gateway_timer("cashfree", "fetch_transfer"):
+            pass
+        collector = metrics._current.get()
+        metrics._current.reset(token)
+        self.assertGreater(collector.gateway_seconds, 0)
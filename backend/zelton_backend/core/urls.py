@@ -2,6 +2,8 @@ from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from . import views
 from . import auth_views
+from . import streams
+from . import metrics
 
 router = DefaultRouter()
 router.register(r'owners', views.OwnerViewSet)
@@ -20,5 +22,7 @@ router.register(r'webhooks', views.PhonePeWebhookViewSet, basename='webhooks')
 router.register(r'auth', auth_views.AuthViewSet, basename='auth')
 
 urlpatterns = [
+    path('api/payments/status-stream/<str:merchant_order_id>/', streams.payment_status_stream, name='payment-status-stream'),
     path('api/', include(router.urls)),
+    path('metrics', metrics.metrics_view, name='metrics'),
 ]
\ No newline at end of file
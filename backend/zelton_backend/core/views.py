@@ -2,9 +2,11 @@ from rest_framework import viewsets, status, serializers
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from rest_framework.pagination import CursorPagination
 from decimal import Decimal, ROUND_HALF_UP
 from django.contrib.auth.models import User
-from django.db.models import Q, Sum, Count, Avg
+from django.db.models import Q, Sum, Count, Avg, Value, Prefetch
+from django.db.models.functions import Coalesce, TruncMonth
 from django.db import models
 from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
@@ -24,7 +26,8 @@ logger = logging.getLogger(__name__)
 from .models import (
     Owner, Property, Unit, Tenant, TenantKey, Payment, Invoice,
     PaymentProof, ManualPaymentProof, PricingPlan, PaymentTransaction, PropertyImage, UnitImage,
-    TenantDocument, OwnerPayment, OwnerPayout
+    TenantDocument, OwnerPayment, OwnerPayout, PaymentMonthlyRollup, ActivityEvent, WebhookEvent,
+    GatewayOrder
 )
 from .serializers import (
     OwnerSerializer, PropertySerializer, UnitSerializer, TenantSerializer,
@@ -36,6 +39,7 @@ from .serializers import (
 )
 from .services.phonepe_service import PhonePeService
 from .payment_utils import create_owner_payment_record, handle_legacy_payment, get_owner_payment_history
+from .cache import owner_cached_response
 
 
 @method_decorator(csrf_exempt, name='dispatch')
@@ -90,6 +94,7 @@ class OwnerViewSet(viewsets.ModelViewSet):
             return Response({'error': 'Failed to upload image'}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['get'])
+    @owner_cached_response('owner-dashboard')
     def dashboard(self, request):
         owner = self.get_queryset().first()
         if not owner:
@@ -114,33 +119,17 @@ class OwnerViewSet(viewsets.ModelViewSet):
         occupied_units = Unit.objects.filter(property__in=properties, status='occupied').count()
         vacant_units = total_units - occupied_units
 
-        # Calculate total revenue from all completed payments
-        total_revenue = Payment.objects.filter(
-            unit__property__in=properties,
-            status='completed'
-        ).aggregate(total=Sum('amount'))['total'] or 0
-        
-        # Calculate current month revenue for comparison
-        current_month = timezone.now().replace(day=1)
-        monthly_revenue = Payment.objects.filter(
-            unit__property__in=properties,
-            status='completed',
-            payment_date__gte=current_month
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        # Calculate total and current month revenue from the monthly payment rollup
+        current_month = timezone.localdate().replace(day=1)
+        revenue = PaymentMonthlyRollup.objects.filter(owner=owner).aggregate(
+            total=Sum('completed_amount'),
+            current_month=Sum('completed_amount', filter=Q(month=current_month))
+        )
+        total_revenue = revenue['total'] or 0
+        monthly_revenue = revenue['current_month'] or 0
 
-        # Calculate total due for all tenants
-        total_due = 0
-        
-        # Get all tenants for this owner's properties
-        tenants = Tenant.objects.filter(tenant_keys__property__in=properties).distinct()
-        
-        for tenant in tenants:
-            tenant_key = TenantKey.objects.filter(tenant=tenant, is_used=True).first()
-            if tenant_key:
-                unit = tenant_key.unit
-                # Calculate total due for this tenant (rent owed - payments made)
-                tenant_due = Payment.calculate_monthly_due(tenant, unit)
-                total_due += tenant_due
+        # Calculate total due for all tenants (rent owed - payments made) in one aggregated query
+        total_due = Payment.calculate_total_due_for_properties(properties)
 
         # For backward compatibility, set pending and overdue to same as total_due
         pending_amount = total_due
@@ -187,6 +176,14 @@ class OwnerViewSet(viewsets.ModelViewSet):
         })
 
 
+class PropertyCursorPagination(CursorPagination):
+    """Cursor pagination over an owner's properties for the detailed properties endpoint"""
+    ordering = 'id'
+    page_size = 10
+    page_size_query_param = 'page_size'
+    max_page_size = 50
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class PropertyViewSet(viewsets.ModelViewSet):
     queryset = Property.objects.all()
@@ -199,44 +196,52 @@ class PropertyViewSet(viewsets.ModelViewSet):
             return Property.objects.filter(owner=owner)
         return Property.objects.none()
 
+    @staticmethod
+    def _annotate_payment_totals(queryset, payments='units__payments'):
+        """
+        Annotate completed, current-month and pending payment totals in one grouped query.
+        ``payments`` is the lookup path from the queryset's model to Payment.
+        """
+        current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        amount_field = models.DecimalField(max_digits=12, decimal_places=2)
+        completed = Q(**{f'{payments}__status': 'completed'})
+        
+        return queryset.annotate(
+            total_payments=Coalesce(
+                Sum(f'{payments}__amount', filter=completed),
+                Value(0), output_field=amount_field
+            ),
+            current_month_payments=Coalesce(
+                Sum(f'{payments}__amount', filter=completed & (
+                    Q(**{f'{payments}__payment_date__gte': current_month}) |
+                    Q(**{f'{payments}__payment_date__isnull': True, f'{payments}__created_at__gte': current_month})
+                )),
+                Value(0), output_field=amount_field
+            ),
+            pending_payments=Coalesce(
+                Sum(f'{payments}__amount', filter=Q(**{f'{payments}__status': 'pending'})),
+                Value(0), output_field=amount_field
+            ),
+        )
+
+    @owner_cached_response('property-list')
     def list(self, request, *args, **kwargs):
         """Override list to include payment statistics"""
         try:
             queryset = self.filter_queryset(self.get_queryset())
-            serializer = self.get_serializer(queryset, many=True)
+            properties = list(
+                self._annotate_payment_totals(queryset)
+                .select_related('owner__user')
+                .prefetch_related('images')
+            )
+            serializer = self.get_serializer(properties, many=True)
             data = serializer.data
             
             # Enhance with payment data
-            current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            for property_data in data:
-                try:
-                    property_obj = Property.objects.get(id=property_data['id'])
-                    # Calculate payment statistics
-                    total_payments = Payment.objects.filter(
-                        unit__property=property_obj,
-                        status='completed'
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    
-                    current_month_payments = Payment.objects.filter(
-                        unit__property=property_obj,
-                        status='completed'
-                    ).filter(
-                        Q(payment_date__gte=current_month) | Q(payment_date__isnull=True, created_at__gte=current_month)
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    
-                    pending_payments = Payment.objects.filter(
-                        unit__property=property_obj,
-                        status='pending'
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    
-                    property_data['total_payments'] = float(total_payments)
-                    property_data['current_month_payments'] = float(current_month_payments)
-                    property_data['pending_payments'] = float(pending_payments)
-                except (Property.DoesNotExist, KeyError, ValueError) as e:
-                    logger.warning(f"Error enhancing property data: {e}")
-                    property_data['total_payments'] = 0
-                    property_data['current_month_payments'] = 0
-                    property_data['pending_payments'] = 0
+            for property_obj, property_data in zip(properties, data):
+                property_data['total_payments'] = float(property_obj.total_payments)
+                property_data['current_month_payments'] = float(property_obj.current_month_payments)
+                property_data['pending_payments'] = float(property_obj.pending_payments)
             
             return Response(data)
         except Exception as e:
@@ -272,47 +277,37 @@ class PropertyViewSet(viewsets.ModelViewSet):
             if not owner:
                 return Response({'error': 'Owner profile not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            properties = Property.objects.filter(owner=owner)
-            detailed_properties = []
+            # Units with their own payment totals and active tenancy, loaded in one query each
+            properties = self._annotate_payment_totals(
+                Property.objects.filter(owner=owner)
+            ).prefetch_related(
+                Prefetch(
+                    'units',
+                    queryset=self._annotate_payment_totals(Unit.objects.all(), payments='payments').order_by('id')
+                ),
+                Prefetch(
+                    'units__tenant_keys',
+                    queryset=TenantKey.objects.filter(is_used=True).select_related('tenant__user').order_by('id'),
+                    to_attr='active_tenant_keys'
+                ),
+            ).order_by('id')
+            
+            # Paginate by property only when the client asks for it, so existing callers get everything
+            paginator = None
+            if 'cursor' in request.query_params or 'page_size' in request.query_params:
+                paginator = PropertyCursorPagination()
+                properties = paginator.paginate_queryset(properties, request, view=self)
             
+            detailed_properties = []
             for property in properties:
-                # Get all units for this property
-                units = Unit.objects.filter(property=property)
-                
-                # Calculate payment statistics
-                from django.db.models import Sum, Count
-                from django.utils import timezone
-                
-                # Total payments received for this property
-                total_payments = Payment.objects.filter(
-                    unit__property=property,
-                    status='completed'
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                # Current month payments - use payment_date for accurate monthly tracking
-                # Include payments where payment_date is in current month OR payment_date is null but created_at is in current month
-                current_month = timezone.now().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-                current_month_payments = Payment.objects.filter(
-                    unit__property=property,
-                    status='completed'
-                ).filter(
-                    Q(payment_date__gte=current_month) | Q(payment_date__isnull=True, created_at__gte=current_month)
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
-                # Pending payments - only for units in this property
-                pending_payments = Payment.objects.filter(
-                    unit__property=property,
-                    status='pending'
-                ).aggregate(total=Sum('amount'))['total'] or 0
-                
                 # Unit details with payment info
                 unit_details = []
-                for unit in units:
+                for unit in property.units.all():
                     # Get tenant info for occupied units
                     tenant_info = None
-                    if unit.status == 'occupied':
-                        tenant_key = TenantKey.objects.filter(unit=unit, is_used=True).first()
-                        if tenant_key and tenant_key.tenant:
+                    if unit.status == 'occupied' and unit.active_tenant_keys:
+                        tenant_key = unit.active_tenant_keys[0]
+                        if tenant_key.tenant:
                             tenant = tenant_key.tenant
                             tenant_info = {
                                 'id': tenant.id,
@@ -322,26 +317,6 @@ class PropertyViewSet(viewsets.ModelViewSet):
                                 'move_in_date': tenant_key.used_at,
                             }
                     
-                    # Get unit payment statistics
-                    unit_total_payments = Payment.objects.filter(
-                        unit=unit,
-                        status='completed'
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    
-                    # Use payment_date for accurate monthly tracking
-                    # Include payments where payment_date is in current month OR payment_date is null but created_at is in current month
-                    unit_current_month_payments = Payment.objects.filter(
-                        unit=unit,
-                        status='completed'
-                    ).filter(
-                        Q(payment_date__gte=current_month) | Q(payment_date__isnull=True, created_at__gte=current_month)
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    
-                    unit_pending_payments = Payment.objects.filter(
-                        unit=unit,
-                        status='pending'
-                    ).aggregate(total=Sum('amount'))['total'] or 0
-                    
                     unit_details.append({
                         'id': unit.id,
                         'unit_number': unit.unit_number,
@@ -349,9 +324,9 @@ class PropertyViewSet(viewsets.ModelViewSet):
                         'rent_amount': float(unit.rent_amount),
                         'remaining_amount': float(unit.remaining_amount),
                         'tenant': tenant_info,
-                        'total_payments': float(unit_total_payments),
-                        'current_month_payments': float(unit_current_month_payments),
-                        'pending_payments': float(unit_pending_payments),
+                        'total_payments': float(unit.total_payments),
+                        'current_month_payments': float(unit.current_month_payments),
+                        'pending_payments': float(unit.pending_payments),
                     })
                 
                 detailed_properties.append({
@@ -367,14 +342,22 @@ class PropertyViewSet(viewsets.ModelViewSet):
                     'occupied_units': property.occupied_units,
                     'vacant_units': property.total_units - property.occupied_units,
                     'maintenance_contacts': property.maintenance_contacts or {},
-                    'total_payments': float(total_payments),
-                    'current_month_payments': float(current_month_payments),
-                    'pending_payments': float(pending_payments),
+                    'total_payments': float(property.total_payments),
+                    'current_month_payments': float(property.current_month_payments),
+                    'pending_payments': float(property.pending_payments),
                     'units': unit_details,
                     'created_at': property.created_at,
                     'updated_at': property.updated_at,
                 })
             
+            if paginator is not None:
+                return Response({
+                    'success': True,
+                    'data': detailed_properties,
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                })
+            
             return Response({
                 'success': True,
                 'data': detailed_properties
@@ -467,7 +450,7 @@ class UnitViewSet(viewsets.ModelViewSet):
         if not owner:
             return Unit.objects.none()
 
-        queryset = Unit.objects.filter(property__owner=owner)
+        queryset = Unit.objects.filter(property__owner=owner).select_related('property').prefetch_related('images')
 
         # Optional filter by property id from query params
         property_id = self.request.query_params.get('property')
@@ -1424,6 +1407,12 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 status='initiated',
                 reconciliation_status='not_started'
             )
+            GatewayOrder.register(
+                phonepe_response['merchant_order_id'],
+                phonepe_order_id=phonepe_response['order_id'],
+                payment=payment,
+                transaction=transaction,
+            )
             
             return Response({
                 'success': True,
@@ -1449,8 +1438,8 @@ class PaymentViewSet(viewsets.ModelViewSet):
     def verify_payment(self, request, merchant_order_id=None):
         """Verify payment status using PhonePe SDK"""
         try:
-            # Verify payment status with PhonePe
-            phonepe_response = PhonePeService.verify_payment_status(merchant_order_id)
+            # Verify payment status (served locally or coalesced across pollers)
+            phonepe_response = PhonePeService.get_order_status(merchant_order_id)
             
             if not phonepe_response['success']:
                 return Response({
@@ -1467,22 +1456,13 @@ class PaymentViewSet(viewsets.ModelViewSet):
             # Update payment status based on PhonePe response
             state = phonepe_response['state']
             if state == 'COMPLETED':
-                PhonePeService.handle_payment_completed(merchant_order_id)
-                payment.refresh_from_db()
+                if payment.status != 'completed':
+                    PhonePeService.handle_payment_completed(merchant_order_id)
+                    payment.refresh_from_db()
                 
-                # Generate invoice (check if already exists)
+                # Issued together with the completion; created here for payments completed before that
                 try:
-                    invoice, created = Invoice.objects.get_or_create(
-                        payment=payment,
-                        defaults={
-                            'tenant': payment.tenant,
-                            'unit': payment.unit,
-                            'amount': payment.amount,
-                            'rent_amount': payment.unit.rent_amount,
-                            'due_date': payment.due_date,
-                            'status': 'paid'
-                        }
-                    )
+                    invoice = Invoice.issue_for_payment(payment)
                     
                     return Response({
                         'success': True,
@@ -1504,8 +1484,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
                     }, status=status.HTTP_200_OK)
             
             elif state == 'FAILED':
-                PhonePeService.handle_payment_failed(merchant_order_id)
-                payment.refresh_from_db()
+                if payment.status != 'failed':
+                    PhonePeService.handle_payment_failed(merchant_order_id)
+                    payment.refresh_from_db()
                 
                 return Response({
                     'success': False,
@@ -1561,12 +1542,13 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Order ID is required'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Find payment by PhonePe order ID
-            payment = Payment.objects.filter(phonepe_order_id=order_id).first()
+            gateway_order = GatewayOrder.resolve_gateway_order(order_id, order_type='tenant_payment')
+            payment = gateway_order.payment if gateway_order else None
             if not payment:
                 return Response({'error': 'Payment not found'}, status=status.HTTP_404_NOT_FOUND)
             
-            # Verify payment status with PhonePe
-            phonepe_response = PhonePeService.verify_payment_status(payment.merchant_order_id)
+            # Verify payment status (served locally or coalesced across pollers)
+            phonepe_response = PhonePeService.get_order_status(payment.merchant_order_id)
             
             if not phonepe_response['success']:
                 return Response({
@@ -1577,8 +1559,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
             state = phonepe_response['state']
             
             if state == 'COMPLETED':
-                PhonePeService.handle_payment_completed(payment.merchant_order_id)
-                payment.refresh_from_db()
+                if payment.status != 'completed':
+                    PhonePeService.handle_payment_completed(payment.merchant_order_id)
+                    payment.refresh_from_db()
                 
                 return Response({
                     'success': True,
@@ -1589,8 +1572,9 @@ class PaymentViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_200_OK)
             
             elif state == 'FAILED':
-                PhonePeService.handle_payment_failed(payment.merchant_order_id)
-                payment.refresh_from_db()
+                if payment.status != 'failed':
+                    PhonePeService.handle_payment_failed(payment.merchant_order_id)
+                    payment.refresh_from_db()
                 
                 return Response({
                     'success': False,
@@ -1895,24 +1879,26 @@ class PaymentViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
+class ActivityEventCursorPagination(CursorPagination):
+    """Cursor pagination over an owner's activity events, newest first"""
+    ordering = ('-created_at', '-id')
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
 @method_decorator(csrf_exempt, name='dispatch')
 class AnalyticsViewSet(viewsets.ViewSet):
     permission_classes = [IsAuthenticated]
 
+    @owner_cached_response('analytics')
     def list(self, request):
         """Get comprehensive analytics data"""
-        period = request.query_params.get('period', '6months')
-        
-        # Calculate date range based on period
-        end_date = timezone.now()
-        if period == '3months':
-            start_date = end_date - timedelta(days=90)
-        elif period == '6months':
-            start_date = end_date - timedelta(days=180)
-        elif period == '1year':
-            start_date = end_date - timedelta(days=365)
-        else:
-            start_date = end_date - timedelta(days=180)
+        # Calculate date range based on period (start_date is None for period=all)
+        try:
+            start_date, end_date = self._get_date_range(request)
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Get user's properties
         if hasattr(request.user, 'owner_profile'):
@@ -1940,12 +1926,20 @@ class AnalyticsViewSet(viewsets.ViewSet):
             avg_rent=Avg('rent_amount')
         )['avg_rent'] or 0
         
+        # Revenue and payment counts come from the monthly rollup, so cost scales with months, not payments
+        rollup_totals = PaymentMonthlyRollup.objects.filter(
+            property__in=properties,
+            **self._month_filter(start_date, end_date)
+        ).aggregate(
+            completed_amount=Sum('completed_amount'),
+            completed_count=Sum('completed_count'),
+            pending_count=Sum('pending_count'),
+            failed_count=Sum('failed_count'),
+            cancelled_count=Sum('cancelled_count'),
+        )
+        
         # Calculate total revenue
-        total_revenue = Payment.objects.filter(
-            unit__property__in=properties,
-            status='completed',
-            payment_date__gte=start_date
-        ).aggregate(total=Sum('amount'))['total'] or 0
+        total_revenue = rollup_totals['completed_amount'] or 0
 
         # Calculate pending and overdue amounts
         pending_amount = Payment.objects.filter(
@@ -1961,25 +1955,20 @@ class AnalyticsViewSet(viewsets.ViewSet):
         ).aggregate(total=Sum('amount'))['total'] or 0
 
         # Calculate payment success rate
-        total_payments = Payment.objects.filter(
-            unit__property__in=properties,
-            created_at__gte=start_date
-        ).count()
-        completed_payments = Payment.objects.filter(
-            unit__property__in=properties,
-            status='completed',
-            created_at__gte=start_date
-        ).count()
+        completed_payments = rollup_totals['completed_count'] or 0
+        total_payments = completed_payments + sum(
+            rollup_totals[f'{status}_count'] or 0 for status in ('pending', 'failed', 'cancelled')
+        )
         payment_success_rate = (completed_payments / total_payments * 100) if total_payments > 0 else 0
         
         # Calculate total tenants
         total_tenants = Tenant.objects.filter(
             tenant_keys__property__in=properties,
-            created_at__gte=start_date
+            **self._date_filter('created_at', start_date, end_date)
         ).distinct().count()
         
         # Get recent activity
-        recent_activity = self._get_recent_activity(properties)
+        recent_activity = self._get_recent_activity(owner)
 
         analytics_data = {
             'monthlyRevenue': monthly_revenue,
@@ -1997,100 +1986,146 @@ class AnalyticsViewSet(viewsets.ViewSet):
 
         return Response(analytics_data)
 
-    def _get_monthly_revenue(self, properties, start_date, end_date):
-        """Get monthly revenue data"""
-        monthly_data = []
-        current = start_date.replace(day=1)
+    def _get_date_range(self, request):
+        """Resolve the period, or custom start/end (YYYY-MM-DD) query params, to a datetime range"""
+        end_date = timezone.now()
+        start_param = request.query_params.get('start')
+        end_param = request.query_params.get('end')
         
-        while current <= end_date:
-            month_start = current
-            month_end = (current + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            revenue = Payment.objects.filter(
-                unit__property__in=properties,
-                status='completed',
-                payment_date__gte=month_start,
-                payment_date__lte=month_end
-            ).aggregate(total=Sum('amount'))['total'] or 0
-            
+        if start_param or end_param:
+            try:
+                if end_param:
+                    end_date = timezone.make_aware(
+                        datetime.combine(datetime.strptime(end_param, '%Y-%m-%d').date(), datetime.max.time())
+                    )
+                start_date = timezone.make_aware(
+                    datetime.strptime(start_param, '%Y-%m-%d')
+                ) if start_param else None
+            except ValueError:
+                raise ValueError('Invalid date format. Use YYYY-MM-DD for start and end')
+            if start_date and start_date > end_date:
+                raise ValueError('start must be on or before end')
+            return start_date, end_date
+        
+        period = request.query_params.get('period', '6months')
+        if period == '3months':
+            start_date = end_date - timedelta(days=90)
+        elif period == '6months':
+            start_date = end_date - timedelta(days=180)
+        elif period == '1year':
+            start_date = end_date - timedelta(days=365)
+        elif period == 'all':
+            start_date = None
+        else:
+            start_date = end_date - timedelta(days=180)
+        return start_date, end_date
+
+    def _date_filter(self, field, start_date, end_date, month_aligned=False):
+        """Build range lookups for a date field; an open start means no lower bound"""
+        lookups = {f'{field}__lte': end_date}
+        if start_date:
+            if month_aligned:
+                start_date = timezone.localtime(start_date).replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            lookups[f'{field}__gte'] = start_date
+        return lookups
+
+    def _month_filter(self, start_date, end_date):
+        """Build lookups on a rollup month for the given range; an open start means no lower bound"""
+        lookups = {'month__lte': timezone.localtime(end_date).date().replace(day=1)}
+        if start_date:
+            lookups['month__gte'] = timezone.localtime(start_date).date().replace(day=1)
+        return lookups
+
+    def _fill_months(self, totals, start_date, end_date, default=0):
+        """Zero-fill month buckets between start and end; an open start begins at the first bucket"""
+        end_month = timezone.localtime(end_date).date().replace(day=1)
+        if start_date:
+            current = timezone.localtime(start_date).date().replace(day=1)
+        elif totals:
+            current = min(totals)
+        else:
+            current = end_month
+        
+        monthly_data = []
+        while current <= end_month:
             monthly_data.append({
                 'month': current.strftime('%b %Y'),
-                'value': float(revenue)
+                'value': totals.get(current, default)
             })
-            
-            current = (current + timedelta(days=32)).replace(day=1)
+            current = current.replace(year=current.year + 1, month=1) if current.month == 12 else current.replace(month=current.month + 1)
         
         return monthly_data
 
+    def _month_key(self, month):
+        """Normalise a TruncMonth value to the first day of the month as a date"""
+        if isinstance(month, datetime):
+            return (timezone.localtime(month) if timezone.is_aware(month) else month).date()
+        return month
+
+    def _get_monthly_revenue(self, properties, start_date, end_date):
+        """Get monthly revenue data"""
+        revenue_by_month = PaymentMonthlyRollup.objects.filter(
+            property__in=properties,
+            **self._month_filter(start_date, end_date)
+        ).values('month').annotate(total=Sum('completed_amount')).order_by('month')
+        
+        totals = {row['month']: float(row['total'] or 0) for row in revenue_by_month}
+        return self._fill_months(totals, start_date, end_date)
+
     def _get_monthly_tenants(self, properties, start_date, end_date):
         """Get monthly tenant data"""
-        monthly_data = []
-        current = start_date.replace(day=1)
-        
-        while current <= end_date:
-            month_start = current
-            month_end = (current + timedelta(days=32)).replace(day=1) - timedelta(days=1)
-            
-            tenants = Tenant.objects.filter(
-                tenant_keys__property__in=properties,
-                created_at__gte=month_start,
-                created_at__lte=month_end
-            ).distinct().count()
-            
-            monthly_data.append({
-                'month': current.strftime('%b %Y'),
-                'value': tenants
-            })
-            
-            current = (current + timedelta(days=32)).replace(day=1)
+        tenants_by_month = Tenant.objects.filter(
+            tenant_keys__property__in=properties,
+            **self._date_filter('created_at', start_date, end_date, month_aligned=True)
+        ).annotate(month=TruncMonth('created_at')).values('month').annotate(
+            count=Count('id', distinct=True)
+        ).order_by('month')
         
-        return monthly_data
+        totals = {self._month_key(row['month']): row['count'] for row in tenants_by_month}
+        return self._fill_months(totals, start_date, end_date)
 
     def _get_payment_status_distribution(self, properties):
         """Get payment status distribution"""
-        status_counts = {}
-        payments = Payment.objects.filter(unit__property__in=properties)
-        
-        for status, _ in Payment.PAYMENT_STATUS:
-            count = payments.filter(status=status).count()
-            status_counts[status] = count
+        totals = PaymentMonthlyRollup.objects.filter(property__in=properties).aggregate(**{
+            status: Sum(f'{status}_count') for status, _ in Payment.PAYMENT_STATUS
+        })
         
-        return status_counts
+        return {status: totals[status] or 0 for status, _ in Payment.PAYMENT_STATUS}
 
-    def _get_recent_activity(self, properties):
-        """Get recent activity data"""
-        activities = []
-        
-        # Recent payments (only completed payments)
-        recent_payments = Payment.objects.filter(
-            unit__property__in=properties,
-            status='completed'
-        ).order_by('-created_at')[:5]
-        
-        for payment in recent_payments:
-            activities.append({
-                'title': f'Payment from {payment.tenant.user.get_full_name()}',
-                'subtitle': f'Unit {payment.unit.unit_number} - ₹{payment.amount}',
-                'time': self._get_time_ago(payment.created_at),
-                'icon': 'card',
-                'color': 'success' if payment.status == 'completed' else 'warning'
-            })
+    @action(detail=False, methods=['get'])
+    def activity(self, request):
+        """Get the owner's activity feed, newest first, with a cursor for loading more"""
+        if not hasattr(request.user, 'owner_profile'):
+            return Response({'error': 'Owner profile not found'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Recent tenants
-        recent_tenants = Tenant.objects.filter(
-            tenant_keys__property__in=properties
-        ).order_by('-created_at')[:3]
-        
-        for tenant in recent_tenants:
-            activities.append({
-                'title': f'New tenant: {tenant.user.get_full_name()}',
-                'subtitle': f'Joined {tenant.tenant_keys.first().property.name}',
-                'time': self._get_time_ago(tenant.created_at),
-                'icon': 'person-add',
-                'color': 'primary'
-            })
+        paginator = ActivityEventCursorPagination()
+        events = paginator.paginate_queryset(
+            ActivityEvent.objects.filter(owner=request.user.owner_profile), request, view=self
+        )
         
-        return sorted(activities, key=lambda x: x['time'], reverse=True)[:8]
+        return Response({
+            'results': [self._serialize_activity(event) for event in events],
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link(),
+        })
+
+    def _get_recent_activity(self, owner):
+        """Get recent activity data"""
+        events = ActivityEvent.objects.filter(owner=owner).order_by('-created_at', '-id')[:8]
+        return [self._serialize_activity(event) for event in events]
+
+    def _serialize_activity(self, event):
+        icon, color = event.get_display_style()
+        return {
+            'id': event.id,
+            'type': event.event_type,
+            'title': event.title,
+            'subtitle': event.subtitle,
+            'time': self._get_time_ago(event.created_at),
+            'created_at': event.created_at,
+            'icon': icon,
+            'color': color,
+        }
 
     def _get_time_ago(self, date):
         """Get human readable time ago"""
@@ -2199,6 +2234,11 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
             subscription_payment.merchant_order_id = phonepe_response['merchant_order_id']
             subscription_payment.phonepe_order_id = phonepe_response['order_id']
             subscription_payment.save()
+            GatewayOrder.register(
+                subscription_payment.merchant_order_id,
+                phonepe_order_id=subscription_payment.phonepe_order_id,
+                owner_payment=subscription_payment,
+            )
             
             return Response({
                 'success': True,
@@ -2309,6 +2349,11 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
             subscription_payment.merchant_order_id = phonepe_response['merchant_order_id']
             subscription_payment.phonepe_order_id = phonepe_response['order_id']
             subscription_payment.save()
+            GatewayOrder.register(
+                subscription_payment.merchant_order_id,
+                phonepe_order_id=subscription_payment.phonepe_order_id,
+                owner_payment=subscription_payment,
+            )
             
             return Response({
                 'success': True,
@@ -2328,8 +2373,8 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
     def verify_payment(self, request, merchant_order_id=None):
         """Verify subscription payment status"""
         try:
-            # Verify payment status with PhonePe
-            phonepe_response = PhonePeService.verify_payment_status(merchant_order_id)
+            # Verify payment status (served locally or coalesced across pollers)
+            phonepe_response = PhonePeService.get_order_status(merchant_order_id)
             
             if not phonepe_response['success']:
                 return Response({
@@ -2349,8 +2394,9 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
             # Update payment status based on PhonePe response
             state = phonepe_response['state']
             if state == 'COMPLETED':
-                PhonePeService.handle_payment_completed(merchant_order_id)
-                payment_record.refresh_from_db()
+                if payment_record.status != 'completed':
+                    PhonePeService.handle_payment_completed(merchant_order_id)
+                    payment_record.refresh_from_db()
                 
                 # Return appropriate serializer data
                 payment_data = OwnerPaymentSerializer(payment_record).data
@@ -2363,8 +2409,9 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_200_OK)
             
             elif state == 'FAILED':
-                PhonePeService.handle_payment_failed(merchant_order_id)
-                payment_record.refresh_from_db()
+                if payment_record.status != 'failed':
+                    PhonePeService.handle_payment_failed(merchant_order_id)
+                    payment_record.refresh_from_db()
                 
                 # Return appropriate serializer data
                 payment_data = OwnerPaymentSerializer(payment_record).data
@@ -2407,15 +2454,16 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
                 return Response({'error': 'Order ID is required'}, status=status.HTTP_400_BAD_REQUEST)
             
             # Find subscription payment by PhonePe order ID
-            owner_payment = OwnerPayment.objects.filter(phonepe_order_id=order_id).first()
+            gateway_order = GatewayOrder.resolve_gateway_order(order_id, order_type='owner_payment')
+            owner_payment = gateway_order.owner_payment if gateway_order else None
             
             if not owner_payment:
                 return Response({'error': 'Subscription payment not found'}, status=status.HTTP_404_NOT_FOUND)
             
             payment_record = owner_payment
             
-            # Verify payment status with PhonePe
-            phonepe_response = PhonePeService.verify_payment_status(payment_record.merchant_order_id)
+            # Verify payment status (served locally or coalesced across pollers)
+            phonepe_response = PhonePeService.get_order_status(payment_record.merchant_order_id)
             
             if not phonepe_response['success']:
                 return Response({
@@ -2426,8 +2474,9 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
             state = phonepe_response['state']
             
             if state == 'COMPLETED':
-                PhonePeService.handle_payment_completed(payment_record.merchant_order_id)
-                payment_record.refresh_from_db()
+                if payment_record.status != 'completed':
+                    PhonePeService.handle_payment_completed(payment_record.merchant_order_id)
+                    payment_record.refresh_from_db()
                 
                 # Return appropriate serializer data
                 payment_data = OwnerPaymentSerializer(payment_record).data
@@ -2441,8 +2490,9 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
                 }, status=status.HTTP_200_OK)
             
             elif state == 'FAILED':
-                PhonePeService.handle_payment_failed(payment_record.merchant_order_id)
-                payment_record.refresh_from_db()
+                if payment_record.status != 'failed':
+                    PhonePeService.handle_payment_failed(payment_record.merchant_order_id)
+                    payment_record.refresh_from_db()
                 
                 # Return appropriate serializer data
                 payment_data = OwnerPaymentSerializer(payment_record).data
@@ -2468,6 +2518,7 @@ class OwnerSubscriptionViewSet(viewsets.ModelViewSet):
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
     @action(detail=False, methods=['get'])
+    @owner_cached_response('check-limits')
     def check_limits(self, request):
         """Check current subscription limits and suggest upgrades if needed"""
         try:
@@ -2771,15 +2822,26 @@ class PhonePeWebhookViewSet(viewsets.ViewSet):
                 logger.warning(f"Invalid webhook signature: {validation_response['error']}")
                 return Response({'error': 'Invalid webhook signature'}, status=status.HTTP_400_BAD_REQUEST)
             
-            # Process webhook callback
-            process_response = PhonePeService.process_webhook_callback(validation_response)
+            callback_type, merchant_order_id, state = PhonePeService.parse_webhook_callback(validation_response)
+            if not merchant_order_id:
+                logger.warning("No merchant order ID found in webhook callback")
+                return Response({'error': 'No merchant order ID found'}, status=status.HTTP_400_BAD_REQUEST)
+            
+            try:
+                payload = json.loads(callback_body)
+            except ValueError:
+                payload = {'raw': callback_body}
             
-            if not process_response['success']:
-                logger.error(f"Error processing webhook: {process_response['error']}")
-                return Response({'error': process_response['error']}, status=status.HTTP_400_BAD_REQUEST)
+            # Store the event and acknowledge; process_webhook_events applies it once, redeliveries are no-ops
+            event, created = WebhookEvent.ingest(merchant_order_id, callback_type, state, payload)
             
-            logger.info(f"Webhook processed successfully: {process_response}")
-            return Response({'success': True, 'message': 'Webhook processed successfully'}, status=status.HTTP_200_OK)
+            logger.info(f"Webhook {callback_type} {state} for {merchant_order_id} stored as event {event.id} (duplicate={not created})")
+            return Response({
+                'success': True,
+                'message': 'Webhook received',
+                'event_id': event.id,
+                'duplicate': not created
+            }, status=status.HTTP_200_OK)
             
         except Exception as e:
             logger.error(f"Unexpected error in webhook processing: {str(e)}")
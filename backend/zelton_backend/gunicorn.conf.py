@@ -67,6 +67,21 @@ capture_output = True
 worker_max_requests = 1000
 worker_max_requests_jitter = 50
 
+# Per-worker metrics files summed by /metrics (METRICS_DIR in settings_production)
+metrics_dir = os.environ.get("METRICS_DIR", "/ZeltonLivings/dbdata/metrics")
+
+def on_starting(server):
+    # Counters start again from zero with the new master; Prometheus treats that as a reset
+    if os.path.isdir(metrics_dir):
+        for file_name in os.listdir(metrics_dir):
+            if file_name.startswith("metrics-"):
+                os.remove(os.path.join(metrics_dir, file_name))
+
+def child_exit(server, worker):
+    from core.metrics import merge_exited_worker
+    if os.path.isdir(metrics_dir):
+        merge_exited_worker(metrics_dir, worker.pid)
+
 # Pre-fork server
 def when_ready(server):
     server.log.info("Zelton Backend server is ready. PID: %s", server.pid)
@@ -0,0 +1,49 @@
+# Gunicorn configuration file for the Zelton payment status stream (ASGI)
+
+import os
+
+# Server socket
+bind = "127.0.0.1:8001"
+
+# Async workers: each one holds hundreds of waiting clients on a single event loop
+workers = 2
+worker_class = "uvicorn.workers.UvicornWorker"
+timeout = 360  # Longer than PAYMENT_STATUS_STREAM_TIMEOUT, so open streams are not killed
+graceful_timeout = 30
+
+# Process naming
+proc_name = "zelton_stream"
+
+# Environment variables
+raw_env = [
+    'DJANGO_SETTINGS_MODULE=zelton_backend.settings_production',
+]
+
+# Per-worker metrics files summed by /metrics (METRICS_DIR in settings_production), shared with gunicorn.conf.py
+metrics_dir = os.environ.get("METRICS_DIR", "/ZeltonLivings/dbdata/metrics")
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+def on_starting(server):
+    # The backend master owns the metrics reset; only fold in stream workers a previous master left behind
+    from core.metrics import merge_exited_worker
+    if os.path.isdir(metrics_dir):
+        for file_name in os.listdir(metrics_dir):
+            pid = file_name[len("metrics-"):-len(".json")]
+            if file_name.startswith("metrics-") and file_name.endswith(".json") and pid.isdigit() and not _pid_alive(int(pid)):
+                merge_exited_worker(metrics_dir, int(pid))
+
+def child_exit(server, worker):
+    from core.metrics import merge_exited_worker
+    if os.path.isdir(metrics_dir):
+        merge_exited_worker(metrics_dir, worker.pid)
+
+def when_ready(server):
+    server.log.info("Zelton stream server is ready. PID: %s", server.pid)
@@ -51,6 +51,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.RequestMetricsMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",  # For static files
@@ -208,16 +209,30 @@ LOGGING = {
             'level': 'INFO',
             'propagate': True,
         },
+        'core.metrics': {
+            'handlers': ['file'],
+            'level': 'INFO',
+            'propagate': True,
+        },
     },
 }
 
-# Cache configuration (disabled - Redis not available)
+# Cache configuration - Redis is not available, so all gunicorn workers share a local SQLite (WAL) cache file
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+        'BACKEND': 'core.cache_backends.SQLiteCache',
+        'LOCATION': config('CACHE_SQLITE_PATH', default='/ZeltonLivings/dbdata/cache/zelton_cache.sqlite3'),
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=20000, cast=int),
+            'CULL_FREQUENCY': 4,
+        }
     }
 }
 
+# Lifetime in seconds of cached owner-scoped responses (dashboard, analytics, property list, limits)
+OWNER_CACHE_TIMEOUT = config('OWNER_CACHE_TIMEOUT', default=300, cast=int)
+
 # Session configuration (using database instead of Redis)
 SESSION_ENGINE = 'django.contrib.sessions.backends.db'
 SESSION_COOKIE_AGE = 3600  # 1 hour
@@ -262,11 +277,40 @@ PHONEPE_WEBHOOK_USERNAME = config('PHONEPE_WEBHOOK_USERNAME')
 PHONEPE_WEBHOOK_PASSWORD = config('PHONEPE_WEBHOOK_PASSWORD')
 PHONEPE_REDIRECT_BASE_URL = config('PHONEPE_REDIRECT_BASE_URL')
 PHONEPE_REQUEST_TIMEOUT = config('PHONEPE_REQUEST_TIMEOUT', default=30, cast=int)
+# Shared budget for PhonePe order status calls (per process), used by payment reconciliation
+PHONEPE_STATUS_RATE_LIMIT = config('PHONEPE_STATUS_RATE_LIMIT', default=10, cast=float)
+PHONEPE_STATUS_RATE_BURST = config('PHONEPE_STATUS_RATE_BURST', default=20, cast=int)
+# Seconds a non-final order status from PhonePe is reused for verify-payment polls
+PHONEPE_STATUS_CACHE_TTL = config('PHONEPE_STATUS_CACHE_TTL', default=5, cast=int)
+# Longest a verify-payment poll waits for another request's PhonePe status call before answering PENDING
+PHONEPE_STATUS_WAIT_SECONDS = config('PHONEPE_STATUS_WAIT_SECONDS', default=1.5, cast=float)
+# Payment status stream: longest long-poll wait and longest SSE connection, in seconds
+PAYMENT_STATUS_WAIT_TIMEOUT = config('PAYMENT_STATUS_WAIT_TIMEOUT', default=25, cast=int)
+PAYMENT_STATUS_STREAM_TIMEOUT = config('PAYMENT_STATUS_STREAM_TIMEOUT', default=300, cast=int)
 
 # Cashfree Payout configuration for production
 CASHFREE_CLIENT_ID = config('CASHFREE_CLIENT_ID', default='')
 CASHFREE_CLIENT_SECRET = config('CASHFREE_CLIENT_SECRET', default='')
 CASHFREE_ENVIRONMENT = config('CASHFREE_ENVIRONMENT', default='PRODUCTION')  # PRODUCTION or TEST
+# 'instant': one transfer per rent payment; 'batched': one transfer per owner per day, settled by process_scheduled_payouts
+CASHFREE_PAYOUT_MODE = config('CASHFREE_PAYOUT_MODE', default='instant')
+# Transfer status checks per second made by poll_payout_status
+CASHFREE_STATUS_RATE_LIMIT = config('CASHFREE_STATUS_RATE_LIMIT', default=10, cast=float)
+
+# The offline PhonePe and Cashfree stand-ins (core/services/fake_gateways.py) exist for development load tests only.
+# Deliberately not read from the environment: one stray variable would accept fake payments and skip real payouts
+FAKE_GATEWAYS = False
+
+# Per-request metrics (core/metrics.py), scraped from /metrics
+METRICS_ENABLED = config('METRICS_ENABLED', default=True, cast=bool)
+# Directory where each worker process publishes its metrics for /metrics to sum; empty keeps them in-process
+METRICS_DIR = config('METRICS_DIR', default='/ZeltonLivings/dbdata/metrics')
+METRICS_FLUSH_INTERVAL = config('METRICS_FLUSH_INTERVAL', default=5, cast=float)
+# Bearer token required by /metrics; without one it is only served with DEBUG on
+METRICS_AUTH_TOKEN = config('METRICS_AUTH_TOKEN', default='')
+# Requests slower than this are logged with their slowest SQL statements
+SLOW_REQUEST_THRESHOLD_MS = config('SLOW_REQUEST_THRESHOLD_MS', default=1000, cast=int)
+SLOW_REQUEST_SQL_COUNT = config('SLOW_REQUEST_SQL_COUNT', default=3, cast=int)
 
 # Sentry configuration for error tracking (disabled temporarily)
 # import sentry_sdk